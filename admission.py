@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Priorities in a pool's queue, served lowest first
+CHEAP = 0  # prompt built locally from the inputs
+HEAVY = 1  # an upload to extract (and a syllabus to analyze) first
+
+# Concurrent requests ("limit") and requests allowed to wait ("queue") per event.
+# Study plans with a syllabus are the most expensive, smart prompts the cheapest.
+DEFAULT_POOLS = {
+    "study_plan": {"limit": 8, "queue": 32},
+    "practice_questions": {"limit": 8, "queue": 64},
+    "smart_prompts": {"limit": 16, "queue": 128},
+}
+# Token buckets kept per kind of client key before the least recently used are forgotten
+MAX_BUCKETS = 100000
+
+
+class Rejected(Exception):
+    """A request turned away by admission control.
+
+    reason is "rate_limited", "queue_full" or "queue_timeout"; retry_after is
+    the number of seconds after which a rate-limited client may try again.
+    """
+
+    def __init__(self, reason, retry_after=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """A token bucket per key, refilled at rate tokens per second up to burst"""
+
+    def __init__(self, rate, burst, max_keys=MAX_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Take a token for key; returns 0 if there was one, else the seconds until there will be"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class Pool:
+    """At most limit requests of one event at a time; up to queue more wait, by priority and then arrival.
+
+    A request that waits longer than max_wait, or finds the queue full, is
+    rejected at once instead of waiting for a slot it won't get in time. A
+    finished request hands its slot straight to the first one waiting.
+    All calls must come from the same event loop.
+    """
+
+    def __init__(self, name, limit, queue, max_wait):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._heap = []  # (priority, arrival, future); futures of given-up requests are skipped
+        self._arrival = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    async def acquire(self, priority=CHEAP):
+        """Wait for a slot; returns the seconds waited or raises Rejected"""
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            self.admitted += 1
+            return 0.0
+        if self.waiting >= self.queue:
+            self.shed += 1
+            raise Rejected("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._arrival), future))
+        self.waiting += 1
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done() or future.cancelled():
+                self.waiting -= 1
+                self.timeouts += 1
+                raise Rejected("queue_timeout")
+        except asyncio.CancelledError:
+            # The client went away: give up the place, or the slot if it was just handed over
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self.waiting -= 1
+            raise
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_seconds += waited
+        return waited
+
+    def release(self):
+        """Free a slot, handing it to the first request still waiting"""
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                self.waiting -= 1
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self):
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting, "admitted": self.admitted,
+                "queued": self.queued, "shed": self.shed, "timeouts": self.timeouts,
+                "wait_seconds": round(self.wait_seconds, 3)}
+
+
+class Admission:
+    """Per-client rate limits and per-event concurrency pools in front of the request handlers.
+
+    Every request takes a token from its session's bucket and from its IP's
+    (looser, since a campus or household can share one address); an empty
+    bucket rejects it with the time until the next token. Requests that need
+    the model then wait for a slot in their event's pool. Rates are requests
+    per second; 0 turns a limit off.
+    """
+
+    def __init__(self, pools=None, session_rate=0.0, session_burst=1, ip_rate=0.0, ip_burst=1, max_wait=30.0):
+        self.pools = {name: Pool(name, settings["limit"], settings["queue"], settings.get("max_wait", max_wait))
+                      for name, settings in (pools or DEFAULT_POOLS).items()}
+        self.sessions = TokenBuckets(session_rate, session_burst) if session_rate > 0 else None
+        self.ips = TokenBuckets(ip_rate, ip_burst) if ip_rate > 0 else None
+        self.rate_limited = 0
+
+    def check_rate(self, session=None, ip=None):
+        """Take a token for the client or raise Rejected("rate_limited")"""
+        wait = 0.0
+        if self.sessions is not None and session:
+            wait = self.sessions.take(session)
+        if self.ips is not None and ip:
+            wait = max(wait, self.ips.take(ip))
+        if wait:
+            self.rate_limited += 1
+            raise Rejected("rate_limited", retry_after=wait)
+
+    async def acquire(self, event, priority=CHEAP):
+        """Wait for a slot in the event's pool; returns (the pool, to release when done, seconds waited)"""
+        pool = self.pools.get(event)
+        if pool is None:
+            return None, 0.0
+        return pool, await pool.acquire(priority)
+
+    def stats(self):
+        return {"rate_limited": self.rate_limited,
+                "tracked_sessions": len(self.sessions) if self.sessions is not None else 0,
+                "tracked_ips": len(self.ips) if self.ips is not None else 0,
+                **{f"{name}_{key}": value for name, pool in self.pools.items() for key, value in pool.stats().items()}}
+
+
+def load_pools(text=None):
+    """Pool settings from CODELALA_POOLS (inline JSON or the path of a JSON file) merged over DEFAULT_POOLS"""
+    if text is None:
+        text = os.environ.get("CODELALA_POOLS", "")
+    text = text.strip()
+    if not text:
+        return DEFAULT_POOLS
+    if not text.startswith("{"):
+        with open(text, encoding="utf-8") as f:
+            text = f.read()
+    pools = {name: dict(settings) for name, settings in DEFAULT_POOLS.items()}
+    for name, settings in json.loads(text).items():
+        pools.setdefault(name, {}).update(settings)
+    return pools
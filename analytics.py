@@ -0,0 +1,206 @@
+"""Usage analytics over the interaction, feedback and topic request logs.
+
+    python analytics.py                         # the last 30 days
+    python analytics.py --days 7 --freq 15min --json
+
+Reads the Parquet store (see interaction_store.py) together with the CSV
+rows not compacted yet, and computes everything with vectorized pandas
+operations: top subjects and topics, helpfulness rates by subject and
+learning preference, and request volume per interval, with its peaks and
+hour-of-day profile for capacity planning. prewarm.py takes its popular
+topics from here.
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+
+import interaction_store
+from interaction_store import STORE_DIR, TABLES
+
+HELPFUL = ("Very Helpful", "Somewhat Helpful")
+# Feedback rows from before the subject was logged: taken from the plan's heading
+PLAN_SUBJECT = r"(?m)^## .*study plan for (.+)$"
+
+
+def load(table, days=None, store_dir=STORE_DIR, path=None):
+    """Rows of a table from the last days days (all if None), compacted and not, with category columns as categoricals"""
+    import pandas as pd
+
+    since = datetime.now() - timedelta(days=days) if days else None
+    columns = TABLES[table]["columns"]
+    frames = [interaction_store.read_csv(name, columns, TABLES[table].get("overflow", ()))
+              for name in interaction_store.pending_files(table, store_dir, path)]
+    stored = interaction_store.read_store(table, since, store_dir)
+    if stored is not None:
+        frames.insert(0, stored)
+    frame = pd.concat(frames, ignore_index=True) if frames else interaction_store.typed(pd.DataFrame(), columns)
+    if since is not None:
+        frame = frame[frame["timestamp"] >= since]
+    for column, kind in columns.items():
+        if kind == "category":
+            frame[column] = frame[column].astype("category")
+    return frame.reset_index(drop=True)
+
+
+def top_subjects(interactions, limit=10):
+    """Study plans per subject, most requested first"""
+    counts = interactions["subject"].value_counts()
+    return counts[counts > 0].head(limit).rename("plans")
+
+
+def top_topics(topics, limit=20, feature=None, subjects=None, min_count=1):
+    """Requests per subject and canonical topic (spellings of a topic counted together), most requested first"""
+    import topic_canon
+
+    if feature is not None:
+        topics = topics[topics["feature"] == feature]
+    if subjects is not None:
+        topics = topics[topics["subject"].isin(list(subjects))]
+    topics = topics[topics["topic"].str.strip() != ""]
+    # Count the distinct spellings first, so only those are canonicalized
+    spellings = topics.groupby(["subject", "topic"], observed=True).size().rename("requests").reset_index()
+    spellings["topic"] = [topic_canon.canonical_topic(subject, topic.strip())
+                          for subject, topic in zip(spellings["subject"], spellings["topic"])]
+    counts = spellings.groupby(["subject", "topic"], observed=True)["requests"].sum()
+    counts = counts[counts >= min_count].sort_values(ascending=False, kind="stable")
+    return counts.head(limit) if limit else counts
+
+
+def typed_spellings(topics):
+    """{(subject, canonical topic): the topic's most requested spelling}"""
+    import topic_canon
+
+    topics = topics[topics["topic"].str.strip() != ""]
+    counts = topics.groupby(["subject", "topic"], observed=True).size().sort_values(ascending=False, kind="stable")
+    spellings = {}
+    for subject, topic in counts.index:
+        spellings.setdefault((subject, topic_canon.canonical_topic(subject, topic.strip())), topic.strip())
+    return spellings
+
+
+def popular_topics(limit=None, days=30, subjects=None, min_count=1, store_dir=STORE_DIR, path=None):
+    """[(subject, topic)] most requested first, for pre-warming: each canonical topic once, in its most requested spelling"""
+    topics = load("topics", days, store_dir, path)
+    counts = top_topics(topics, limit, subjects=subjects, min_count=min_count)
+    spellings = typed_spellings(topics)
+    return [(str(subject), spellings.get((subject, topic), topic)) for subject, topic in counts.index]
+
+
+def helpfulness(feedback, by="subject"):
+    """Responses and the share rated helpful (and very helpful) per value of by"""
+    import pandas as pd
+
+    keys = feedback[by].astype(str)
+    if by == "subject":
+        keys = keys.where(keys != "", feedback["plan_details"].str.extract(PLAN_SUBJECT, expand=False).fillna(""))
+    frame = pd.DataFrame({
+        by: keys.replace("", "(unknown)"),
+        "helpful": feedback["feedback_type"].isin(HELPFUL),
+        "very_helpful": feedback["feedback_type"] == HELPFUL[0],
+    })
+    rates = frame.groupby(by).agg(responses=("helpful", "size"), helpful_rate=("helpful", "mean"),
+                                  very_helpful_rate=("very_helpful", "mean"))
+    return rates.sort_values("responses", ascending=False, kind="stable")
+
+
+def requests(interactions, topics):
+    """(timestamp, feature) of every request: study plans and the logged topic requests"""
+    import pandas as pd
+
+    plans = interactions[["timestamp"]].assign(feature="study_plan")
+    return pd.concat([plans, topics[["timestamp", "feature"]].astype({"feature": str})], ignore_index=True)
+
+
+def volume(events, freq="1h"):
+    """Requests per interval (rows) and feature (columns)"""
+    if events.empty:
+        return events.pivot_table(index="timestamp", columns="feature", aggfunc="size")
+    counts = events.groupby([events["timestamp"].dt.floor(freq), "feature"]).size().unstack(fill_value=0)
+    # Intervals without requests count as zero, not missing
+    return counts.asfreq(freq, fill_value=0)
+
+
+def peaks(series):
+    """Mean, p95 and maximum requests per interval, and when the maximum was, per feature and in total"""
+    series = series.assign(total=series.sum(axis=1))
+    return {feature: {"mean": round(float(counts.mean()), 2), "p95": float(counts.quantile(0.95)),
+                      "max": int(counts.max()), "max_at": str(counts.idxmax())}
+            for feature, counts in series.items()} if len(series) else {}
+
+
+def hourly_profile(events):
+    """Mean requests per hour of the day"""
+    if events.empty:
+        return {}
+    days = max(events["timestamp"].dt.normalize().nunique(), 1)
+    counts = events.groupby(events["timestamp"].dt.hour).size().reindex(range(24), fill_value=0) / days
+    return {hour: round(float(count), 2) for hour, count in counts.items()}
+
+
+def report(days=30, freq="1h", limit=10, store_dir=STORE_DIR):
+    """Every analysis as plain data"""
+    interactions = load("interactions", days, store_dir)
+    topics = load("topics", days, store_dir)
+    feedback = load("feedback", days, store_dir)
+    events = requests(interactions, topics)
+
+    def rates(frame):
+        return {str(key): {"responses": int(row["responses"]), "helpful_rate": round(float(row["helpful_rate"]), 3),
+                           "very_helpful_rate": round(float(row["very_helpful_rate"]), 3)}
+                for key, row in frame.iterrows()}
+
+    return {
+        "days": days,
+        "requests": {str(feature): int(count) for feature, count in events["feature"].value_counts().items()},
+        "top_subjects": {str(subject): int(count) for subject, count in top_subjects(interactions, limit).items()},
+        "top_topics": {feature: [{"subject": str(subject), "topic": topic, "requests": int(count)}
+                                 for (subject, topic), count in top_topics(topics, limit, feature).items()]
+                       for feature in ("practice_questions", "smart_prompts")},
+        "helpfulness_by_subject": rates(helpfulness(feedback, "subject")),
+        "helpfulness_by_preference": rates(helpfulness(feedback, "feedback_preference")),
+        "volume": {"freq": freq, "peaks": peaks(volume(events, freq))},
+        "hourly_profile": hourly_profile(events),
+    }
+
+
+def print_report(data):
+    period = f"the last {data['days']:g} days" if data["days"] else "all logs"
+    print(f"Requests in {period}: {data['requests'] or 'none'}")
+    print("\nTop subjects (study plans):")
+    for subject, count in data["top_subjects"].items():
+        print(f"  {count:>8}  {subject}")
+    for feature, topics in data["top_topics"].items():
+        print(f"\nTop topics ({feature}):")
+        for row in topics:
+            print(f"  {row['requests']:>8}  {row['subject']}: {row['topic']}")
+    for title, key in (("subject", "helpfulness_by_subject"), ("learning preference", "helpfulness_by_preference")):
+        print(f"\nHelpfulness by {title}:")
+        for value, row in data[key].items():
+            print(f"  {row['responses']:>8} responses, {row['helpful_rate']:.0%} helpful, "
+                  f"{row['very_helpful_rate']:.0%} very helpful  {value}")
+    print(f"\nRequests per {data['volume']['freq']}:")
+    for feature, stats in data["volume"]["peaks"].items():
+        print(f"  {feature:<20} mean {stats['mean']:>8}  p95 {stats['p95']:>8}  max {stats['max']:>6} at {stats['max_at']}")
+    if data["hourly_profile"]:
+        busiest = max(data["hourly_profile"], key=data["hourly_profile"].get)
+        print(f"\nBusiest hour of the day: {busiest}:00 ({data['hourly_profile'][busiest]} requests on average)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=float, default=30, help="only the last N days (0 = all)")
+    parser.add_argument("--freq", default="1h", help="volume interval, a pandas frequency like 15min or 1h")
+    parser.add_argument("--limit", type=int, default=10, help="rows in the top subjects and topics")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    data = report(args.days or None, args.freq, args.limit, args.store)
+    if args.json:
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+    else:
+        print_report(data)
+
+
+if __name__ == "__main__":
+    main()
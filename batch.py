@@ -0,0 +1,330 @@
+"""Generate study plans and practice questions for a whole roster without the UI.
+
+    python batch.py roster.csv -o plans.jsonl --tasks study_plan,practice_questions --concurrency 16
+
+The roster CSV has one student per row: subject, days_left, hours_per_day,
+resource_type and learning_preference, plus optional id, topic (needed for
+practice questions), syllabus_file and materials_file (paths relative to the
+roster). Rows are read as a stream, identical parameter combinations are
+generated once, and results are written as they finish. The output doubles
+as the checkpoint: re-running the same command skips every row already done
+and retries the ones that failed. An output path ending in .parquet is a
+directory of Parquet part files (needs pyarrow).
+"""
+import argparse
+import asyncio
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import codelala_core
+from resilience import describe
+from text_extraction import file_sha256
+
+TASKS = ("study_plan", "practice_questions")
+STUDY_PLAN_FIELDS = ("subject", "days_left", "hours_per_day", "resource_type", "feedback_preference")
+
+# Roster column names (lowercased, spaces as underscores) -> parameter names
+COLUMN_ALIASES = {
+    "learning_preference": "feedback_preference",
+    "preference": "feedback_preference",
+    "student_id": "id",
+    "syllabus": "syllabus_file",
+    "materials": "materials_file",
+}
+
+# A (row, task) with one of these statuses is done; "error" rows are retried on resume
+FINAL_STATUSES = ("ok", "off_topic", "invalid")
+
+
+def normalize_column(name):
+    name = name.strip().lower().replace(" ", "_").replace("-", "_")
+    return COLUMN_ALIASES.get(name, name)
+
+
+def read_roster(path):
+    """Yield (row number, row) from a roster CSV one row at a time, with normalized column names"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [normalize_column(column) for column in next(reader, [])]
+        for number, values in enumerate(reader, 1):
+            if any(value.strip() for value in values):
+                yield number, dict(zip(header, (value.strip() for value in values)))
+
+
+def job_params(task, row, base_dir="."):
+    """Keyword arguments of the task's generate function for a roster row; raises ValueError if the row is unusable"""
+    def file_field(name):
+        path = row.get(name)
+        if not path:
+            return None
+        path = os.path.join(base_dir, path)
+        if not os.path.isfile(path):
+            raise ValueError(f"{name} not found: {path}")
+        return path
+
+    if task == "study_plan":
+        missing = [field for field in STUDY_PLAN_FIELDS if not row.get(field)]
+        if missing:
+            raise ValueError(f"missing {', '.join(missing)}")
+        params = {field: row[field] for field in STUDY_PLAN_FIELDS}
+        try:
+            params["days_left"] = int(row["days_left"])
+            # The scheduler takes fractional hours (2.5); whole ones stay ints so
+            # their prompts, and cached answers, match the UI's
+            hours = float(row["hours_per_day"])
+            params["hours_per_day"] = int(hours) if hours.is_integer() else hours
+        except ValueError:
+            raise ValueError("days_left must be a whole number and hours_per_day a number")
+        params["syllabus_file"] = file_field("syllabus_file")
+        return params
+
+    if not row.get("subject") or not row.get("topic"):
+        raise ValueError("missing subject or topic")
+    return {"subject": row["subject"], "topic": row["topic"], "materials_file": file_field("materials_file")}
+
+
+def job_key(task, params, file_hashes):
+    """Identical parameters (uploads compared by content) produce identical output, so they share a key"""
+    identity = dict(params)
+    for field in ("syllabus_file", "materials_file"):
+        path = identity.get(field)
+        if path:
+            if path not in file_hashes:
+                file_hashes[path] = file_sha256(path)
+            identity[field] = file_hashes[path]
+    return hashlib.sha256(json.dumps([task, identity], sort_keys=True).encode("utf-8")).hexdigest()[:24]
+
+
+async def generate(task, params):
+    """(status, output) of one generation"""
+    if task == "study_plan":
+        output = await codelala_core.async_generate_study_plan(**params)
+        return ("off_topic" if output == codelala_core.OFF_TOPIC_SUBJECT_MESSAGE else "ok"), output
+    output = await codelala_core.async_generate_practice_questions(**params)
+    return ("off_topic" if output == codelala_core.OFF_TOPIC_MESSAGE else "ok"), output
+
+
+class BatchResults:
+    """Completed jobs already in an output, so a resumed run can skip (and reuse) them"""
+
+    def __init__(self):
+        self.completed = set()  # (row, task)
+        self.outputs = {}  # key -> (status, output)
+
+    def remember(self, record):
+        if record["status"] in FINAL_STATUSES:
+            self.completed.add((record["row"], record["task"]))
+            if record.get("key") and record["status"] != "invalid":
+                self.outputs[record["key"]] = (record["status"], record["output"])
+
+
+class JsonlResults(BatchResults):
+    """One JSON object per line, appended and flushed as each job finishes"""
+
+    def __init__(self, path, resume=True):
+        super().__init__()
+        self.path = path
+        if resume and os.path.exists(path):
+            self._load()
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _load(self):
+        with open(self.path, "rb+") as f:
+            position = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # An interrupted run can leave a partial last line
+                    f.truncate(position)
+                    break
+                position += len(line)
+                self.remember(json.loads(line))
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.remember(record)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResults(BatchResults):
+    """A directory of Parquet part files, one per batch_size records (requires pyarrow).
+
+    Records still buffered when a run is killed are lost from the output, but
+    they are regenerated on resume, mostly from the response cache.
+    """
+
+    def __init__(self, path, resume=True, batch_size=200):
+        import pyarrow
+        import pyarrow.parquet
+
+        super().__init__()
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+        for part in parts:
+            if resume:
+                for record in self.parquet.read_table(part).to_pylist():
+                    self.remember(record)
+            else:
+                os.remove(part)
+        self.next_part = len(parts) if resume else 0
+
+    def write(self, record):
+        self.pending.append(dict(record, params=json.dumps(record.get("params"), sort_keys=True)))
+        self.remember(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        path = os.path.join(self.path, f"part-{self.next_part:05d}.parquet")
+        table = self.pyarrow.Table.from_pylist(self.pending, schema=self.pyarrow.schema([
+            ("row", self.pyarrow.int64()), ("id", self.pyarrow.string()), ("task", self.pyarrow.string()),
+            ("key", self.pyarrow.string()), ("status", self.pyarrow.string()), ("output", self.pyarrow.string()),
+            ("error", self.pyarrow.string()), ("params", self.pyarrow.string()),
+            ("deduplicated", self.pyarrow.bool_()), ("seconds", self.pyarrow.float64()),
+        ]))
+        # Written under a temporary name so a crash never leaves a truncated part
+        self.parquet.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self.next_part += 1
+        self.pending = []
+
+    def close(self):
+        self.flush()
+
+
+def open_results(path, resume=True):
+    if path.endswith(".parquet"):
+        return ParquetResults(path, resume)
+    return JsonlResults(path, resume)
+
+
+async def run_batch(rows, results, tasks=("study_plan",), concurrency=16, base_dir=".", progress=None):
+    """Generate every task for every (row number, row), writing a record per job to results; returns counts by status"""
+    counts = Counter()
+    queue = asyncio.Queue(maxsize=concurrency * 4)
+    running = {}  # key -> future of a job being generated by another worker
+    file_hashes = {}
+
+    async def produce():
+        for number, row in rows:
+            for task in tasks:
+                if task == "practice_questions" and not row.get("topic"):
+                    continue
+                if (number, task) in results.completed:
+                    counts["resumed"] += 1
+                    continue
+                await queue.put((number, row, task))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def run_job(number, row, task):
+        record = {"row": number, "id": row.get("id") or None, "task": task, "key": None, "status": None,
+                  "output": None, "error": None, "params": None, "deduplicated": False, "seconds": 0.0}
+        try:
+            params = job_params(task, row, base_dir)
+            key = job_key(task, params, file_hashes)
+        except (ValueError, OSError) as e:
+            return dict(record, status="invalid", error=str(e))
+        record.update(key=key, params=params)
+
+        started = time.perf_counter()
+        if key in results.outputs:
+            status, output = results.outputs[key]
+            return dict(record, status=status, output=output, deduplicated=True)
+        if key in running:
+            status, output, error = await asyncio.shield(running[key])
+            return dict(record, status=status, output=output, error=error, deduplicated=True,
+                        seconds=time.perf_counter() - started)
+
+        future = asyncio.get_running_loop().create_future()
+        running[key] = future
+        outcome = ("error", None, "cancelled")
+        try:
+            status, output = await generate(task, params)
+            outcome = (status, output, None)
+        except Exception as e:
+            outcome = ("error", None, describe(e))
+        finally:
+            del running[key]
+            future.set_result(outcome)
+        status, output, error = outcome
+        return dict(record, status=status, output=output, error=error, seconds=time.perf_counter() - started)
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            record = await run_job(*item)
+            results.write(record)
+            counts[record["status"]] += 1
+            if record["deduplicated"]:
+                counts["deduplicated"] += 1
+            if progress is not None:
+                progress(counts)
+
+    await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("roster", help="roster CSV")
+    parser.add_argument("-o", "--output", default=None, help="results .jsonl file or .parquet directory "
+                                                              "(default: <roster>-results.jsonl)")
+    parser.add_argument("--tasks", default="study_plan", help=f"comma-separated, from {', '.join(TASKS)}")
+    parser.add_argument("--concurrency", type=int, default=16, help="jobs generated at the same time")
+    parser.add_argument("--restart", action="store_true", help="overwrite the output instead of resuming it")
+    args = parser.parse_args()
+
+    tasks = tuple(task.strip() for task in args.tasks.split(",") if task.strip())
+    unknown = [task for task in tasks if task not in TASKS]
+    if unknown or not tasks:
+        parser.error(f"unknown task(s): {', '.join(unknown)}")
+    output = args.output or os.path.splitext(args.roster)[0] + "-results.jsonl"
+    try:
+        results = open_results(output, resume=not args.restart)
+    except ImportError:
+        parser.error("Parquet output needs pyarrow (pip install pyarrow)")
+
+    started = time.perf_counter()
+    last_report = [started]
+
+    def progress(counts):
+        now = time.perf_counter()
+        if now - last_report[0] >= 5:
+            last_report[0] = now
+            finished = sum(counts[status] for status in ("ok", "off_topic", "invalid", "error"))
+            print(f"{finished} jobs, {finished / (now - started) * 3600:.0f}/hour, {dict(counts)}",
+                  file=sys.stderr, flush=True)
+
+    rows = read_roster(args.roster)
+    try:
+        counts = asyncio.run(run_batch(rows, results, tasks, args.concurrency,
+                                       os.path.dirname(os.path.abspath(args.roster)), progress))
+    finally:
+        results.close()
+    elapsed = time.perf_counter() - started
+    print(f"done in {elapsed:.1f}s: {dict(counts)} -> {output}", file=sys.stderr)
+    if counts["error"]:
+        print("some jobs failed; run the same command again to retry them", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Analytics over a large synthetic history: row-by-row CSV scan vs vectorized CSV vs the Parquet store.
+
+Generates --rows topic requests (and a quarter as many study plans and a
+fiftieth as much feedback) spread over --days days in daily rotated CSV
+files, then times the popular-topic count the way prewarm.py used to do it
+(csv.DictReader and a Counter), the vectorized analytics report over the
+CSV files, the compaction into Parquet, and the report over the store.
+
+    python benchmarks/bench_analytics.py [--rows 2000000] [--days 60]
+"""
+import argparse
+import csv
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+import interaction_store
+import topic_canon
+from interaction_store import TABLES
+from log_writer import log_files
+
+SUBJECTS = list(topic_canon.TOPIC_ALIASES)
+PREFERENCES = ["Visual learning", "Practice problems", "Reading", "Video explanations"]
+RESOURCES = ["Textbook", "Lecture notes", "YouTube videos", "Past papers"]
+FEEDBACK = ["Very Helpful", "Somewhat Helpful", "Not Helpful"]
+
+
+def write_history(rows, days, seed=0):
+    """Daily rotated CSV files of the three logs under the current directory"""
+    rng = random.Random(seed)
+    topics = [(subject, spelling) for subject, table in topic_canon.TOPIC_ALIASES.items()
+              for canonical, aliases in table.items() for spelling in [canonical, canonical.title()] + aliases]
+    weights = [1 / (rank + 1) for rank in range(len(topics))]
+    start = datetime.now() - timedelta(days=days)
+    for table, count in (("topics", rows), ("interactions", rows // 4), ("feedback", rows // 50)):
+        spec = TABLES[table]
+        os.makedirs(os.path.dirname(spec["path"]), exist_ok=True)
+        stem, ext = os.path.splitext(spec["path"])
+        per_day = count // days
+        picks = rng.choices(topics, weights, k=per_day) if table == "topics" else None
+        for day in range(days):
+            date = start + timedelta(days=day)
+            with open(f"{stem}-{date:%Y%m%d}-235959{ext}", "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(spec["columns"])
+                for i in range(per_day):
+                    # Busier in the evening
+                    timestamp = date.replace(hour=0, minute=0, second=0) + timedelta(
+                        seconds=int(86400 * rng.random() ** 0.6))
+                    stamp = f"{timestamp:%Y-%m-%d %H:%M:%S}"
+                    if table == "topics":
+                        subject, topic = picks[(i + day) % per_day]
+                        writer.writerow([stamp, rng.choice(("practice_questions", "smart_prompts")), subject, topic])
+                    elif table == "interactions":
+                        writer.writerow([stamp, rng.choice(SUBJECTS), rng.randint(1, 15), rng.randint(1, 12),
+                                         rng.choice(RESOURCES), rng.choice(PREFERENCES)])
+                    else:
+                        subject = rng.choice(SUBJECTS)
+                        writer.writerow([stamp, rng.choice(FEEDBACK), "", f"## 📅 Your 3-day study plan for {subject}\n...",
+                                         subject, rng.choice(PREFERENCES)])
+
+
+def legacy_popular_topics(log_path, limit, days):
+    """prewarm.popular_topics before the analytics module: one csv.DictReader row at a time"""
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S") if days else ""
+    counts = Counter()
+    for path in log_files(log_path):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                subject = (row.get("subject") or "").strip()
+                topic = (row.get("topic") or "").strip()
+                if subject and topic and (row.get("timestamp") or "") >= since:
+                    counts[(subject, topic_canon.canonical_topic(subject, topic))] += 1
+    return [pair for pair, _ in counts.most_common(limit)]
+
+
+def timed(label, function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    print(f"{label:<44}{time.perf_counter() - started:>8.2f}s")
+    return result
+
+
+def disk_size(paths):
+    return sum(os.path.getsize(path) for path in paths) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000, help="topic requests in the history")
+    parser.add_argument("--days", type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        timed("generate history", write_history, args.rows, args.days)
+        # Timed on its own so it isn't counted in the first vectorized timing
+        timed("import pandas", importlib.import_module, "pandas")
+        csv_files = [path for spec in TABLES.values() for path in log_files(spec["path"])]
+        print(f"{len(csv_files)} CSV files, {disk_size(csv_files):.0f} MB")
+
+        legacy = timed("popular topics, row by row (legacy)", legacy_popular_topics, TABLES["topics"]["path"], 100, 0)
+        vectorized = timed("popular topics, vectorized over CSV", analytics.popular_topics, 100, None)
+        # The legacy scan returned canonical topics, popular_topics their most requested spelling
+        canonical = [(subject, topic_canon.canonical_topic(subject, topic)) for subject, topic in vectorized]
+        assert set(legacy[:20]) == set(canonical[:20]), "top topics differ"
+        timed("full report, vectorized over CSV", analytics.report, None)
+
+        rows = timed("compact into Parquet", lambda: sum(interaction_store.compact(table) for table in TABLES))
+        parquet_files = [os.path.join(root, name) for root, _, names in os.walk(interaction_store.STORE_DIR)
+                         for name in names if name.endswith(".parquet")]
+        print(f"{rows} rows in {len(parquet_files)} Parquet files, {disk_size(parquet_files):.0f} MB")
+
+        stored = timed("popular topics, Parquet store", analytics.popular_topics, 100, None)
+        assert stored == vectorized, "store and CSV disagree"
+        timed("full report, Parquet store", analytics.report, None)
+        timed("full report, Parquet store, last 7 days", analytics.report, 7)
+        os.chdir("/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Sustained requests/sec of the sync vs async request paths against the mock server.
+
+    python benchmarks/bench_async.py --concurrency 64 --duration 10 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_llm_server
+
+
+def run_sync(codelala, concurrency, duration):
+    """Each worker thread loops on the blocking client until the deadline"""
+    deadline = time.perf_counter() + duration
+    counts = [0] * concurrency
+    lock = threading.Lock()
+
+    def worker(index):
+        n = 0
+        while time.perf_counter() < deadline:
+            codelala.get_gemini_response(f"sync request {index} {n}", use_cache=False)
+            n += 1
+        with lock:
+            counts[index] = n
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return sum(counts)
+
+
+async def run_async(codelala, concurrency, duration):
+    """Each task loops on the shared async client until the deadline"""
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        n = 0
+        while time.perf_counter() < deadline:
+            await codelala.async_get_gemini_response(f"async request {index} {n}", use_cache=False)
+            n += 1
+        return n
+
+    counts = await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return sum(counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock upstream latency in seconds")
+    parser.add_argument("--tokens", type=int, default=200)
+    args = parser.parse_args()
+
+    server, url = mock_llm_server.spawn_server(latency=args.latency, tokens=args.tokens)
+    os.environ["CODELALA_API_BASE"] = url
+    os.environ["CODELALA_API_KEY"] = "mock"
+    os.environ["CODELALA_CACHE_DB"] = ""
+
+    import codelala_core
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s upstream_latency={args.latency}s "
+          f"max_inflight={codelala_core.MAX_INFLIGHT_REQUESTS}")
+
+    paths = (
+        ("sync  (thread per request)", lambda: run_sync(codelala_core, args.concurrency, args.duration), args.concurrency),
+        ("async (pooled AsyncOpenAI)", lambda: asyncio.run(run_async(codelala_core, args.concurrency, args.duration)),
+         min(args.concurrency, codelala_core.MAX_INFLIGHT_REQUESTS)),
+    )
+    try:
+        for label, run, in_flight in paths:
+            before = mock_llm_server.configure(url)["request_count"]
+            completed = run()
+            upstream = mock_llm_server.configure(url)["request_count"] - before
+            print(f"{label}: {completed / args.duration:8.1f} req/s")
+            # Unique prompts: every request is one upstream call, nothing cached or coalesced
+            assert upstream == completed, f"{completed} requests made {upstream} upstream calls"
+            # At most in_flight calls are upstream at once, and each takes the mock's latency
+            if args.latency:
+                assert completed <= (args.duration / args.latency + 1) * in_flight, "the in-flight limit was exceeded"
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Latency and peak memory of DOCX extraction: python-docx vs. the streaming extractor.
+
+python-docx parses the whole document into an lxml tree before any text
+can be read; the streaming extractor (text_extraction.iter_docx_paragraphs)
+stops at the character budget and keeps memory flat even when it reads a
+whole document. Each measurement runs in a fresh process and reports its
+peak RSS, since lxml's memory is invisible to tracemalloc.
+
+    python benchmarks/bench_docx.py [--repeat 3] [--fixtures benchmarks/fixtures]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CODELALA_EXTRACTION_DB", "")
+
+import synthetic_docx
+import text_extraction
+
+
+def normalized(paragraphs, max_chars):
+    chunks = (part for paragraph in paragraphs for part in (paragraph, "\n"))
+    return text_extraction.collect_text(text_extraction.iter_normalized_chunks(chunks), max_chars)
+
+
+def python_docx_extract(path, max_chars):
+    """python-docx: load the document, read every paragraph (table cells included), then apply the budget"""
+    import docx
+    from docx.oxml.ns import qn
+    from docx.text.paragraph import Paragraph
+
+    document = docx.Document(path)
+    paragraphs = [Paragraph(p, document).text for p in document.element.body.iter(qn("w:p"))]
+    return normalized(paragraphs, max_chars)
+
+
+def streaming_extract(path, max_chars):
+    """The streaming extractor, stopping at the budget"""
+    return normalized(text_extraction.iter_docx_paragraphs(path), max_chars)
+
+
+METHODS = {"python-docx": python_docx_extract, "streaming": streaming_extract}
+
+
+def child(name, path, max_chars, repeat):
+    """Run one method in this process; prints JSON with the best time, peak RSS growth and output"""
+    function = METHODS[name]
+    if name == "python-docx":
+        # Imported before the clock starts so python-docx's import time isn't measured
+        import docx  # noqa: F401
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = function(path, max_chars)
+        best = min(best, time.perf_counter() - started)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline  # KB on Linux
+    print(json.dumps({"seconds": best, "peak_kb": peak, "text": text}))
+
+
+def measure(name, path, max_chars, repeat):
+    output = subprocess.run([sys.executable, __file__, "--child", name, path, str(max_chars), str(repeat)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+    parser.add_argument("--child", nargs=4, metavar=("METHOD", "PATH", "MAX_CHARS", "REPEAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        name, path, max_chars, repeat = args.child
+        child(name, path, int(max_chars), int(repeat))
+        return
+
+    try:
+        import docx  # noqa: F401
+        methods = list(METHODS)
+    except ImportError:
+        print("python-docx is not installed; measuring the streaming extractor only")
+        methods = ["streaming"]
+
+    fixtures = synthetic_docx.make_fixtures(args.fixtures)
+    print(f"{'document':<20}{'budget':<10}{'method':<14}{'best time':>12}{'peak RSS':>12}")
+    for name, path in fixtures.items():
+        label = f"{name} ({os.path.getsize(path) // 1024} KB)"
+        # The prompt budget, and the whole document (where memory would grow with its size)
+        for budget_label, max_chars in (("prompt", text_extraction.MAX_CHARS), ("whole", 10 ** 10)):
+            results = {method_name: measure(method_name, path, max_chars, args.repeat) for method_name in methods}
+            texts = {result["text"] for result in results.values()}
+            assert len(texts) == 1, f"output mismatch on {name} ({budget_label})"
+            for method_name, result in results.items():
+                speedup = ""
+                if method_name == "streaming" and "python-docx" in results:
+                    speedup = f"   ({results['python-docx']['seconds'] / result['seconds']:.1f}x faster)"
+                print(f"{label:<20}{budget_label:<10}{method_name:<14}{result['seconds'] * 1000:>10.1f}ms"
+                      f"{result['peak_kb'] / 1024:>9.1f} MB{speedup}")
+                label = ""
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Latency and peak memory of full-document vs. early-stopping PDF extraction.
+
+    python benchmarks/bench_extraction.py [--repeat 3] [--fixtures benchmarks/fixtures]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CODELALA_EXTRACTION_DB", "")
+
+import PyPDF2
+
+import synthetic_pdf
+import text_extraction
+
+
+def legacy_extract(file_path, max_chars=text_extraction.MAX_CHARS):
+    """The original approach: parse every page, concatenate, normalize, then truncate"""
+    text = ""
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        for page_num in range(len(pdf_reader.pages)):
+            text += pdf_reader.pages[page_num].extract_text() + "\n"
+    text = re.sub(r'\s+', ' ', text).strip()
+    if len(text) > max_chars:
+        text = text[:max_chars] + "... [truncated]"
+    return text
+
+
+def streaming_extract(file_path, max_chars=text_extraction.MAX_CHARS):
+    """Lazy in-process page iteration that stops at the character budget (bypassing cache and pool)"""
+    chunks = (part for page_text in text_extraction.iter_pdf_pages(file_path) for part in (page_text, "\n"))
+    return text_extraction.collect_text(text_extraction.iter_normalized_chunks(chunks), max_chars)
+
+
+def concurrent_throughput(path, uploads, use_pool):
+    """Whole-document extractions per second with `uploads` request threads at once"""
+    pages = text_extraction.iter_pdf_pages_parallel if use_pool else text_extraction.iter_pdf_pages
+
+    def extract(_):
+        return text_extraction.collect_text(text_extraction.iter_normalized_chunks(pages(path)), 10 ** 9)
+
+    if use_pool:
+        extract(0)  # warm up the worker processes
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=uploads) as threads:
+        list(threads.map(extract, range(uploads)))
+    return uploads / (time.perf_counter() - started)
+
+
+def measure(func, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(path)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    result = func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+    parser.add_argument("--uploads", type=int, default=8, help="simultaneous uploads for the throughput run")
+    args = parser.parse_args()
+
+    fixtures = synthetic_pdf.make_fixtures(args.fixtures)
+    print(f"{'document':<16}{'method':<12}{'best time':>12}{'peak memory':>14}")
+    for name, path in fixtures.items():
+        label = f"{name} ({os.path.getsize(path) // 1024} KB)"
+        legacy_time, legacy_peak, legacy_text = measure(legacy_extract, path, args.repeat)
+        stream_time, stream_peak, stream_text = measure(streaming_extract, path, args.repeat)
+        assert legacy_text == stream_text, f"output mismatch on {name}"
+        print(f"{label:<16}{'legacy':<12}{legacy_time * 1000:>10.1f}ms{legacy_peak / 1024:>11.0f} KB")
+        print(f"{'':<16}{'streaming':<12}{stream_time * 1000:>10.1f}ms{stream_peak / 1024:>11.0f} KB"
+              f"   ({legacy_time / stream_time:.1f}x faster)")
+
+    path = fixtures["medium"]
+    print(f"\n{args.uploads} simultaneous whole-document uploads of the medium PDF "
+          f"({text_extraction.EXTRACTION_WORKERS} pool workers, {os.cpu_count()} CPUs):")
+    print(f"  request threads: {concurrent_throughput(path, args.uploads, use_pool=False):6.2f} docs/s")
+    print(f"  process pool:    {concurrent_throughput(path, args.uploads, use_pool=True):6.2f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
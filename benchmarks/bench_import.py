@@ -0,0 +1,117 @@
+"""Cold import cost of the core API and the Gradio app, measured with `python -X importtime`.
+
+Each module is imported in a fresh interpreter --repeat times; the median is
+reported with its heaviest direct imports. Fails if the core pulls in any of
+the UI/client dependencies it is supposed to load lazily.
+
+    python benchmarks/bench_import.py [--repeat 5] [--top 8] [--save] [--compare latest]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from load_test import REPO_DIR, RESULTS_DIR, git_commit, latest_results
+
+MODULES = ("codelala_core", "CodeLala")
+# Must not be imported by codelala_core itself, only on first use
+LAZY = ("gradio", "pandas", "openai", "httpx", "PyPDF2")
+
+
+def parse_importtime(stderr, module):
+    """(cumulative seconds of module, {direct import: cumulative seconds}) from -X importtime output"""
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # the header
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 1:
+            children[name.strip()] = seconds
+        elif depth == 0:
+            if name.strip() == module:
+                return seconds, children
+            children = {}
+    raise RuntimeError(f"{module} not found in the importtime output")
+
+
+def measure(module, workdir):
+    """Import module in a fresh interpreter; returns (import seconds, wall seconds, direct imports, lazy modules loaded)"""
+    code = f"import sys, {module}; print(','.join(m for m in {LAZY!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, CODELALA_METRICS_PORT="")
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=workdir, env=env,
+                             capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if process.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{process.stderr[-2000:]}")
+    seconds, children = parse_importtime(process.stderr, module)
+    loaded = [name for name in process.stdout.strip().split(",") if name]
+    return seconds, wall, children, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest direct imports to show")
+    parser.add_argument("--save", action="store_true", help=f"store the results in {RESULTS_DIR}")
+    parser.add_argument("--compare", default=None, help="results file to compare with, or 'latest'")
+    args = parser.parse_args()
+
+    baseline_path = latest_results("importtime") if args.compare == "latest" else args.compare
+    results = {"started": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(), "modules": {}}
+    failed = False
+    # A scratch directory, so caches the modules open at import time don't land in the repo
+    with tempfile.TemporaryDirectory() as workdir:
+        for module in MODULES:
+            runs = [measure(module, workdir) for _ in range(args.repeat)]
+            seconds = statistics.median(run[0] for run in runs)
+            wall = statistics.median(run[1] for run in runs)
+            children = {}
+            for run in runs:
+                for name, value in run[2].items():
+                    children.setdefault(name, []).append(value)
+            children = {name: statistics.median(values) for name, values in children.items()}
+            loaded = runs[0][3]
+            results["modules"][module] = {"import_ms": seconds * 1000, "wall_ms": wall * 1000, "loaded": loaded,
+                                          "imports_ms": {name: value * 1000 for name, value in children.items()}}
+
+            print(f"{module}: import {seconds * 1000:.0f} ms, interpreter start to exit {wall * 1000:.0f} ms"
+                  f" (median of {args.repeat}); loaded: {', '.join(loaded) or 'none of ' + ', '.join(LAZY)}")
+            for name, value in sorted(children.items(), key=lambda item: -item[1])[:args.top]:
+                print(f"    {name:<32}{value * 1000:>8.1f} ms")
+            if module == "codelala_core" and loaded:
+                print(f"  ERROR: codelala_core should not import {', '.join(loaded)}")
+                failed = True
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"importtime-{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}.json")
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved {path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"\nvs. {baseline.get('commit', '?')} ({baseline.get('started', '?')})")
+        for module, current in results["modules"].items():
+            before = baseline["modules"].get(module)
+            if before:
+                change = current["import_ms"] / before["import_ms"] - 1
+                print(f"{module:<16}{before['import_ms']:>8.0f} ms -> {current['import_ms']:>6.0f} ms {change:>+6.0%}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
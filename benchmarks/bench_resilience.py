@@ -0,0 +1,152 @@
+"""Retries, deadlines, hedging and the circuit breaker against a mock server that injects latency and errors.
+
+    python benchmarks/bench_resilience.py --calls 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_llm_server
+from resilience import CircuitBreaker, CircuitOpenError, TaskPolicy
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_calls(codelala, task, calls, concurrency, stream=False):
+    """Unique prompts through the sync path; returns (latencies of successes, errors)"""
+    def one(i):
+        prompt = f"{task} {i} {time.time()}"
+        started = time.perf_counter()
+        try:
+            if stream:
+                "".join(codelala.stream_gemini_response(prompt, use_cache=False, task=task))
+            else:
+                codelala.get_gemini_response(prompt, use_cache=False, task=task)
+        except codelala.UpstreamError as e:
+            return None, e
+        return time.perf_counter() - started, None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(calls)))
+    return [r for r, _ in results if r is not None], [e for _, e in results if e is not None]
+
+
+async def run_async_calls(codelala, task, calls, concurrency, stream=False):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        prompt = f"{task} {i} {time.time()}"
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if stream:
+                    "".join([chunk async for chunk in codelala.async_stream_gemini_response(prompt, use_cache=False, task=task)])
+                else:
+                    await codelala.async_get_gemini_response(prompt, use_cache=False, task=task)
+            except codelala.UpstreamError as e:
+                return None, e
+            return time.perf_counter() - started, None
+
+    results = await asyncio.gather(*(one(i) for i in range(calls)))
+    return [r for r, _ in results if r is not None], [e for _, e in results if e is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    server = mock_llm_server.start_server(latency=0.02, tokens=20)
+    os.environ["CODELALA_API_BASE"] = mock_llm_server.base_url(server)
+    os.environ["CODELALA_API_KEY"] = "mock"
+    os.environ["CODELALA_CACHE_DB"] = ""
+
+    import codelala_core
+
+    upstream = codelala_core.upstream
+    loop = asyncio.new_event_loop()
+    calls, concurrency = args.calls, args.concurrency
+
+    def scenario(name, policy, config, mode="sync", count=calls, parallel=concurrency):
+        """Run count calls under policy (as their own task) against the mock configured with config"""
+        server.config.update(config)
+        upstream.policies[name] = policy
+        upstream.breaker = CircuitBreaker(failure_threshold=10 ** 6)
+        before = server.request_count
+        if mode.startswith("async"):
+            latencies, errors = loop.run_until_complete(
+                run_async_calls(codelala_core, name, count, parallel, stream=mode.endswith("stream")))
+        else:
+            latencies, errors = run_calls(codelala_core, name, count, parallel, stream=mode.endswith("stream"))
+
+        line = f"{name:<34}{len(latencies) / count:>8.0%}{server.request_count - before:>10}"
+        if latencies:
+            line += "".join(f"{percentile(latencies, q) * 1000:>8.0f}ms" for q in (0.5, 0.95, 0.99))
+        print(line)
+        return errors
+
+    healthy = {"latency": 0.02, "error_rate": 0.0, "slow_rate": 0.0, "retry_after": None, "error_status": 503}
+    no_retry = TaskPolicy(timeout=5, deadline=10, max_attempts=1)
+    retry = TaskPolicy(timeout=5, deadline=10, max_attempts=4, backoff_base=0.05, backoff_max=0.5)
+    hedge = TaskPolicy(timeout=5, deadline=10, max_attempts=1, hedge=True, hedge_after=0.1)
+
+    print(f"{'scenario':<34}{'success':>8}{'upstream':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+
+    # 30% of requests fail with 503 + Retry-After
+    flaky = dict(healthy, error_rate=0.3, retry_after=0.05)
+    scenario("flaky, no retries", no_retry, flaky)
+    for mode in ("sync", "sync stream", "async", "async stream"):
+        # 4 attempts at 30% failure leave ~0.8% of calls failing
+        assert len(scenario(f"flaky, retries ({mode})", retry, flaky, mode)) <= calls * 0.03, "retries did not absorb the errors"
+
+    # 3% of requests take 1s instead of 20ms
+    tail = dict(healthy, slow_rate=0.03, slow_latency=1.0)
+    scenario("slow tail, no hedging", no_retry, tail)
+    scenario("slow tail, hedged (sync)", hedge, tail)
+    scenario("slow tail, hedged (async)", hedge, tail, "async")
+    print(f"  hedged={upstream.hedged} hedge_wins={upstream.hedge_wins}")
+
+    # Upstream hangs for 3s: each call gives up at its 0.5s deadline
+    short = TaskPolicy(timeout=0.2, deadline=0.5, max_attempts=3, backoff_base=0.05)
+    started = time.perf_counter()
+    errors = scenario("hung upstream, 0.5s deadline", short, dict(healthy, latency=3.0), count=10, parallel=10)
+    elapsed = time.perf_counter() - started
+    assert len(errors) == 10 and elapsed < 1.5, f"deadline not enforced ({elapsed:.2f}s)"
+    print(f"  10 calls failed with UpstreamError after {elapsed:.2f}s")
+
+    # Outage: the breaker opens and calls fail fast, then a probe closes it again
+    server.config.update(dict(healthy, error_rate=1.0))
+    upstream.policies["outage"] = TaskPolicy(timeout=1, deadline=2, max_attempts=1)
+    upstream.breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0.5)
+    before = server.request_count
+    latencies, errors = run_calls(codelala_core, "outage", 50, 1)
+    rejected = [e for e in errors if isinstance(e, CircuitOpenError)]
+    print(f"outage: {len(errors)}/50 failed, {server.request_count - before} reached upstream, "
+          f"{len(rejected)} rejected by the open breaker")
+    assert server.request_count - before == 5 and upstream.breaker.state == "open"
+
+    server.config.update(healthy)
+    time.sleep(0.6)
+    latencies, errors = run_calls(codelala_core, "outage", 10, 1)
+    print(f"recovered: {len(latencies)}/10 succeeded, breaker {upstream.breaker.state}")
+    assert not errors and upstream.breaker.state == "closed"
+
+    # Let cancelled hedge attempts finish unwinding before the loop closes
+    pending = asyncio.all_tasks(loop)
+    if pending:
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+    loop.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Build and query latency of the local materials index at increasing sizes.
+
+    python benchmarks/bench_retrieval.py --sizes 10000,100000,1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from material_index import MaterialIndex
+from synthetic_pdf import VOCABULARY
+
+SUBJECTS = ("Operating Systems (OS)", "Computer Networks (CN)", "Database Management Systems (DBMS)")
+
+# Real text is Zipfian: a few very common words and a long tail of rare ones.
+# Term i is drawn with weight 1/(i+1) from a 20k-term vocabulary.
+TERMS = list(VOCABULARY) + [f"term{i}" for i in range(20000 - len(VOCABULARY))]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(TERMS))))
+
+
+def synthetic_chunks(count, rng, words_per_chunk=60):
+    for i in range(count):
+        words = rng.choices(TERMS, cum_weights=CUMULATIVE_WEIGHTS, k=words_per_chunk)
+        words.append(f"section{i}")  # keeps every chunk unique
+        yield " ".join(words) + "."
+
+
+def topic_query(rng):
+    """A few mid-frequency terms, like a student's topic"""
+    return " ".join(rng.choice(TERMS[50:5000]) for _ in range(3))
+
+
+def build(path, size, rng, batch=5000):
+    index = MaterialIndex(path)
+    started = time.perf_counter()
+    chunks = synthetic_chunks(size, rng)
+    added = 0
+    while added < size:
+        subject = SUBJECTS[(added // batch) % len(SUBJECTS)]
+        batch_chunks = [next(chunks) for _ in range(min(batch, size - added))]
+        added += index.add_chunks(subject, batch_chunks)
+    return index, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated chunk counts")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'chunks':>10}{'build':>10}{'chunks/s':>11}{'db size':>10}{'p50':>9}{'p95':>9}{'max':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        workdir = tempfile.mkdtemp(prefix="codelala-index-")
+        try:
+            path = os.path.join(workdir, "index.sqlite3")
+            index, build_seconds = build(path, size, rng)
+
+            # Re-adding the same chunks must be a no-op (deduplication)
+            sample = list(synthetic_chunks(100, random.Random(size)))
+            index.add_chunks(SUBJECTS[0], sample)
+            assert index.add_chunks(SUBJECTS[0], sample) == 0
+
+            latencies = []
+            for _ in range(args.queries):
+                query = topic_query(rng)
+                started = time.perf_counter()
+                index.search(rng.choice(SUBJECTS), query, k=args.k)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+
+            db_mb = sum(os.path.getsize(os.path.join(workdir, f)) for f in os.listdir(workdir)) / 1024 / 1024
+            print(f"{size:>10}{build_seconds:>9.1f}s{size / build_seconds:>11.0f}{db_mb:>8.0f}MB"
+                  f"{statistics.median(latencies):>7.1f}ms{latencies[int(len(latencies) * 0.95)]:>7.1f}ms"
+                  f"{latencies[-1]:>7.1f}ms")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Task routing, fallback on errors and on latency-SLO breaches, across two local mock backends.
+
+Backend "primary" serves a small, cheap model for smart prompts and a large
+one for study plans; backend "secondary" is the fallback for both. Each phase
+reconfigures primary and reports where the calls went, their latency and
+the estimated cost per route.
+
+    python benchmarks/bench_router.py --calls 60 --concurrency 6
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_llm_server
+from bench_resilience import percentile
+
+HEALTHY = {"latency": 0.05, "error_rate": 0.0, "error_status": 503, "tokens": 400}
+PHASES = [
+    ("healthy", {}),
+    ("primary returns 503s", {"error_rate": 1.0}),
+    ("primary recovered", {}),
+    ("primary slower than SLO", {"latency": 0.6}),
+]
+TASKS = ("prompts", "plan")
+
+
+def route_config(primary_url, secondary_url, slo):
+    return {
+        "backends": {"primary": {"base_url": primary_url, "api_key": "mock"},
+                     "secondary": {"base_url": secondary_url, "api_key": "mock"}},
+        "routes": {
+            "prompts": [{"backend": "primary", "model": "small", "max_tokens": 150, "temperature": 0.9, "slo": slo},
+                        {"backend": "secondary", "model": "large", "max_tokens": 150, "temperature": 0.9}],
+            "plan": [{"backend": "primary", "model": "large", "max_tokens": 400, "temperature": 0.7},
+                     {"backend": "secondary", "model": "large", "max_tokens": 400, "temperature": 0.7}],
+        },
+        "prices": {"small": [0.05, 0.2], "large": [0.5, 2.0]},
+    }
+
+
+async def run_calls(codelala, task, calls, concurrency, stream):
+    """Unique prompts through the async path; returns (latencies of successes, error count)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        prompt = f"{task} {i} {time.time()}"
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if stream:
+                    "".join([chunk async for chunk in codelala.async_stream_gemini_response(prompt, use_cache=False, task=task)])
+                else:
+                    await codelala.async_get_gemini_response(prompt, use_cache=False, task=task)
+            except codelala.UpstreamError:
+                return None
+            return time.perf_counter() - started
+
+    results = await asyncio.gather(*(one(i) for i in range(calls)))
+    return [r for r in results if r is not None], sum(1 for r in results if r is None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=60, help="calls per task and phase")
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--slo", type=float, default=0.4, help="p95 latency SLO of the smart prompts route")
+    parser.add_argument("--stream", action="store_true", help="stream the responses (SLO on the first chunk)")
+    args = parser.parse_args()
+
+    primary = mock_llm_server.start_server(**HEALTHY)
+    secondary = mock_llm_server.start_server(**dict(HEALTHY, latency=0.1))
+    os.environ["CODELALA_API_BASE"] = mock_llm_server.base_url(primary)
+    os.environ["CODELALA_API_KEY"] = "mock"
+    os.environ["CODELALA_CACHE_DB"] = ""
+    os.environ["CODELALA_METRICS_PORT"] = ""
+    os.environ["CODELALA_BREAKER_RESET"] = "1"
+    os.environ["CODELALA_RESILIENCE"] = json.dumps({
+        task: {"timeout": 5, "deadline": 10, "max_attempts": 2, "backoff_base": 0.05, "hedge": False} for task in TASKS})
+    os.environ["CODELALA_ROUTES"] = json.dumps(
+        route_config(mock_llm_server.base_url(primary), mock_llm_server.base_url(secondary), args.slo))
+
+    import codelala_core
+    import model_router
+
+    model_router.SLO_COOLDOWN = 5.0
+    router = codelala_core.get_router()
+    loop = asyncio.new_event_loop()
+    # Clients and connections are set up before anything is timed
+    for task in TASKS:
+        loop.run_until_complete(run_calls(codelala_core, task, args.concurrency, args.concurrency, args.stream))
+    router.fallbacks = router.slo_skips = 0
+    router._route_stats.clear()
+
+    print(f"{'phase':<26}{'task':<9}{'ok':>6}{'primary':>9}{'secondary':>11}{'p50':>9}{'p95':>9}"
+          f"{'fallbacks':>11}{'slo skips':>11}")
+    for phase, config in PHASES:
+        primary.config.update(HEALTHY, **config)
+        if phase == "primary recovered":
+            time.sleep(1.1)  # the breaker's reset timeout
+        for task in TASKS:
+            counts = (primary.request_count, secondary.request_count, router.fallbacks, router.slo_skips)
+            latencies, errors = loop.run_until_complete(
+                run_calls(codelala_core, task, args.calls, args.concurrency, args.stream))
+            line = (f"{phase:<26}{task:<9}{len(latencies) / args.calls:>6.0%}"
+                    f"{primary.request_count - counts[0]:>9}{secondary.request_count - counts[1]:>11}")
+            line += "".join(f"{percentile(latencies, q) * 1000:>7.0f}ms" for q in (0.5, 0.95)) if latencies else " " * 18
+            print(line + f"{router.fallbacks - counts[2]:>11}{router.slo_skips - counts[3]:>11}")
+            # The fallback route answers whatever primary can't
+            assert not errors, f"{errors} {task} calls failed in phase {phase!r}"
+            if phase == "healthy":
+                assert secondary.request_count == counts[1], "calls fell back while primary was healthy"
+            if phase == "primary returns 503s":
+                assert secondary.request_count - counts[1] == args.calls, "calls were not moved to the fallback"
+            if phase == "primary slower than SLO" and task == "prompts":
+                assert router.slo_skips > counts[3], "the slow primary route was not demoted"
+
+    print(f"\n{'route':<20}{'calls':>7}{'failures':>10}{'p50':>9}{'p95':>9}{'cost':>12}")
+    for name, stats in router.stats()["routes"].items():
+        if name.startswith(("primary", "secondary")):
+            latency = "".join(f"{stats[q] * 1000:>7.0f}ms" if stats[q] is not None else f"{'-':>9}"
+                              for q in ("p50", "p95"))
+            print(f"{name:<20}{stats['calls']:>7}{stats['failures']:>10}{latency}{stats['cost']:>12.6f}")
+    print(f"models requested: primary {dict(primary.model_counts)}, secondary {dict(secondary.model_counts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Concurrent identical requests against the mock server, with and without coalescing.
+
+    python benchmarks/bench_singleflight.py --callers 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_llm_server
+
+PROMPT = "Generate smart prompts for Operating Systems (OS): Deadlocks"
+
+
+def run_threads(codelala, callers, call):
+    """callers threads make the same call at once; returns (results or exceptions, seconds)"""
+    def guarded(_):
+        try:
+            return call()
+        except Exception as e:
+            return e
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(guarded, range(callers)))
+    return results, time.perf_counter() - started
+
+
+async def run_tasks(callers, call):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(callers)), return_exceptions=True)
+    return results, time.perf_counter() - started
+
+
+async def collect(chunks):
+    return "".join([chunk async for chunk in chunks])
+
+
+def report(name, server, before, results, seconds, stats_before, stats_after):
+    errors = [r for r in results if isinstance(r, Exception)]
+    values = {r for r in results if not isinstance(r, Exception)}
+    collapsed = stats_after["collapsed"] - stats_before["collapsed"]
+    print(f"{name:<22}{len(results):>8}{server.request_count - before:>10}{collapsed:>11}"
+          f"{len(values):>9}{len(errors):>8}{seconds:>9.2f}s")
+    return errors, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="mock upstream latency in seconds")
+    parser.add_argument("--tokens", type=int, default=100)
+    args = parser.parse_args()
+
+    # In-process server so upstream requests can be counted
+    server = mock_llm_server.start_server(latency=args.latency, tokens=args.tokens, token_delay=0.002)
+    os.environ["CODELALA_API_BASE"] = mock_llm_server.base_url(server)
+    os.environ["CODELALA_API_KEY"] = "mock"
+    os.environ["CODELALA_CACHE_DB"] = ""
+
+    import codelala_core
+
+    # One event loop for every async case; the pooled async client's connections belong to it
+    loop = asyncio.new_event_loop()
+    sync_flight = codelala_core.inflight_requests
+    async_flight = codelala_core.async_inflight_requests
+    cases = [
+        ("sync", sync_flight, lambda: run_threads(codelala_core, args.callers, lambda: codelala_core.get_gemini_response(PROMPT + " 1", use_cache=False))),
+        ("sync stream", sync_flight, lambda: run_threads(codelala_core, args.callers, lambda: "".join(codelala_core.stream_gemini_response(PROMPT + " 2", use_cache=False)))),
+        ("async", async_flight, lambda: loop.run_until_complete(run_tasks(args.callers, lambda: codelala_core.async_get_gemini_response(PROMPT + " 3", use_cache=False)))),
+        ("async stream", async_flight, lambda: loop.run_until_complete(run_tasks(args.callers, lambda: collect(codelala_core.async_stream_gemini_response(PROMPT + " 4", use_cache=False))))),
+    ]
+
+    print(f"callers={args.callers} upstream_latency={args.latency}s")
+    print(f"{'path':<22}{'callers':>8}{'upstream':>10}{'collapsed':>11}{'results':>9}{'errors':>8}{'time':>10}")
+    for name, flight, run in cases:
+        before, stats_before = server.request_count, flight.stats()
+        results, seconds = run()
+        errors, values = report(name, server, before, results, seconds, stats_before, flight.stats())
+        assert not errors and len(values) == 1, f"{name}: callers did not all get the same response"
+
+    # Every waiter sees the upstream error, not just the caller that made the request
+    server.config["error_rate"] = 1.0
+    server.config["error_status"] = 400
+    for name, flight, run in cases:
+        before, stats_before = server.request_count, flight.stats()
+        results, seconds = run()
+        errors, _ = report(name + " (error)", server, before, results, seconds, stats_before, flight.stats())
+        assert len(errors) == args.callers, f"{name}: the error did not reach every caller"
+
+    loop.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
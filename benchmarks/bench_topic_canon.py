@@ -0,0 +1,139 @@
+"""Response-cache hit rate with exact vs canonicalized topics, replaying the topic request log.
+
+Every logged practice-questions/smart-prompts request is replayed in order
+against an idealized cache (unbounded, entries expire after --ttl) keyed by
+feature, subject and topic, once with the topic as typed and once with its
+canonical form, which is what answers are now cached under.
+
+    python benchmarks/bench_topic_canon.py [--log logs/topic_requests.csv] [--top 10]
+    python benchmarks/bench_topic_canon.py --synthetic 20000   # no production log at hand
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CODELALA_METRICS_PORT", "")
+
+import codelala_core
+import topic_canon
+from log_writer import log_files
+from prewarm import TOPIC_LOG, parse_duration
+
+# Topics outside the alias tables, to check canonicalization doesn't need one
+EXTRA_TOPICS = {
+    "Data Structures & Algorithms (DSA)": ["red black tree", "merge sort", "topological sort", "trie"],
+    "Operating Systems (OS)": ["semaphore", "thrashing", "file allocation method"],
+    "Computer Networks (CN)": ["sliding window protocol", "routing algorithm", "ip addressing"],
+    "Machine Learning (ML)": ["gradient descent", "decision tree", "logistic regression"],
+}
+
+
+def variants(topic, aliases):
+    """Ways students type topic"""
+    title = topic.title()
+    words = topic.split()
+    plural = " ".join(words[:-1] + [words[-1] + ("es" if words[-1].endswith(("s", "x", "ch", "sh")) else "s")])
+    return [topic, title, topic.upper(), plural, plural.title(), topic.replace(" ", "-"), f"{title} basics",
+            f"Introduction to {plural}", f"  {title}!", f"the {topic}"] + list(aliases)
+
+
+def synthetic_log(path, requests, seed=0):
+    """A topic log with Zipf-distributed topics typed in assorted variants, spread over a week"""
+    rng = random.Random(seed)
+    pairs = []
+    for subject in codelala_core.SUBJECTS:
+        topics = dict(topic_canon.TOPIC_ALIASES.get(subject, {}))
+        topics.update({topic: [] for topic in EXTRA_TOPICS.get(subject, [])})
+        pairs.extend((subject, topic, variants(topic, aliases)) for topic, aliases in topics.items())
+    rng.shuffle(pairs)
+    weights = [1 / (rank + 1) for rank in range(len(pairs))]
+    start = datetime.now() - timedelta(days=7)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "feature", "subject", "topic"])
+        for i in range(requests):
+            subject, _, spellings = rng.choices(pairs, weights)[0]
+            timestamp = start + timedelta(seconds=i * 7 * 86400 / requests)
+            feature = rng.choice(("practice_questions", "smart_prompts"))
+            writer.writerow([f"{timestamp:%Y-%m-%d %H:%M:%S}", feature, subject, rng.choice(spellings)])
+
+
+def read_requests(log_path):
+    rows = []
+    for path in log_files(log_path):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("subject") and (row.get("topic") or "").strip():
+                    rows.append((row.get("timestamp") or "", row.get("feature") or "", row["subject"], row["topic"].strip()))
+    rows.sort()
+    return rows
+
+
+def replay(rows, key, ttl):
+    """{feature: (hits, lookups)} of an unbounded cache with the given key function and TTL"""
+    stored = {}
+    hits, lookups = Counter(), Counter()
+    for timestamp, feature, subject, topic in rows:
+        cache_key = (feature, subject, key(subject, topic))
+        now = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp() if timestamp else 0
+        lookups[feature] += 1
+        if cache_key in stored and now - stored[cache_key] < ttl:
+            hits[feature] += 1
+        else:
+            stored[cache_key] = now
+    return {feature: (hits[feature], lookups[feature]) for feature in lookups}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--log", default=TOPIC_LOG, help="topic request log (rotated files are included)")
+    parser.add_argument("--synthetic", type=int, default=0, help="replay this many generated requests instead")
+    parser.add_argument("--ttl", default=str(codelala_core.response_cache.ttl), help="cache TTL, e.g. 7d")
+    parser.add_argument("--top", type=int, default=10, help="canonical topics with the most spellings to show")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        log_path = args.log
+        if args.synthetic:
+            log_path = os.path.join(workdir, "topic_requests.csv")
+            synthetic_log(log_path, args.synthetic)
+        rows = read_requests(log_path)
+    if not rows:
+        parser.error(f"no requests in {args.log}; pass --synthetic N to replay generated ones")
+    # Off-topic requests never reach the cache
+    rows = [row for row in rows if codelala_core.topic_gate.is_study_topic(row[2], row[3])]
+    ttl = parse_duration(args.ttl)
+
+    exact = replay(rows, lambda subject, topic: topic, ttl)
+    canonical = replay(rows, codelala_core.canonical_topic, ttl)
+    print(f"{len(rows)} requests, {len({(r[2], r[3]) for r in rows})} distinct topics as typed, "
+          f"{len({(r[2], codelala_core.canonical_topic(r[2], r[3])) for r in rows})} canonical")
+    print(f"{'feature':<22}{'exact':>9}{'canonical':>11}{'model calls saved':>19}")
+    for feature in sorted(exact) + ["all"]:
+        if feature == "all":
+            before = [sum(values) for values in zip(*exact.values())]
+            after = [sum(values) for values in zip(*canonical.values())]
+        else:
+            before, after = exact[feature], canonical[feature]
+        misses_before, misses_after = before[1] - before[0], after[1] - after[0]
+        print(f"{feature:<22}{before[0] / before[1]:>9.1%}{after[0] / after[1]:>11.1%}"
+              f"{1 - misses_after / misses_before if misses_before else 0:>19.1%}")
+        # Canonical keys only ever merge entries, so they can't miss where exact keys hit
+        assert after[0] >= before[0], f"canonical topics lost cache hits for {feature}"
+
+    spellings = defaultdict(set)
+    for _, _, subject, topic in rows:
+        spellings[(subject, codelala_core.canonical_topic(subject, topic))].add(topic)
+    print("\ncanonical topics with the most spellings:")
+    for (subject, topic), typed in sorted(spellings.items(), key=lambda item: -len(item[1]))[:args.top]:
+        print(f"  {topic!r} ({subject}): {len(typed)}, e.g. {', '.join(sorted(typed)[:4])}")
+
+
+if __name__ == "__main__":
+    main()
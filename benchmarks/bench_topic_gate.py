@@ -0,0 +1,113 @@
+"""Accuracy and per-call cost of the topic gate against the keyword scan it replaced.
+
+Runs both classifiers over a labeled set of subject/topic pairs (an empty
+topic means a subject-only request, as for study plans) and times them.
+The set includes curriculum topics that contain blocklisted words
+(traveling salesman, third-party libraries, Cook-Levin, pie charts) and
+off-topic requests the gate still lets through, so it is not all passes.
+
+    python benchmarks/bench_topic_gate.py [--labels topic_labels.csv] [--repeat 200]
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import topic_gate
+
+LABELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "topic_labels.csv")
+
+LEGACY_KEYWORDS = [
+    "algorithm", "data structure", "programming", "software", "database",
+    "operating system", "network", "machine learning", "artificial intelligence",
+    "web", "development", "computation", "architecture", "compiler", "memory",
+    "process", "thread", "sql", "query", "normalization", "index", "transaction",
+    "protocol", "routing", "encryption", "security", "api", "interface",
+    "calculus", "algebra", "geometry", "statistics", "probability", "theorem",
+    "equation", "function", "matrix", "vector", "differential", "integral",
+    "theory", "concept", "principle", "law", "formula", "method", "analysis",
+    "design", "evaluation", "research", "study", "experiment", "model"
+]
+LEGACY_SUBJECTS = [
+    "data structures & algorithms", "dsa", "operating systems", "os", "database management systems", "dbms",
+    "computer networks", "cn", "machine learning", "ml", "web development", "software engineering",
+    "artificial intelligence", "theory of computation", "computer architecture"
+]
+
+
+def legacy_is_study_topic(subject, topic):
+    """The per-call substring scan the gate replaced (only practice questions were gated)"""
+    study_related_keywords = list(LEGACY_KEYWORDS)
+    predefined_subjects = list(LEGACY_SUBJECTS)
+    is_study_related = any(keyword.lower() in topic.lower() or keyword.lower() in subject.lower()
+                           for keyword in study_related_keywords)
+    is_predefined_subject = any(sub.lower() in subject.lower() for sub in predefined_subjects)
+    return is_study_related or is_predefined_subject
+
+
+def new_is_study_topic(subject, topic):
+    return topic_gate.is_study_topic(subject, topic or None)
+
+
+def uncached_is_study_topic(subject, topic):
+    return topic_gate.classify.__wrapped__(subject, topic or None)[0]
+
+
+def read_labels(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["subject"], row["topic"], row["label"] == "study") for row in csv.DictReader(f)]
+
+
+def evaluate(classify, labeled):
+    """(accuracy, off-topic recall, study recall, misclassified pairs)"""
+    wrong = [(subject, topic, expected) for subject, topic, expected in labeled
+             if classify(subject, topic) != expected]
+    off_topic = sum(1 for _, _, expected in labeled if not expected)
+    study = len(labeled) - off_topic
+    missed_off_topic = sum(1 for _, _, expected in wrong if not expected)
+    missed_study = len(wrong) - missed_off_topic
+    return 1 - len(wrong) / len(labeled), 1 - missed_off_topic / off_topic, 1 - missed_study / study, wrong
+
+
+def time_per_call(classify, labeled, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for subject, topic, _ in labeled:
+            classify(subject, topic)
+    return (time.perf_counter() - started) / (repeat * len(labeled))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", default=LABELS, help="CSV with subject, topic and label (study/off_topic)")
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the labeled set when timing")
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args()
+
+    labeled = read_labels(args.labels)
+    print(f"{len(labeled)} labeled requests ({sum(1 for *_, study in labeled if not study)} off-topic)")
+    print(f"{'classifier':<22}{'accuracy':>10}{'off-topic':>11}{'study':>8}{'per call':>12}")
+    results = {}
+    for name, classify in (("legacy keyword scan", legacy_is_study_topic),
+                           ("topic gate (cold)", uncached_is_study_topic),
+                           ("topic gate (cached)", new_is_study_topic)):
+        accuracy, off_topic_recall, study_recall, wrong = evaluate(classify, labeled)
+        results[name] = accuracy, study_recall
+        seconds = time_per_call(classify, labeled, args.repeat)
+        print(f"{name:<22}{accuracy:>10.1%}{off_topic_recall:>11.1%}{study_recall:>8.1%}{seconds * 1e6:>10.1f}µs")
+        if args.show_errors:
+            for subject, topic, expected in wrong:
+                print(f"    {'missed' if expected else 'let through'}: {subject} / {topic or '(subject only)'}")
+
+    # Turning away a real study request is the costly mistake; letting an off-topic one through costs a model call
+    for name in ("topic gate (cold)", "topic gate (cached)"):
+        accuracy, study_recall = results[name]
+        assert study_recall == 1.0, f"{name} rejects study requests (run with --show-errors)"
+        assert accuracy > results["legacy keyword scan"][0], f"{name} is less accurate than the keyword scan"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Throughput of one app worker vs N under workers.py, against the mock LLM server.
+
+For each worker count, starts the supervisor in a scratch directory and
+drives the Gradio API with closed-loop clients, each pinned to one worker
+as a sticky load balancer would. Two phases per run:
+
+  unique  every request has its own topic, so each one calls the model
+  shared  the clients cycle through --shared topics, so every topic should
+          be answered once across all workers and then come from the
+          shared cache
+
+After the supervisor stops, the single log writer's CSV is checked to hold
+exactly one row per request. Scaling is bounded by the cores available.
+
+    python benchmarks/bench_workers.py [--workers 4] [--concurrency 32] [--duration 15]
+"""
+import argparse
+import csv
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import mock_llm_server
+from load_test import MOCK_CONFIG, request_inputs, summarize
+from interaction_store import TABLES
+from log_writer import log_files
+from workers import Supervisor
+
+
+def free_ports(count, host="127.0.0.1"):
+    """The first of count consecutive free ports"""
+    while True:
+        first = mock_llm_server.free_port(host)
+        sockets = []
+        try:
+            for port in range(first, first + count):
+                sock = socket.socket()
+                sock.bind((host, port))
+                sockets.append(sock)
+            return first
+        except OSError:
+            continue
+        finally:
+            for sock in sockets:
+                sock.close()
+
+
+def wait_http(url, timeout=120):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise RuntimeError(f"{url} did not come up")
+            time.sleep(0.5)
+
+
+def drive(urls, concurrency, duration, topic):
+    """Closed-loop smart prompts clients, client i on worker i % len(urls); returns (latencies, errors)"""
+    from gradio_client import Client
+
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(index):
+        client = Client(urls[index % len(urls)], verbose=False, download_files=False)
+        n = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                client.predict(*request_inputs("smart_prompts", topic(index, n), None), api_name="/smart_prompts")
+                failed = False
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                if failed:
+                    errors[0] += 1
+                else:
+                    latencies.append(elapsed)
+            n += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    return latencies, errors[0]
+
+
+def logged_rows(path):
+    """Rows in a CSV log and its rotated files; raises if a row doesn't have the header's columns"""
+    rows = 0
+    for name in log_files(path):
+        with open(name, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            for row in reader:
+                if len(row) != len(header):
+                    raise ValueError(f"corrupt row in {name}: {row}")
+                rows += 1
+    return rows
+
+
+def run(workers, mock_url, args):
+    workdir = tempfile.mkdtemp(prefix=f"codelala-workers-{workers}-")
+    os.chdir(workdir)
+    supervisor = Supervisor(workers, port=free_ports(workers), quiet=True).start()
+    results = {}
+    requests = 0
+    try:
+        for url in supervisor.urls():
+            wait_http(url)
+        phases = (("unique", lambda index, n: f"{index}-{n}-{time.time_ns()}"),
+                  ("shared", lambda index, n: f"shared-{(index + n) % args.shared}"))
+        for phase, topic in phases:
+            before = mock_llm_server.configure(mock_url)["request_count"]
+            started = time.perf_counter()
+            latencies, errors = drive(supervisor.urls(), args.concurrency, args.duration, topic)
+            elapsed = time.perf_counter() - started
+            upstream = mock_llm_server.configure(mock_url)["request_count"] - before
+            results[phase] = summarize(latencies, errors, 0, elapsed, upstream, (None, None))
+            requests += len(latencies) + errors
+    finally:
+        supervisor.stop()
+        os.chdir("/")
+    logged = logged_rows(os.path.join(workdir, TABLES["topics"]["path"]))
+    return results, requests, logged, workdir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=max(os.cpu_count() or 1, 2), help="N, compared with 1")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per phase")
+    parser.add_argument("--shared", type=int, default=20, help="distinct topics in the shared phase")
+    parser.add_argument("--latency", type=float, default=MOCK_CONFIG["latency"])
+    args = parser.parse_args()
+
+    server, mock_url = mock_llm_server.spawn_server(latency=args.latency, tokens=MOCK_CONFIG["tokens"],
+                                                    token_delay=MOCK_CONFIG["token_delay"])
+    os.environ.update(CODELALA_API_BASE=mock_url, CODELALA_API_KEY="mock", CODELALA_METRICS_PORT="",
+                      GRADIO_ANALYTICS_ENABLED="False")
+    print(f"{os.cpu_count()} CPUs, {args.concurrency} clients, {args.duration:g}s per phase, "
+          f"mock latency {args.latency}s")
+    print(f"{'workers':<9}{'phase':<8}{'reqs':>7}{'errors':>7}{'req/s':>8}{'p50 ms':>8}{'p95 ms':>8}"
+          f"{'upstream':>10}{'speedup':>9}")
+    baseline = {}
+    try:
+        for workers in (1, args.workers):
+            results, requests, logged, workdir = run(workers, mock_url, args)
+            for phase, result in results.items():
+                baseline.setdefault(phase, result["throughput"])
+                speedup = result["throughput"] / baseline[phase] if baseline[phase] else 0.0
+                print(f"{workers:<9}{phase:<8}{result['requests']:>7}{result['errors']:>7}{result['throughput']:>8.1f}"
+                      f"{result['p50_ms'] or 0:>8.0f}{result['p95_ms'] or 0:>8.0f}{result['upstream_requests']:>10}"
+                      f"{speedup:>8.2f}x")
+            status = "ok" if logged == requests else "MISMATCH"
+            print(f"{'':<9}log rows {logged} for {requests} requests ({status}), workdir {workdir}")
+            assert logged == requests, "the log writer lost or duplicated rows"
+            assert not any(result["errors"] for result in results.values()), "requests failed"
+            # Each shared topic is answered once, whichever worker gets it first
+            assert results["shared"]["upstream_requests"] <= args.shared, "workers repeated a shared topic's model call"
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
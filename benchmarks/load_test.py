@@ -0,0 +1,377 @@
+"""Throughput, latency percentiles and memory of the UI handlers and the Gradio HTTP API under load.
+
+Every scenario runs against the mock LLM server, in a scratch working
+directory so caches and logs don't touch the real ones. Results can be
+saved as JSON and compared with an earlier run to catch regressions:
+
+    python benchmarks/load_test.py --duration 10 --save
+    python benchmarks/load_test.py --scenarios smart_prompts,study_plan_large_pdf --compare latest
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import mock_llm_server
+import synthetic_pdf
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# Seconds a client waits after being turned away as busy before trying again
+SHED_BACKOFF = 1.0
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+# Mock upstream: lognormal time to first token around 200ms, then ~500 tokens/s
+MOCK_CONFIG = {"latency": 0.2, "latency_distribution": "lognormal", "latency_sigma": 0.5, "tokens": 200,
+               "token_delay": 0.002, "error_rate": 0.0, "error_status": 503, "retry_after": None,
+               "slow_rate": 0.0, "slow_latency": 0.0}
+
+# "feature" picks the handler; "fixture" uploads a synthetic PDF of that size, and
+# "cold" makes every upload unique so extraction and syllabus analysis are never
+# cached; "mock" overrides MOCK_CONFIG; "driver" is "direct" (call the handler
+# in-process) or "http" (through the Gradio API of the app in its own process);
+# "pools" overrides the admission control pools (direct only, see admission.py)
+SCENARIOS = {
+    "smart_prompts": {"feature": "smart_prompts", "concurrency": 16},
+    "practice_questions": {"feature": "practice_questions", "concurrency": 16},
+    "practice_questions_medium_pdf": {"feature": "practice_questions", "concurrency": 8, "fixture": "medium"},
+    "study_plan": {"feature": "study_plan", "concurrency": 16},
+    "study_plan_small_pdf_cold": {"feature": "study_plan", "concurrency": 8, "fixture": "small", "cold": True},
+    "study_plan_large_pdf": {"feature": "study_plan", "concurrency": 8, "fixture": "large"},
+    "smart_prompts_flaky": {"feature": "smart_prompts", "concurrency": 16,
+                            "mock": {"error_rate": 0.2, "retry_after": 0.05}},
+    "smart_prompts_slow_tail": {"feature": "smart_prompts", "concurrency": 16,
+                                "mock": {"slow_rate": 0.05, "slow_latency": 2.0}},
+    # More clients than the pools take: the excess is queued or shed, so p95 stays bounded
+    "smart_prompts_overload": {"feature": "smart_prompts", "concurrency": 64,
+                               "pools": {"smart_prompts": {"limit": 8, "queue": 16, "max_wait": 2.0}}},
+    "practice_questions_overload": {"feature": "practice_questions", "concurrency": 64,
+                                    "pools": {"practice_questions": {"limit": 8, "queue": 16, "max_wait": 2.0}}},
+    "http_smart_prompts": {"feature": "smart_prompts", "concurrency": 16, "driver": "http"},
+    "http_practice_questions": {"feature": "practice_questions", "concurrency": 16, "driver": "http"},
+    "http_study_plan_small_pdf": {"feature": "study_plan", "concurrency": 8, "fixture": "small", "driver": "http"},
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def memory_mb(pid="self"):
+    """(current, peak) resident set size of a process in MB; (None, None) where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError):
+        return None, None
+
+
+def reset_peak_memory(pid="self"):
+    """Reset the peak RSS counter so it covers a single scenario (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def upload_for(scenario, key, workdir):
+    """Path of the PDF to upload for one request, or None"""
+    if not scenario.get("fixture"):
+        return None
+    fixture = synthetic_pdf.make_fixtures(FIXTURES_DIR, [scenario["fixture"]])[scenario["fixture"]]
+    if not scenario.get("cold"):
+        return fixture
+    # A trailing comment changes the file hash without changing the document
+    path = os.path.join(workdir, "uploads", f"{key}.pdf")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    shutil.copyfile(fixture, path)
+    with open(path, "ab") as f:
+        f.write(b"%" + key.encode("ascii") + b"\n")
+    return path
+
+
+def request_inputs(feature, key, upload):
+    """Handler inputs for one request; key keeps prompts unique so responses aren't served from cache"""
+    if feature == "study_plan":
+        return ["Other (specify below)", f"Operating Systems {key}", 7, 4, "Textbooks", "Mix of multiple styles", upload]
+    if feature == "practice_questions":
+        return ["Operating Systems (OS)", "", f"Memory paging and process scheduling {key}", upload]
+    return ["Operating Systems (OS)", "", f"Process synchronization {key}"]
+
+
+async def run_direct(codelala, scenario, duration, workdir):
+    """Closed-loop workers calling the handler in-process; returns (latencies, errors, shed)"""
+    handler = getattr(codelala, "handle_" + scenario["feature"])
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = [0]
+    shed = [0]
+
+    async def worker(index):
+        n = 0
+        while time.perf_counter() < deadline:
+            key = f"{index}-{n}-{time.time_ns()}"
+            upload = upload_for(scenario, key, workdir)
+            started = time.perf_counter()
+            output = ""
+            try:
+                async for output in handler(*request_inputs(scenario["feature"], key, upload)):
+                    pass
+            except Exception:
+                output = None
+            if output is None or output.endswith(codelala.UPSTREAM_ERROR_MESSAGE):
+                errors[0] += 1
+            elif output == codelala.BUSY_MESSAGE:
+                shed[0] += 1
+                await asyncio.sleep(SHED_BACKOFF)
+            else:
+                latencies.append(time.perf_counter() - started)
+            n += 1
+
+    await asyncio.gather(*(worker(i) for i in range(scenario["concurrency"])))
+    return latencies, errors[0], shed[0]
+
+
+def run_http(url, scenario, duration, workdir, error_message, busy_message):
+    """Closed-loop worker threads, each with its own Gradio client; returns (latencies, errors, shed)"""
+    from gradio_client import Client, handle_file
+
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = [0]
+    shed = [0]
+    lock = threading.Lock()
+
+    def worker(index):
+        client = Client(url, verbose=False, download_files=False)
+        n = 0
+        while time.perf_counter() < deadline:
+            key = f"{index}-{n}-{time.time_ns()}"
+            upload = upload_for(scenario, key, workdir)
+            inputs = request_inputs(scenario["feature"], key, handle_file(upload) if upload else None)
+            started = time.perf_counter()
+            try:
+                output = client.predict(*inputs, api_name="/" + scenario["feature"])
+                failed = str(output).endswith(error_message)
+            except Exception:
+                output, failed = None, True
+            elapsed = time.perf_counter() - started
+            with lock:
+                if failed:
+                    errors[0] += 1
+                elif output == busy_message:
+                    shed[0] += 1
+                else:
+                    latencies.append(elapsed)
+            if output == busy_message:
+                time.sleep(SHED_BACKOFF)
+            n += 1
+
+    with ThreadPoolExecutor(max_workers=scenario["concurrency"]) as pool:
+        list(pool.map(worker, range(scenario["concurrency"])))
+    return latencies, errors[0], shed[0]
+
+
+def launch_app(env, workdir):
+    """Run CodeLala.py in its own process on a free port; returns (process, url)"""
+    port = mock_llm_server.free_port()
+    env = dict(env, GRADIO_SERVER_NAME="127.0.0.1", GRADIO_SERVER_PORT=str(port), GRADIO_ANALYTICS_ENABLED="False",
+               CODELALA_METRICS_PORT="")
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "CodeLala.py")], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/"
+    deadline = time.time() + 120
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return process, url
+        except OSError:
+            if time.time() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("the Gradio app failed to start")
+            time.sleep(0.5)
+
+
+def summarize(latencies, errors, shed, elapsed, upstream_requests, memory):
+    """Percentiles are of the answered requests; shed ones (turned away as busy) are counted apart from errors"""
+    total = len(latencies) + errors + shed
+    result = {"requests": total, "errors": errors, "error_rate": errors / total if total else 0.0,
+              "shed": shed, "shed_rate": shed / total if total else 0.0,
+              "throughput": len(latencies) / elapsed, "upstream_requests": upstream_requests,
+              "rss_mb": memory[0], "peak_rss_mb": memory[1]}
+    for name, q in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99), ("max_ms", 1.0)):
+        result[name] = percentile(latencies, q) * 1000 if latencies else None
+    return result
+
+
+def print_result(name, result):
+    def ms(value):
+        return f"{value:>8.0f}" if value is not None else f"{'-':>8}"
+
+    def mb(value):
+        return f"{value:>9.0f}" if value is not None else f"{'-':>9}"
+
+    print(f"{name:<32}{result['requests']:>7}{result['error_rate']:>7.1%}{result.get('shed_rate', 0.0):>7.1%}"
+          f"{result['throughput']:>8.1f}"
+          f"{ms(result['p50_ms'])}{ms(result['p95_ms'])}{ms(result['p99_ms'])}"
+          f"{mb(result['rss_mb'])}{mb(result['peak_rss_mb'])}"
+          + (f"{result['heap_peak_mb']:>9.1f}" if result.get("heap_peak_mb") is not None else ""), flush=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def latest_results(kind="load"):
+    """Most recent saved results file of this kind, or None"""
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, f"{kind}-*.json")))
+    return paths[-1] if paths else None
+
+
+def compare(results, baseline, tolerance):
+    """Print throughput and p95 changes against baseline; returns the names of regressed scenarios"""
+    regressed = []
+    print(f"\nvs. {baseline.get('commit', '?')} ({baseline.get('started', '?')}), tolerance {tolerance:.0%}")
+    print(f"{'scenario':<32}{'req/s':>16}{'p95 ms':>18}")
+    for name, current in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before or not before["throughput"] or not before["p95_ms"] or current["p95_ms"] is None:
+            continue
+        throughput = current["throughput"] / before["throughput"] - 1
+        p95 = current["p95_ms"] / before["p95_ms"] - 1
+        flag = ""
+        if throughput < -tolerance or p95 > tolerance or current["error_rate"] > before["error_rate"] + 0.01:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        print(f"{name:<32}{current['throughput']:>8.1f} {throughput:>+6.0%}{current['p95_ms']:>10.0f} {p95:>+6.0%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default="all", help="comma-separated scenario names, or 'all'")
+    parser.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=None, help="override every scenario's concurrency")
+    parser.add_argument("--latency", type=float, default=None, help="override the mock's median latency")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (direct only)")
+    parser.add_argument("--save", action="store_true", help=f"store the results in {RESULTS_DIR}")
+    parser.add_argument("--compare", default=None, help="results file to compare with, or 'latest'")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative throughput/p95 change")
+    parser.add_argument("--workdir", default=None, help="scratch directory for caches and logs")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, scenario in SCENARIOS.items():
+            print(f"{name:<32}{json.dumps(scenario)}")
+        return
+    names = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    baseline_path = latest_results() if args.compare == "latest" else args.compare and os.path.abspath(args.compare)
+    mock_config = dict(MOCK_CONFIG, **({"latency": args.latency} if args.latency is not None else {}))
+    server, url = mock_llm_server.spawn_server(**{key: mock_config[key] for key in ("latency", "tokens", "token_delay")})
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="codelala-load-")
+    os.makedirs(workdir, exist_ok=True)
+    env = dict(os.environ, CODELALA_API_BASE=url, CODELALA_API_KEY="mock", CODELALA_METRICS_PORT="")
+    os.environ.update(env)
+    os.chdir(workdir)
+
+    import admission
+    import codelala_core
+
+    loop = asyncio.new_event_loop()
+    app = None
+    results = {"started": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+               "duration": args.duration, "mock": mock_config, "scenarios": {}}
+    print(f"workdir={workdir} duration={args.duration}s mock latency={mock_config['latency']}s "
+          f"({mock_config['latency_distribution']}) tokens={mock_config['tokens']}")
+    print(f"{'scenario':<32}{'reqs':>7}{'errors':>7}{'shed':>7}{'req/s':>8}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}"
+          f"{'rss MB':>9}{'peak MB':>9}" + (f"{'heap MB':>9}" if args.tracemalloc else ""))
+    try:
+        for name in names:
+            scenario = dict(SCENARIOS[name])
+            if args.concurrency:
+                scenario["concurrency"] = args.concurrency
+            before = mock_llm_server.configure(url, **dict(mock_config, **scenario.get("mock", {})))["request_count"]
+
+            if scenario.get("driver") == "http":
+                if app is None:
+                    app, app_url = launch_app(env, workdir)
+                reset_peak_memory(app.pid)
+                started = time.perf_counter()
+                latencies, errors, shed = run_http(app_url, scenario, args.duration, workdir,
+                                                   codelala_core.UPSTREAM_ERROR_MESSAGE, codelala_core.BUSY_MESSAGE)
+                elapsed = time.perf_counter() - started
+                memory = memory_mb(app.pid)
+                heap_peak = None
+            else:
+                # Fresh pools for every scenario, so one's queue and counters don't carry over
+                codelala_core.admission = admission.Admission(
+                    admission.load_pools(json.dumps(scenario.get("pools", {}))),
+                    max_wait=float(os.environ.get("CODELALA_QUEUE_TIMEOUT", "20")))
+                reset_peak_memory()
+                if args.tracemalloc:
+                    tracemalloc.start()
+                started = time.perf_counter()
+                latencies, errors, shed = loop.run_until_complete(run_direct(codelala_core, scenario, args.duration, workdir))
+                elapsed = time.perf_counter() - started
+                memory = memory_mb()
+                heap_peak = None
+                if args.tracemalloc:
+                    heap_peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                    tracemalloc.stop()
+
+            upstream = mock_llm_server.configure(url)["request_count"] - before
+            result = summarize(latencies, errors, shed, elapsed, upstream, memory)
+            result.update(scenario=scenario, heap_peak_mb=heap_peak)
+            results["scenarios"][name] = result
+            print_result(name, result)
+    finally:
+        pending = asyncio.all_tasks(loop)
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.close()
+        if app is not None:
+            app.terminate()
+        server.terminate()
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"load-{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}.json")
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nsaved {path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Local OpenAI-compatible mock of the chat completions endpoint.
+
+Run it and point CodeLala at it:
+
+    python benchmarks/mock_llm_server.py --port 8765
+    CODELALA_API_BASE=http://127.0.0.1:8765/v1/ python CodeLala.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("study", "topic", "exam", "revise", "practice", "concept", "example",
+         "summary", "focus", "review", "question", "answer", "notes", "plan")
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+def fake_completion(prompt, num_tokens):
+    """Deterministic pseudo-text derived from the prompt"""
+    seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    if "analyzing a course syllabus" in prompt:
+        # Syllabus analysis requests get the JSON shape the app parses
+        topics = ["Topic %d" % (i + 1) for i in range(10)]
+        analysis = json.dumps({
+            "all_topics": topics,
+            "high_priority_topics": topics[:2],
+            "topic_importance": {topic: "frequently tested" for topic in topics[:2]},
+        })
+        return [analysis[i:i + 16] for i in range(0, len(analysis), 16)]
+    tokens = []
+    for i in range(num_tokens):
+        tokens.append(WORDS[(seed >> (i % 200)) % len(WORDS)] + " ")
+    return tokens
+
+
+def sample_latency(config, rng):
+    """Seconds to wait before answering, drawn from config["latency_distribution"] around config["latency"]"""
+    latency = config["latency"]
+    distribution = config.get("latency_distribution", "fixed")
+    if distribution == "uniform":
+        return rng.uniform(0, 2 * latency)
+    if distribution == "exponential":
+        return rng.expovariate(1 / latency) if latency > 0 else 0.0
+    if distribution == "lognormal":
+        # latency is the median; latency_sigma controls how heavy the tail is
+        return rng.lognormvariate(math.log(latency), config.get("latency_sigma", 0.5)) if latency > 0 else 0.0
+    return latency
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if not (path.endswith("chat/completions") or path == "/_config"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if path == "/_config":
+            # Lets a harness reconfigure a server running in another process
+            self.server.config.update(body)
+            self._send_json(200, dict(self.server.config, request_count=self.server.request_count,
+                                      model_counts=dict(self.server.model_counts)))
+            return
+        messages = body.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        config = self.server.config
+
+        self.server.request_count += 1
+        self.server.model_counts[body.get("model", "mock")] += 1
+        slow = self.server.random.random() < config["slow_rate"]
+        time.sleep(config["slow_latency"] if slow else sample_latency(config, self.server.random))
+        if self.server.random.random() < config["error_rate"]:
+            self._send_error_response(config["error_status"], config["retry_after"])
+            return
+        # Like a real model, a completion stops at max_tokens
+        tokens = fake_completion(prompt, min(config["tokens"], body.get("max_tokens") or config["tokens"]))
+
+        usage = {
+            "prompt_tokens": len(prompt.split()),
+            "completion_tokens": len(tokens),
+            "total_tokens": len(prompt.split()) + len(tokens),
+        }
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            self._send_stream(body.get("model", "mock"), tokens, config["token_delay"], usage if include_usage else None)
+        else:
+            time.sleep(config["token_delay"] * len(tokens))
+            self._send_json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+    def _send_error_response(self, status, retry_after):
+        data = json.dumps({"error": {"message": "injected error", "code": status}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, model_name, tokens, token_delay, usage=None):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_event(payload):
+            data = ("data: " + payload + "\n\n").encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        created = int(time.time())
+        for token in tokens:
+            time.sleep(token_delay)
+            write_event(json.dumps({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model_name,
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }))
+        write_event(json.dumps({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model_name,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }))
+        if usage is not None:
+            # Sent when the request asks for stream_options.include_usage, like the real API
+            write_event(json.dumps({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model_name,
+                "choices": [],
+                "usage": usage,
+            }))
+        write_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections in a burst, which then wait a 1s SYN retransmit
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose (timeouts, cancelled hedges); that's not a server error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(host="127.0.0.1", port=0, latency=0.05, tokens=200, token_delay=0.0, error_rate=0.0,
+                 error_status=503, retry_after=None, slow_rate=0.0, slow_latency=0.0, seed=0,
+                 latency_distribution="fixed", latency_sigma=0.5):
+    """Start the mock server on a background thread and return it.
+
+    Latency is fixed, or drawn per request from a uniform, exponential or
+    lognormal distribution around it. A fraction error_rate of requests
+    fail with error_status (and a Retry-After header if given); a fraction
+    slow_rate take slow_latency instead. server.config can be changed while
+    it runs.
+    """
+    server = MockLLMServer((host, port), MockLLMHandler)
+    server.request_count = 0
+    server.model_counts = Counter()
+    server.random = random.Random(seed)
+    server.config = {"latency": latency, "tokens": tokens, "token_delay": token_delay, "error_rate": error_rate,
+                     "error_status": error_status, "retry_after": retry_after, "slow_rate": slow_rate,
+                     "slow_latency": slow_latency, "latency_distribution": latency_distribution,
+                     "latency_sigma": latency_sigma}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1/"
+
+
+def configure(url, **config):
+    """Update the config of the server at url (a base_url); returns its config and request_count"""
+    root = url.split("/v1/")[0]
+    request = urllib.request.Request(root + "/_config", data=json.dumps(config).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def free_port(host="127.0.0.1"):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(latency=0.05, tokens=200, token_delay=0.0, host="127.0.0.1", error_rate=0.0, slow_rate=0.0,
+                 slow_latency=0.0, latency_distribution="fixed", latency_sigma=0.5):
+    """Run the mock server in a child process so it doesn't share the caller's GIL.
+
+    Returns (process, base_url); terminate the process when done.
+    """
+    port = free_port(host)
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--host", host, "--port", str(port), "--latency", str(latency),
+         "--tokens", str(tokens), "--token-delay", str(token_delay), "--error-rate", str(error_rate),
+         "--slow-rate", str(slow_rate), "--slow-latency", str(slow_latency),
+         "--latency-distribution", latency_distribution, "--latency-sigma", str(latency_sigma)],
+        stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 10
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            break
+        except OSError:
+            if time.time() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("mock LLM server failed to start")
+            time.sleep(0.05)
+    return process, f"http://{host}:{port}/v1/"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of an OpenAI-compatible chat endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before the first byte")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="spread of the lognormal distribution")
+    parser.add_argument("--tokens", type=int, default=200, help="tokens per completion")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between tokens")
+    parser.add_argument("--token-rate", type=float, default=None, help="tokens per second (overrides --token-delay)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with errors")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="latency of slow requests")
+    args = parser.parse_args()
+    token_delay = 1 / args.token_rate if args.token_rate else args.token_delay
+
+    server = start_server(args.host, args.port, args.latency, args.tokens, token_delay, args.error_rate,
+                          args.error_status, args.retry_after, args.slow_rate, args.slow_latency,
+                          latency_distribution=args.latency_distribution, latency_sigma=args.latency_sigma)
+    print(f"Mock LLM server listening on {base_url(server)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
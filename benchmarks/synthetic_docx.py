@@ -0,0 +1,74 @@
+"""Dependency-free generator of DOCX files for benchmarks."""
+import os
+import random
+import zipfile
+
+from synthetic_pdf import VOCABULARY
+
+# name -> paragraphs
+SIZES = {
+    "small": 300,
+    "medium": 5000,
+    "large": 150000,
+}
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+
+def _run(text, bold=False):
+    props = "<w:rPr><w:b/></w:rPr>" if bold else ""
+    return f'<w:r>{props}<w:t xml:space="preserve">{text}</w:t></w:r>'
+
+
+def _paragraph(rng, number):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))]
+    # Split into runs the way Word does around formatting changes
+    cut = rng.randint(1, len(words) - 1)
+    return (f"<w:p>{_run(f'{number}. ' + ' '.join(words[:cut]) + ' ', bold=True)}"
+            f"<w:r><w:tab/></w:r>{_run(' '.join(words[cut:]))}</w:p>")
+
+
+def _table(rng, number):
+    rows = "".join("<w:tr>" + "".join(f"<w:tc>{_paragraph(rng, f'{number}.{row}.{cell}')}</w:tc>"
+                                      for cell in range(3)) + "</w:tr>" for row in range(3))
+    return f"<w:tbl>{rows}</w:tbl>"
+
+
+def make_docx(path, paragraphs, seed=0):
+    """Write a DOCX with `paragraphs` paragraphs of pseudo-random course-like text, and a table every 50"""
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", RELS)
+        with archive.open("word/document.xml", "w", force_zip64=True) as xml:
+            xml.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                      f'<w:document xmlns:w="{W}"><w:body>'.encode())
+            for number in range(paragraphs):
+                block = _table(rng, number) if number % 50 == 49 else _paragraph(rng, number)
+                xml.write(block.encode())
+            xml.write(b"<w:sectPr/></w:body></w:document>")
+    return path
+
+
+def make_fixtures(directory, sizes=None):
+    """Create one DOCX per size in `directory` (reused if already present); returns name -> path"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for name in sizes or SIZES:
+        path = os.path.join(directory, f"{name}_{SIZES[name]}para.docx")
+        if not os.path.exists(path):
+            make_docx(path, SIZES[name])
+        paths[name] = path
+    return paths
@@ -0,0 +1,75 @@
+"""Dependency-free generator of text PDFs for benchmarks."""
+import os
+import random
+
+VOCABULARY = ("process", "thread", "scheduling", "deadlock", "semaphore", "paging", "memory",
+              "binary", "tree", "graph", "hashing", "sorting", "normalization", "transaction",
+              "index", "query", "routing", "protocol", "congestion", "gradient", "regression",
+              "kernel", "cache", "pipeline", "compiler", "automaton", "grammar", "complexity")
+
+# name -> (pages, lines per page)
+SIZES = {
+    "small": (5, 40),
+    "medium": (60, 45),
+    "large": (400, 50),
+}
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(path, pages, lines_per_page=45, seed=0):
+    """Write a PDF with `pages` pages of pseudo-random course-like text"""
+    rng = random.Random(seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+
+    for page in range(pages):
+        lines = [f"Chapter {page + 1}"]
+        for _ in range(lines_per_page):
+            lines.append(" ".join(rng.choice(VOCABULARY) for _ in range(12)))
+        ops = ["BT", "/F1 9 Tf", "14 TL", "40 800 Td"]
+        ops.extend(f"({_escape(line)}) Tj T*" for line in lines)
+        ops.append("ET")
+        content = "\n".join(ops).encode("latin-1")
+
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        content_id = len(objects)
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Contents {content_id} 0 R /Resources << /Font << /F1 3 0 R >> >> >>"
+        ).encode("latin-1"))
+        kids.append(len(objects))
+
+    kid_refs = " ".join(f"{kid} 0 R" for kid in kids)
+    objects[1] = f"<< /Type /Pages /Kids [{kid_refs}] /Count {len(kids)} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return path
+
+
+def make_fixtures(directory, sizes=None):
+    """Create one PDF per size in `directory` (reused if already present); returns name -> path"""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for name in sizes or SIZES:
+        pages, lines = SIZES[name]
+        path = os.path.join(directory, f"{name}_{pages}p.pdf")
+        if not os.path.exists(path):
+            make_pdf(path, pages, lines)
+        paths[name] = path
+    return paths
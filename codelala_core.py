@@ -0,0 +1,1294 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from response_cache import ResponseCache, make_cache_key
+from singleflight import AsyncSingleFlight, FileLocks, SingleFlight
+from resilience import CircuitBreaker, Resilience, UpstreamError
+from admission import CHEAP, HEAVY, Admission, Rejected, load_pools
+from context_budget import SOURCE_MAX_CHARS, estimate_tokens, fit_to_budget
+from log_writer import open_log
+from interaction_store import TABLES as LOG_TABLES
+from material_index import LocalEmbedder, MaterialIndex
+from model_router import Backend, build_router
+from metrics import REGISTRY, annotate, stage, traced
+from text_extraction import extract_text, extraction_stats, file_sha256
+import topic_gate
+import topic_canon
+import scheduler
+
+# API clients are created on first use from the environment, so importing this
+# module doesn't pay for openai/httpx (CODELALA_API_BASE can point at a local
+# mock server, see benchmarks/mock_llm_server.py). Retries are done by the
+# resilience layer below, not by the clients.
+API_BASE = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+# All async requests to a backend share one pooled, keep-alive HTTP connection
+# pool, and a global semaphore caps in-flight upstream calls so a burst of users
+# cannot exhaust connections.
+MAX_INFLIGHT_REQUESTS = int(os.environ.get("CODELALA_MAX_INFLIGHT", "32"))
+
+# Each task ("plan", "questions", "prompts", "analysis", "summary") is routed to a
+# model with its own max_tokens and temperature, falling back to the next route on
+# errors or latency-SLO breaches (see model_router.DEFAULT_ROUTES). Routes and extra
+# backends are configured with CODELALA_ROUTES (JSON, or the path of a JSON file).
+router = None
+client_lock = threading.Lock()
+
+def get_router():
+    """Model router over the default backend (CODELALA_API_BASE) and any configured ones, created on first use"""
+    global router
+    with client_lock:
+        if router is None:
+            default_backend = Backend(
+                "default",
+                os.environ.get("CODELALA_API_BASE", API_BASE),
+                os.environ.get("CODELALA_API_KEY", "GeminiKey"),
+                upstream,
+                MAX_INFLIGHT_REQUESTS
+            )
+            router = build_router(default_backend, breaker_settings=BREAKER_SETTINGS)
+    return router
+
+# Created lazily so it binds to the event loop that first uses it
+upstream_semaphore = None
+
+def get_upstream_semaphore():
+    """Semaphore limiting concurrent upstream calls on the async path"""
+    global upstream_semaphore
+    if upstream_semaphore is None:
+        upstream_semaphore = asyncio.Semaphore(MAX_INFLIGHT_REQUESTS)
+    return upstream_semaphore
+
+# Deadlines, retries with backoff (honoring Retry-After), hedging and a circuit
+# breaker around every upstream call, configured per task ("plan", "questions",
+# "prompts", "analysis", "summary"; see resilience.DEFAULT_POLICIES).
+# Override with CODELALA_RESILIENCE='{"plan": {"timeout": 90}}'. This instance
+# guards the default backend; every other backend gets its own breaker.
+BREAKER_SETTINGS = {
+    "failure_threshold": int(os.environ.get("CODELALA_BREAKER_FAILURES", "5")),
+    "reset_timeout": float(os.environ.get("CODELALA_BREAKER_RESET", "30"))
+}
+upstream = Resilience(breaker=CircuitBreaker(**BREAKER_SETTINGS))
+
+UPSTREAM_ERROR_MESSAGE = "⚠️ The AI service is not responding right now. Please try again in a minute."
+
+# Admission control in front of the UI handlers (see admission.py): token buckets
+# per browser session and per client IP (requests per minute, 0 = unlimited), and a
+# concurrency pool with a bounded priority queue per event, configured with
+# CODELALA_POOLS='{"study_plan": {"limit": 4, "queue": 16}}'. Answers already in
+# the response cache, and off-topic requests, need no model call and skip the pools.
+admission = Admission(
+    pools=load_pools(),
+    session_rate=float(os.environ.get("CODELALA_RATE_LIMIT", "20")) / 60,
+    session_burst=int(os.environ.get("CODELALA_RATE_BURST", "5")),
+    ip_rate=float(os.environ.get("CODELALA_IP_RATE_LIMIT", "120")) / 60,
+    ip_burst=int(os.environ.get("CODELALA_IP_RATE_BURST", "30")),
+    max_wait=float(os.environ.get("CODELALA_QUEUE_TIMEOUT", "20"))
+)
+
+BUSY_MESSAGE = "⏳ CodeLala is very busy right now, so your request couldn't be started. Please try again in a minute."
+RATE_LIMITED_MESSAGE = "✋ You're sending requests faster than we can answer them. Please wait {seconds} seconds and try again."
+
+# Subjects offered in the UI dropdowns (plus OTHER_SUBJECT, which reveals a free-text field)
+SUBJECTS = [
+    "Data Structures & Algorithms (DSA)",
+    "Operating Systems (OS)",
+    "Database Management Systems (DBMS)",
+    "Computer Networks (CN)",
+    "Machine Learning (ML)",
+    "Web Development",
+    "Software Engineering",
+    "Artificial Intelligence",
+    "Theory of Computation",
+    "Computer Architecture"
+]
+OTHER_SUBJECT = "Other (specify below)"
+
+SYSTEM_MESSAGE = "You are an expert study planner for students preparing for exams. if students provide anything else than syllabus or unrealted to the enginnering subjects topics, you will not be able to help them. just say 'I can only help with syllabus. just say please upload proper syllabus. '"
+
+# Parsed syllabus analyses, keyed by the SHA-256 of the uploaded file so a
+# re-upload of the same syllabus skips both PDF parsing and the analysis call
+syllabus_analysis_cache = ResponseCache(
+    max_entries=256,
+    ttl=int(os.environ.get("CODELALA_ANALYSIS_TTL", str(30 * 24 * 3600))),
+    db_path=os.environ.get("CODELALA_ANALYSIS_DB", os.path.join("cache", "syllabus_analysis.sqlite3")) or None
+)
+
+# Response cache: bounded in-memory LRU in front of an optional SQLite store.
+# Set CODELALA_CACHE_DB to an empty string to keep the cache in memory only.
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("CODELALA_CACHE_MAX_ENTRIES", "512")),
+    ttl=int(os.environ.get("CODELALA_CACHE_TTL", str(7 * 24 * 3600))),
+    db_path=os.environ.get("CODELALA_CACHE_DB", os.path.join("cache", "responses.sqlite3")) or None,
+    max_disk_entries=int(os.environ.get("CODELALA_CACHE_MAX_DISK_ENTRIES", "50000"))
+)
+
+# Concurrent identical requests (same cache key) are coalesced into one upstream call.
+# Worker processes sharing the cache (workers.py sets CODELALA_WORKER_LOCKS) also
+# wait for one another's call on the same key, through lock files.
+inflight_requests = SingleFlight()
+async_inflight_requests = AsyncSingleFlight()
+worker_locks = FileLocks(os.environ.get("CODELALA_WORKER_LOCKS") or None)
+
+# Upstream latency, token usage and cache lookups, exposed with the per-stage
+# request timings on the metrics endpoint (CODELALA_METRICS_PORT)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "codelala_upstream_seconds", "Model call latency per attempt and route; streams report first_chunk and total",
+    ("task", "route", "phase"))
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    "codelala_upstream_requests_total", "Model call attempts by route and outcome", ("task", "route", "outcome"))
+UPSTREAM_COST = REGISTRY.counter(
+    "codelala_upstream_cost_usd_total", "Estimated model cost by task and route, from the route's token prices",
+    ("task", "route"))
+TOKENS = REGISTRY.counter(
+    "codelala_tokens_total", "Prompt and completion tokens, from response.usage or estimated when none is reported",
+    ("task", "kind", "source"))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "codelala_response_cache_lookups_total", "Response cache lookups by task and result", ("task", "result"))
+TOPIC_GATE = REGISTRY.counter(
+    "codelala_topic_gate_total", "Topic gate decisions by feature, verdict and reason", ("feature", "verdict", "reason"))
+ADMISSIONS = REGISTRY.counter(
+    "codelala_admissions_total",
+    "Admission control decisions by event and outcome (admitted, local, rate_limited, queue_full, queue_timeout)",
+    ("event", "outcome"))
+QUEUE_SECONDS = REGISTRY.histogram(
+    "codelala_queue_seconds", "Time requests waited for a slot in their event's pool", ("event",))
+
+def response_cache_key(prompt, task="default"):
+    """Response cache key of a prompt sent with the system message to the task's primary model.
+    
+    Answers from a fallback route are cached under the same key, and a
+    Prompt under its cache_text.
+    """
+    return make_cache_key(SYSTEM_MESSAGE, get_router().primary(task).model, getattr(prompt, "cache_text", prompt))
+
+def cached_response(cache_key, task):
+    """Look up a cached response, counting the hit or miss"""
+    cached = response_cache.get(cache_key)
+    CACHE_LOOKUPS.inc(task=task, result="miss" if cached is None else "hit")
+    annotate(cache_hits=int(cached is not None), cache_misses=int(cached is None))
+    return cached
+
+def record_upstream(task, route, started, usage, prompt, completion, phase="call"):
+    """Record latency, token usage and cost of a successful model call in the metrics and the current trace"""
+    seconds = time.perf_counter() - started
+    UPSTREAM_SECONDS.observe(seconds, task=task, route=route.name, phase=phase)
+    UPSTREAM_REQUESTS.inc(task=task, route=route.name, outcome="ok")
+    if phase == "call":
+        get_router().record_latency(route, seconds)
+    
+    if usage is not None and usage.prompt_tokens is not None:
+        prompt_tokens, completion_tokens, source = usage.prompt_tokens, usage.completion_tokens or 0, "usage"
+    else:
+        prompt_tokens, completion_tokens, source = estimate_tokens(SYSTEM_MESSAGE + prompt), estimate_tokens(completion or ""), "estimate"
+    TOKENS.inc(prompt_tokens, task=task, kind="prompt", source=source)
+    TOKENS.inc(completion_tokens, task=task, kind="completion", source=source)
+    UPSTREAM_COST.inc(get_router().record_usage(route, prompt_tokens, completion_tokens), task=task, route=route.name)
+    annotate(upstream_calls=1, upstream_seconds=round(seconds, 6), prompt_tokens=prompt_tokens,
+             completion_tokens=completion_tokens, route=route.name)
+
+def build_messages(prompt):
+    """Chat messages sent for every request"""
+    return [
+        {'role': "system", "content": SYSTEM_MESSAGE},
+        {'role': "user", "content": prompt},
+    ]
+
+def get_gemini_response(prompt, use_cache=True, task="default"):
+    """Function to get response from Gemini API using the existing my_googler function pattern"""
+    cache_key = response_cache_key(prompt, task)
+    if use_cache:
+        cached = cached_response(cache_key, task)
+        if cached is not None:
+            return cached
+    
+    def attempt(route, timeout):
+        # Creating the client on first use is not part of the call's latency
+        client = route.backend.client()
+        started = time.perf_counter()
+        try:
+            response = client.chat.completions.create(
+                messages=build_messages(prompt),
+                timeout=timeout,
+                **route.params()
+            )
+        except Exception:
+            UPSTREAM_REQUESTS.inc(task=task, route=route.name, outcome="error")
+            raise
+        record_upstream(task, route, started, response.usage, prompt, response.choices[0].message.content)
+        return response
+    
+    def fetch():
+        with worker_locks.hold(cache_key if use_cache else None) as waited:
+            # Another worker just made this call; its answer is in the shared cache
+            cached = cached_response(cache_key, task) if waited else None
+            if cached is not None:
+                return cached
+            response = get_router().call(task, attempt)
+            content = response.choices[0].message.content
+            if use_cache:
+                response_cache.set(cache_key, content)
+            return content
+    
+    # Identical prompts already in flight share that one upstream call
+    return inflight_requests.do(cache_key, fetch)
+
+def record_first_chunk(task, route, started):
+    """Time to first chunk, which is what a stream's route is held to its SLO on"""
+    seconds = time.perf_counter() - started
+    UPSTREAM_SECONDS.observe(seconds, task=task, route=route.name, phase="first_chunk")
+    get_router().record_latency(route, seconds)
+
+def iter_response_deltas(stream, route, task="default", prompt="", started=None):
+    """Text deltas of a streamed chat completion; latency and token usage are recorded when it ends"""
+    started = started or time.perf_counter()
+    parts = []
+    usage = None
+    try:
+        for chunk in stream:
+            usage = chunk.usage or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    record_first_chunk(task, route, started)
+                parts.append(delta)
+                yield delta
+    except Exception:
+        UPSTREAM_REQUESTS.inc(task=task, route=route.name, outcome="error")
+        raise
+    finally:
+        stream.close()
+    record_upstream(task, route, started, usage, prompt, "".join(parts), phase="total")
+
+async def async_iter_response_deltas(stream, route, task="default", prompt="", started=None):
+    """Async version of iter_response_deltas"""
+    started = started or time.perf_counter()
+    parts = []
+    usage = None
+    try:
+        async for chunk in stream:
+            usage = chunk.usage or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    record_first_chunk(task, route, started)
+                parts.append(delta)
+                yield delta
+    except Exception:
+        UPSTREAM_REQUESTS.inc(task=task, route=route.name, outcome="error")
+        raise
+    finally:
+        await stream.close()
+    record_upstream(task, route, started, usage, prompt, "".join(parts), phase="total")
+
+def stream_gemini_response(prompt, use_cache=True, task="default"):
+    """Stream the Gemini response chunk by chunk; the full text is cached once the stream completes"""
+    cache_key = response_cache_key(prompt, task)
+    if use_cache:
+        cached = cached_response(cache_key, task)
+        if cached is not None:
+            yield cached
+            return
+    
+    def open_stream(route, timeout):
+        client = route.backend.client()
+        started = time.perf_counter()
+        try:
+            stream = client.chat.completions.create(
+                messages=build_messages(prompt),
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=timeout,
+                **route.params()
+            )
+        except Exception:
+            UPSTREAM_REQUESTS.inc(task=task, route=route.name, outcome="error")
+            raise
+        return iter_response_deltas(stream, route, task, prompt, started)
+    
+    def fetch():
+        with worker_locks.hold(cache_key if use_cache else None) as waited:
+            cached = cached_response(cache_key, task) if waited else None
+            if cached is not None:
+                yield cached
+                return
+            parts = []
+            for delta in get_router().stream(task, open_stream):
+                parts.append(delta)
+                yield delta
+            # Only a fully received response is cached, before the lock is released
+            # so workers waiting on it find the answer
+            if use_cache:
+                response_cache.set(cache_key, "".join(parts))
+    
+    yield from inflight_requests.stream(cache_key, fetch)
+
+async def async_get_gemini_response(prompt, use_cache=True, task="default"):
+    """Async version of get_gemini_response"""
+    cache_key = response_cache_key(prompt, task)
+    if use_cache:
+        cached = cached_response(cache_key, task)
+        if cached is not None:
+            return cached
+    
+    async def attempt(route, timeout):
+        client = route.backend.async_client()
+        async with get_upstream_semaphore():
+            started = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(
+                    messages=build_messages(prompt),
+                    timeout=timeout,
+                    **route.params()
+                )
+            except Exception:
+                UPSTREAM_REQUESTS.inc(task=task, route=route.name, outcome="error")
+                raise
+        record_upstream(task, route, started, response.usage, prompt, response.choices[0].message.content)
+        return response
+    
+    async def fetch():
+        async with worker_locks.async_hold(cache_key if use_cache else None) as waited:
+            cached = cached_response(cache_key, task) if waited else None
+            if cached is not None:
+                return cached
+            response = await get_router().async_call(task, attempt)
+            content = response.choices[0].message.content
+            if use_cache:
+                response_cache.set(cache_key, content)
+            return content
+    
+    return await async_inflight_requests.do(cache_key, fetch)
+
+async def async_stream_gemini_response(prompt, use_cache=True, task="default"):
+    """Async version of stream_gemini_response; the shared upstream stream holds one upstream slot"""
+    cache_key = response_cache_key(prompt, task)
+    if use_cache:
+        cached = cached_response(cache_key, task)
+        if cached is not None:
+            yield cached
+            return
+    
+    async def open_stream(route, timeout):
+        client = route.backend.async_client()
+        async with get_upstream_semaphore():
+            started = time.perf_counter()
+            try:
+                stream = await client.chat.completions.create(
+                    messages=build_messages(prompt),
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    timeout=timeout,
+                    **route.params()
+                )
+            except Exception:
+                UPSTREAM_REQUESTS.inc(task=task, route=route.name, outcome="error")
+                raise
+            deltas = async_iter_response_deltas(stream, route, task, prompt, started)
+            try:
+                async for delta in deltas:
+                    yield delta
+            finally:
+                await deltas.aclose()
+    
+    async def fetch():
+        async with worker_locks.async_hold(cache_key if use_cache else None) as waited:
+            cached = cached_response(cache_key, task) if waited else None
+            if cached is not None:
+                yield cached
+                return
+            parts = []
+            async for delta in get_router().async_stream(task, open_stream):
+                parts.append(delta)
+                yield delta
+            # Only a fully received response is cached, before the lock is released
+            if use_cache:
+                response_cache.set(cache_key, "".join(parts))
+    
+    async for delta in async_inflight_requests.stream(cache_key, fetch):
+        yield delta
+
+def accumulate_stream(chunks):
+    """Turn a stream of chunks into a stream of the growing text (what the Markdown panes display)"""
+    text = ""
+    for chunk in chunks:
+        text += chunk
+        yield text
+
+async def async_accumulate_stream(chunks):
+    """Async version of accumulate_stream"""
+    text = ""
+    async for chunk in chunks:
+        text += chunk
+        yield text
+
+def extract_text_from_pdf(pdf_file, file_hash=None, max_chars=SOURCE_MAX_CHARS):
+    """Extract text content from uploaded PDF syllabus"""
+    if pdf_file is None:
+        return None
+    
+    try:
+        with stage("extract"):
+            return extract_text(pdf_file, file_type='.pdf', max_chars=max_chars, file_hash=file_hash)
+    except Exception as e:
+        return f"Error extracting text from PDF: {str(e)}"
+
+def extract_text_from_file(file, max_chars=SOURCE_MAX_CHARS):
+    """Extract text from uploaded file (PDF, TXT, DOCX)"""
+    if file is None:
+        return None
+    
+    try:
+        with stage("extract"):
+            return extract_text(file, max_chars=max_chars)
+    except Exception as e:
+        return f"Error extracting text from file: {str(e)}"
+
+# Map-reduce summarization of material that exceeds the token budget costs
+# extra model calls, so it is opt-in; by default the top-ranked chunks are kept
+SUMMARIZE_MATERIALS = os.environ.get("CODELALA_SUMMARIZE_MATERIALS", "0") == "1"
+
+def summarize_material(text, focus, target_tokens):
+    """Summarize a slice of course material for the context budget"""
+    prompt = f"""
+    Summarize the following course material in at most {target_tokens * 3 // 4} words.
+    Keep the key definitions, formulas, algorithms and examples, especially those related to: {focus}
+    
+    MATERIAL:
+    {text}
+    """
+    return get_gemini_response(prompt, task="summary")
+
+def budget_context(text, query, keep_sections=False):
+    """Fit extracted text into the prompt's token budget, keeping what is most relevant to the query (and, with keep_sections, a part of every section)"""
+    with stage("budget"):
+        budgeted = fit_to_budget(text, query, summarize=summarize_material if SUMMARIZE_MATERIALS else None,
+                                 keep_sections=keep_sections)
+    annotate(context_chars_in=len(text or ""), context_chars_kept=len(budgeted or ""))
+    return budgeted
+
+def load_syllabus_text(syllabus_file, subject, file_hash=None):
+    """Extract an uploaded syllabus and fit it into the context budget without dropping any of its units"""
+    return budget_context(extract_text_from_pdf(syllabus_file, file_hash), subject, keep_sections=True)
+
+# Local retrieval index of previously uploaded materials, partitioned by subject.
+# The index is shared by every student, so it is off unless CODELALA_SHARED_RETRIEVAL=1
+# (for deployments where all uploads are course material meant to be shared). Then a
+# practice questions request without an upload uses the subject's earlier uploads.
+# Set CODELALA_EMBEDDING_MODEL (e.g. "all-MiniLM-L6-v2", needs sentence-transformers)
+# to re-rank with embeddings.
+SHARED_RETRIEVAL = os.environ.get("CODELALA_SHARED_RETRIEVAL", "0") == "1"
+INDEX_DB = os.environ.get("CODELALA_INDEX_DB", os.path.join("cache", "materials_index.sqlite3"))
+EMBEDDING_MODEL = os.environ.get("CODELALA_EMBEDDING_MODEL", "")
+RETRIEVAL_TOP_K = int(os.environ.get("CODELALA_RETRIEVAL_TOP_K", "8"))
+
+material_index = None
+embedder = None
+embedder_lock = threading.Lock()
+
+def get_embedder():
+    """Load the local embedding model on first use (it is slow), or None if none is configured"""
+    global embedder
+    with embedder_lock:
+        if embedder is None and EMBEDDING_MODEL:
+            try:
+                embedder = LocalEmbedder(EMBEDDING_MODEL)
+            except ImportError:
+                return None
+        return embedder
+
+def get_material_index():
+    """Open the materials index on first use"""
+    global material_index
+    if material_index is None and SHARED_RETRIEVAL and INDEX_DB:
+        material_index = MaterialIndex(INDEX_DB, get_embedder())
+    return material_index
+
+# Prompts are cached under the canonical form of their topic, so "Binary Trees",
+# "binary-tree" and "binary trees basics" share one cached answer, while the model
+# is sent the topic as the student typed it. With an embedding model, set
+# CODELALA_TOPIC_SIMILARITY (e.g. 0.85) to also map other spellings to the nearest
+# catalog topic of the subject.
+TOPIC_SIMILARITY = float(os.environ.get("CODELALA_TOPIC_SIMILARITY", "") or 0)
+
+nearest_topic = None
+
+def canonical_topic(subject, topic):
+    """The canonical form of a topic, which is what cache keys and analytics are built from"""
+    global nearest_topic
+    canonical = topic_canon.canonical_topic(subject, topic)
+    if TOPIC_SIMILARITY and canonical not in topic_canon.TOPIC_ALIASES.get(subject, {}):
+        model = get_embedder()
+        if model is not None:
+            if nearest_topic is None:
+                nearest_topic = topic_canon.NearestTopic(model, TOPIC_SIMILARITY)
+            canonical = nearest_topic.match(subject, canonical)
+    return canonical
+
+class Prompt(str):
+    """Prompt text for the model, cached as cache_text (the prompt built with the canonical topic)"""
+    
+    def __new__(cls, text, cache_text):
+        prompt = super().__new__(cls, text)
+        prompt.cache_text = cache_text
+        return prompt
+
+def topic_prompt(build, subject, topic, *args):
+    """build(subject, topic, *args) with the topic as typed, cached under the one built with its canonical form"""
+    topic = topic.strip()
+    return Prompt(build(subject, topic, *args), build(subject, canonical_topic(subject, topic), *args))
+
+def load_materials_text(materials_file, subject, topic):
+    """Extract uploaded topic materials, add them to the subject's index and keep the passages most relevant to the topic"""
+    try:
+        with stage("extract"):
+            text = extract_text(materials_file, max_chars=SOURCE_MAX_CHARS)
+    except Exception as e:
+        return f"Error extracting text from file: {str(e)}"
+    
+    index = get_material_index()
+    if index is not None and len(text) > 100:
+        with stage("index"):
+            index.add_document(subject, text)
+    
+    return budget_context(text, f"{subject} {topic}")
+
+def retrieve_materials(subject, topic):
+    """Passages relevant to the topic from materials previously uploaded for this subject"""
+    index = get_material_index()
+    if index is None:
+        return None
+    
+    with stage("retrieve"):
+        passages = index.search(subject, topic, k=RETRIEVAL_TOP_K)
+    if not passages:
+        return None
+    return budget_context("\n\n".join(text for text, _ in passages), f"{subject} {topic}")
+
+def syllabus_analysis_prompt(syllabus_text, subject):
+    """Build the syllabus analysis prompt"""
+    return f"""
+    You are an expert educational consultant analyzing a course syllabus.
+    
+    SYLLABUS CONTENT:
+    {syllabus_text}
+    
+    Based on this syllabus for {subject}, please:
+    
+    1. Identify and list all the major topics covered
+    2. Highlight the top 20% most important topics that likely cover 80% of exam content (Pareto principle)
+    3. For each high-priority topic, explain briefly why it's important (e.g., fundamental concept, frequently tested, etc.)
+    
+    Format your response as a structured JSON with these sections:
+    - all_topics: [list of all topics]
+    - high_priority_topics: [list of the 20% most important topics]
+    - topic_importance: {{"topic1": "reason for importance", "topic2": "reason for importance", ...}}
+    
+    Use your educational expertise to identify truly high-yield topics.
+    """
+
+def analyze_syllabus(syllabus_text, subject):
+    """Analyze syllabus to identify key topics"""
+    if not syllabus_text:
+        return None
+    
+    with stage("analysis"):
+        response = get_gemini_response(syllabus_analysis_prompt(syllabus_text, subject), task="analysis")
+    return response
+
+async def async_analyze_syllabus(syllabus_text, subject):
+    """Async version of analyze_syllabus"""
+    if not syllabus_text:
+        return None
+    
+    with stage("analysis"):
+        return await async_get_gemini_response(syllabus_analysis_prompt(syllabus_text, subject), task="analysis")
+
+def parse_syllabus_analysis(response):
+    """Parse the JSON returned by analyze_syllabus (tolerating code fences and surrounding prose)"""
+    if not response:
+        return None
+    
+    match = re.search(r'\{.*\}', response, re.DOTALL)
+    if not match:
+        return None
+    try:
+        analysis = json.loads(match.group(0))
+    except ValueError:
+        return None
+    
+    if not isinstance(analysis, dict) or not (analysis.get("high_priority_topics") or analysis.get("all_topics")):
+        return None
+    return analysis
+
+def format_syllabus_analysis(analysis):
+    """Render a syllabus analysis (parsed dict or raw model text) for the study plan prompt"""
+    if isinstance(analysis, dict):
+        return json.dumps(analysis, indent=2, ensure_ascii=False)
+    return analysis
+
+def cached_syllabus_analysis(syllabus_file):
+    """Return (file_hash, parsed analysis or None) for an uploaded syllabus"""
+    try:
+        file_hash = file_sha256(syllabus_file)
+    except OSError:
+        return None, None
+    
+    cached = syllabus_analysis_cache.get(file_hash)
+    return file_hash, (json.loads(cached) if cached is not None else None)
+
+def remember_syllabus_analysis(file_hash, response):
+    """Parse an analysis response and store it under the file hash; falls back to the raw text"""
+    analysis = parse_syllabus_analysis(response)
+    if analysis is None:
+        return response
+    
+    if file_hash:
+        syllabus_analysis_cache.set(file_hash, json.dumps(analysis, ensure_ascii=False))
+    return analysis
+
+def get_syllabus_analysis(syllabus_file, subject):
+    """Analyze an uploaded syllabus, reusing the stored analysis of an identical file"""
+    file_hash, analysis = cached_syllabus_analysis(syllabus_file)
+    if analysis is not None:
+        return analysis
+    
+    syllabus_text = load_syllabus_text(syllabus_file, subject, file_hash)
+    if not syllabus_text or len(syllabus_text) <= 100:  # Only analyze if we got meaningful text
+        return None
+    
+    return remember_syllabus_analysis(file_hash, analyze_syllabus(syllabus_text, subject))
+
+async def async_get_syllabus_analysis(syllabus_file, subject):
+    """Async version of get_syllabus_analysis; hashing and PDF parsing run in a worker thread"""
+    file_hash, analysis = await asyncio.to_thread(cached_syllabus_analysis, syllabus_file)
+    if analysis is not None:
+        return analysis
+    
+    return await async_analyze_uploaded_syllabus(syllabus_file, subject, file_hash)
+
+async def async_analyze_uploaded_syllabus(syllabus_file, subject, file_hash):
+    """Extract, budget and analyze a syllabus that is not in the analysis cache yet"""
+    syllabus_text = await asyncio.to_thread(load_syllabus_text, syllabus_file, subject, file_hash)
+    if not syllabus_text or len(syllabus_text) <= 100:  # Only analyze if we got meaningful text
+        return None
+    
+    return remember_syllabus_analysis(file_hash, await async_analyze_syllabus(syllabus_text, subject))
+
+def build_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file=None):
+    """Return (schedule, prompt) for a study plan (see study_plan), analyzing the syllabus first if one was uploaded, or None if the subject is not study-related"""
+    if not is_study_topic(subject, feature="study_plan"):
+        return None
+    
+    # Process syllabus if provided
+    syllabus_analysis = None
+    
+    if syllabus_file is not None:
+        syllabus_analysis = get_syllabus_analysis(syllabus_file, subject)
+    
+    return study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_analysis)
+
+async def async_build_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file=None):
+    """Async version of build_study_plan"""
+    if not is_study_topic(subject, feature="study_plan"):
+        return None
+    
+    syllabus_analysis = None
+    
+    if syllabus_file is not None:
+        syllabus_analysis = await async_get_syllabus_analysis(syllabus_file, subject)
+    
+    return study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_analysis)
+
+# Lay out the day-by-day schedule locally and only ask the model for tips (0 = the model writes the whole plan)
+LOCAL_SCHEDULER = os.environ.get("CODELALA_LOCAL_SCHEDULER", "1") == "1"
+# High-priority topics (or first topics, without a ranking) the model writes tips for
+TIP_TOPICS = 8
+
+def study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_analysis=None):
+    """Return (schedule, prompt): the schedule laid out by the local scheduler and the prompt for the model's tips.
+    
+    The topics come from the parsed syllabus analysis or the built-in catalog of
+    the subject. Without either (or with an unparsed analysis) the schedule is
+    empty and the prompt asks the model for the whole plan.
+    """
+    topics = None
+    if LOCAL_SCHEDULER and (not syllabus_analysis or isinstance(syllabus_analysis, dict)):
+        topics = scheduler.plan_topics(subject, syllabus_analysis)
+    if topics is None:
+        return "", study_plan_prompt(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_analysis)
+    
+    all_topics, high_priority_topics, importance = topics
+    plan = scheduler.schedule(subject, all_topics, high_priority_topics, days_left, hours_per_day)
+    schedule = scheduler.render_markdown(plan, importance)
+    tip_topics = (plan["priority_ranking"] or [topic["topic"] for topic in plan["topics"]])[:TIP_TOPICS]
+    return schedule + "\n\n", study_plan_tips_prompt(subject, tip_topics, resource_type, feedback_preference)
+
+def study_plan_tips_prompt(subject, topics, resource_type, feedback_preference):
+    """Build the prompt for the tips and motivation that go under a locally laid out schedule"""
+    topic_lines = "\n".join(f"    - {topic}" for topic in topics)
+    return f"""
+    As an expert educational assistant, help a student who is preparing for a {subject} exam.
+    Their day-by-day schedule is already done, so do not write a schedule or a topic ranking.
+    
+    - Primary study resource: {resource_type}
+    - Learning preference: {feedback_preference}
+    
+    For each of these high-yield topics:
+{topic_lines}
+    give one short study tip suited to their resource and learning preference, and 2 specific prompts
+    they can use to ask ChatGPT/Gemini for deeper understanding.
+    
+    Then end with a brief motivational message (at most 3 sentences).
+    
+    Start with the heading "## 💡 Tips and prompts", use a "### <topic>" heading for each topic and
+    "### 💪 Motivation" for the message. Keep it under 400 words.
+    """
+
+def study_plan_prompt(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_analysis=None):
+    """Build the prompt for a whole study plan written by the model, from the student's situation and optional syllabus analysis"""
+    
+    # Construct a detailed prompt for the Gemini model
+    prompt = f"""
+    As an expert educational assistant, create a personalized last-minute study plan with the following details:
+    
+    STUDENT SITUATION:
+    - Subject: {subject}
+    - Days remaining until exam: {days_left}
+    - Available study hours per day: {hours_per_day}
+    - Primary study resource: {resource_type}
+    - Learning preference: {feedback_preference}
+    """
+    
+    # Add syllabus analysis if available
+    if syllabus_analysis:
+        prompt += f"""
+    SYLLABUS ANALYSIS:
+    {format_syllabus_analysis(syllabus_analysis)}
+    
+    Base your study plan primarily on the high-priority topics identified in the syllabus analysis.
+    """
+    
+    # Complete the prompt
+    prompt += """
+    Please provide a comprehensive study plan with:
+    1. A day-by-day breakdown showing exactly which topics to cover each day
+    2. Priority ranking of the most high-yield topics (top 20% that will likely cover 80% of exam content)
+    3. For each major topic, suggest 2-3 specific prompts the student can use to ask ChatGPT/Gemini for deeper understanding
+    4. Suggest 5-minute breaks and how to utilize them effectively between study sessions
+    5. A brief motivational message for the student
+    
+    Format your response with clear headings, bullet points, and a visually organized structure.
+    """
+    
+    return prompt
+
+@traced("study_plan")
+def generate_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file=None):
+    """Generate a personalized study plan based on user inputs and optional syllabus"""
+    with stage("prompt"):
+        plan = build_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file)
+    if plan is None:
+        return OFF_TOPIC_SUBJECT_MESSAGE
+    schedule, prompt = plan
+    
+    # Get the tips (or the whole plan, without a schedule) from Gemini
+    with stage("generate"):
+        response = get_gemini_response(prompt, task="plan")
+    
+    # Log the generation for feedback
+    log_interaction(subject, days_left, hours_per_day, resource_type, feedback_preference)
+    
+    return schedule + response
+
+@traced("study_plan")
+def stream_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file=None):
+    """Same as generate_study_plan, but yields the plan as it grows"""
+    with stage("prompt"):
+        plan = build_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file)
+    if plan is None:
+        yield OFF_TOPIC_SUBJECT_MESSAGE
+        return
+    schedule, prompt = plan
+    
+    # The schedule shows up at once; the tips stream in under it
+    if schedule:
+        yield schedule
+    with stage("generate"):
+        for text in accumulate_stream(stream_gemini_response(prompt, task="plan")):
+            yield schedule + text
+    
+    # Log the generation for feedback
+    log_interaction(subject, days_left, hours_per_day, resource_type, feedback_preference)
+
+@traced("study_plan")
+async def async_generate_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file=None):
+    """Async version of generate_study_plan"""
+    with stage("prompt"):
+        plan = await async_build_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file)
+    if plan is None:
+        return OFF_TOPIC_SUBJECT_MESSAGE
+    schedule, prompt = plan
+    with stage("generate"):
+        response = await async_get_gemini_response(prompt, task="plan")
+    log_interaction(subject, days_left, hours_per_day, resource_type, feedback_preference)
+    return schedule + response
+
+@traced("study_plan")
+async def async_stream_study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file=None, plan=None):
+    """Async version of stream_study_plan, pipelined when a new syllabus is uploaded.
+    
+    Syllabus parsing and analysis run concurrently with a generic draft plan
+    (the subject's catalog schedule, if it has one, and its tips), which is
+    streamed in the meantime. As soon as the analysis lands the draft
+    is dropped and the syllabus-based plan is streamed instead; if the analysis
+    yields nothing usable, the draft is kept as the final plan. plan, if
+    given, is the (schedule, prompt) already built for a request without a syllabus.
+    """
+    if plan is None:
+        with stage("prompt"):
+            allowed = is_study_topic(subject, feature="study_plan")
+        if not allowed:
+            yield OFF_TOPIC_SUBJECT_MESSAGE
+            return
+    
+    syllabus_analysis = None
+    
+    if syllabus_file is not None:
+        file_hash, syllabus_analysis = await asyncio.to_thread(cached_syllabus_analysis, syllabus_file)
+        
+        if syllabus_analysis is None:
+            analysis_task = asyncio.create_task(async_analyze_uploaded_syllabus(syllabus_file, subject, file_hash))
+            try:
+                draft_schedule, draft_prompt = study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference)
+                draft_stream = async_stream_gemini_response(draft_prompt, task="plan")
+                draft = ""
+                try:
+                    with stage("draft"):
+                        if draft_schedule:
+                            yield DRAFT_PLAN_NOTICE + draft_schedule
+                        async for text in async_accumulate_stream(draft_stream):
+                            draft = draft_schedule + text
+                            yield DRAFT_PLAN_NOTICE + draft
+                            if analysis_task.done() and not analysis_task.exception() and analysis_task.result():
+                                break
+                finally:
+                    await draft_stream.aclose()
+                
+                try:
+                    syllabus_analysis = await analysis_task
+                except Exception:
+                    syllabus_analysis = None
+            finally:
+                # If the draft failed or the client went away, don't leave the analysis running
+                analysis_task.cancel()
+                await asyncio.gather(analysis_task, return_exceptions=True)
+            
+            if not syllabus_analysis and draft:
+                # Nothing better to refine with, so the draft is the plan
+                yield draft
+                log_interaction(subject, days_left, hours_per_day, resource_type, feedback_preference)
+                return
+    
+    schedule, prompt = plan or study_plan(subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_analysis)
+    if schedule:
+        yield schedule
+    with stage("generate"):
+        async for text in async_accumulate_stream(async_stream_gemini_response(prompt, task="plan")):
+            yield schedule + text
+    
+    log_interaction(subject, days_left, hours_per_day, resource_type, feedback_preference)
+
+OFF_TOPIC_MESSAGE = "I can only generate practice questions for academic or study-related topics. Please enter a topic related to your studies or coursework."
+OFF_TOPIC_PROMPTS_MESSAGE = "I can only suggest prompts for academic or study-related topics. Please enter a topic related to your studies or coursework."
+OFF_TOPIC_SUBJECT_MESSAGE = "I can only create study plans for academic subjects. Please choose or enter the subject you are preparing for."
+DRAFT_PLAN_NOTICE = "⏳ Analyzing your syllabus... Here is a general plan in the meantime.\n\n"
+
+def is_study_topic(subject, topic=None, feature="practice_questions"):
+    """Check whether the subject/topic pair (or the subject alone) is academic or study-related.
+    
+    Decided locally by the precompiled topic gate, before any model call.
+    """
+    allowed, reason = topic_gate.classify(subject or "", topic)
+    TOPIC_GATE.inc(feature=feature, verdict="allowed" if allowed else "rejected", reason=reason)
+    return allowed
+
+def build_practice_questions_prompt(subject, topic, materials_file=None):
+    """Build the practice questions prompt, or return None if the topic is not study-related"""
+    if not is_study_topic(subject, topic):
+        return None
+    
+    # Process materials if provided, otherwise reuse earlier uploads for this subject
+    # when shared retrieval is on
+    materials_text = None
+    
+    if materials_file is not None:
+        materials_text = load_materials_text(materials_file, subject, topic)
+    elif SHARED_RETRIEVAL:
+        materials_text = retrieve_materials(subject, canonical_topic(subject, topic))
+    
+    return topic_prompt(practice_questions_prompt, subject, topic, materials_text)
+
+async def async_build_practice_questions_prompt(subject, topic, materials_file=None):
+    """Async version of build_practice_questions_prompt; file parsing runs in a worker thread"""
+    if not is_study_topic(subject, topic):
+        return None
+    
+    materials_text = None
+    
+    if materials_file is not None:
+        materials_text = await asyncio.to_thread(load_materials_text, materials_file, subject, topic)
+    elif SHARED_RETRIEVAL:
+        materials_text = await asyncio.to_thread(retrieve_materials, subject, canonical_topic(subject, topic))
+    
+    return topic_prompt(practice_questions_prompt, subject, topic, materials_text)
+
+def practice_questions_prompt(subject, topic, materials_text=None):
+    """Build the practice questions prompt from the topic and optional materials text"""
+    
+    # Base prompt
+    prompt = f"""
+    Create 5 high-quality practice questions for the topic '{topic}' in the subject '{subject}'. 
+    
+    For each question:
+    1. Start with a challenging but fair question that tests deep understanding
+    2. Provide a detailed solution
+    3. Add a brief explanation of the key concept being tested
+    
+    Format each question clearly with numbers and visual separation.
+    """
+    
+    # Add materials content if available
+    if materials_text and len(materials_text) > 100:
+        prompt += f"""
+    
+    BASE YOUR QUESTIONS ON THE FOLLOWING MATERIALS:
+    {materials_text}
+    
+    Make sure the questions are directly relevant to the content in these materials, 
+    focusing on the key concepts, formulas, and techniques mentioned.
+    """
+    else:
+        # If no materials provided, emphasize focusing on the standard curriculum
+        prompt += """
+        
+    Focus on standard curriculum content for this topic that would typically appear in exams.
+    Cover different aspects and difficulty levels of this topic.
+    """
+    
+    return prompt
+
+@traced("practice_questions")
+def generate_practice_questions(subject, topic, materials_file=None):
+    """Generate practice questions for a specific topic using optional topic materials"""
+    with stage("prompt"):
+        prompt = build_practice_questions_prompt(subject, topic, materials_file)
+    if prompt is None:
+        return OFF_TOPIC_MESSAGE
+    
+    with stage("generate"):
+        return get_gemini_response(prompt, task="questions")
+
+@traced("practice_questions")
+def stream_practice_questions(subject, topic, materials_file=None):
+    """Same as generate_practice_questions, but yields the questions as they grow"""
+    with stage("prompt"):
+        prompt = build_practice_questions_prompt(subject, topic, materials_file)
+    if prompt is None:
+        yield OFF_TOPIC_MESSAGE
+        return
+    
+    with stage("generate"):
+        yield from accumulate_stream(stream_gemini_response(prompt, task="questions"))
+
+@traced("practice_questions")
+async def async_generate_practice_questions(subject, topic, materials_file=None):
+    """Async version of generate_practice_questions"""
+    with stage("prompt"):
+        prompt = await async_build_practice_questions_prompt(subject, topic, materials_file)
+    if prompt is None:
+        return OFF_TOPIC_MESSAGE
+    
+    with stage("generate"):
+        return await async_get_gemini_response(prompt, task="questions")
+
+@traced("practice_questions")
+async def async_stream_practice_questions(subject, topic, materials_file=None, prompt=None):
+    """Async version of stream_practice_questions; prompt, if given, is the one already built for the request"""
+    if prompt is None:
+        with stage("prompt"):
+            prompt = await async_build_practice_questions_prompt(subject, topic, materials_file)
+    if prompt is None:
+        yield OFF_TOPIC_MESSAGE
+        return
+    
+    with stage("generate"):
+        async for text in async_accumulate_stream(async_stream_gemini_response(prompt, task="questions")):
+            yield text
+
+def build_smart_prompts_prompt(subject, topic):
+    """Build the smart prompt generator prompt, or return None if the topic is not study-related"""
+    if not is_study_topic(subject, topic, feature="smart_prompts"):
+        return None
+    return topic_prompt(smart_prompts_prompt, subject, topic)
+
+def smart_prompts_prompt(subject, topic):
+    """Build the smart prompt generator prompt from the topic"""
+    prompt = f"""
+    Generate 5 effective prompts that a student can use to ask ChatGPT/Gemini about the topic '{topic}' in '{subject}'.
+    
+    For each prompt:
+    1. Make it specific and focused on a particular aspect of the topic
+    2. Design it to extract conceptual understanding rather than just facts
+    3. Frame it to get explanations with analogies or visualizations
+    4. Add a brief note on what kind of insight this prompt is designed to extract
+    
+    Format as a numbered list with clear separation between prompts.
+    """
+    
+    return prompt
+
+@traced("smart_prompts")
+def generate_smart_prompts(subject, topic):
+    """Generate smart prompts to ask AI about a specific topic"""
+    with stage("prompt"):
+        prompt = build_smart_prompts_prompt(subject, topic)
+    if prompt is None:
+        return OFF_TOPIC_PROMPTS_MESSAGE
+    
+    with stage("generate"):
+        return get_gemini_response(prompt, task="prompts")
+
+@traced("smart_prompts")
+def stream_smart_prompts(subject, topic):
+    """Same as generate_smart_prompts, but yields the prompts as they grow"""
+    with stage("prompt"):
+        prompt = build_smart_prompts_prompt(subject, topic)
+    if prompt is None:
+        yield OFF_TOPIC_PROMPTS_MESSAGE
+        return
+    
+    with stage("generate"):
+        yield from accumulate_stream(stream_gemini_response(prompt, task="prompts"))
+
+@traced("smart_prompts")
+async def async_generate_smart_prompts(subject, topic):
+    """Async version of generate_smart_prompts"""
+    with stage("prompt"):
+        prompt = build_smart_prompts_prompt(subject, topic)
+    if prompt is None:
+        return OFF_TOPIC_PROMPTS_MESSAGE
+    
+    with stage("generate"):
+        return await async_get_gemini_response(prompt, task="prompts")
+
+@traced("smart_prompts")
+async def async_stream_smart_prompts(subject, topic, prompt=None):
+    """Async version of stream_smart_prompts; prompt, if given, is the one already built for the request"""
+    if prompt is None:
+        with stage("prompt"):
+            prompt = build_smart_prompts_prompt(subject, topic)
+    if prompt is None:
+        yield OFF_TOPIC_PROMPTS_MESSAGE
+        return
+    
+    with stage("generate"):
+        async for text in async_accumulate_stream(async_stream_gemini_response(prompt, task="prompts")):
+            yield text
+
+# Interaction and feedback logs are written by background threads in batches,
+# so requests never wait on file I/O. Their files and columns are defined with
+# the Parquet store they are compacted into (interaction_store.py). Under
+# workers.py the batches go to the supervisor, the only process writing the files.
+interaction_log = open_log(LOG_TABLES["interactions"]["path"], LOG_TABLES["interactions"]["columns"])
+feedback_log = open_log(LOG_TABLES["feedback"]["path"], LOG_TABLES["feedback"]["columns"])
+# Topics users ask about, mined by prewarm.py to pre-generate popular answers
+topic_log = open_log(LOG_TABLES["topics"]["path"], LOG_TABLES["topics"]["columns"])
+
+def log_interaction(subject, days_left, hours_per_day, resource_type, feedback_preference):
+    """Log user interactions to a CSV file for future improvements"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with stage("log"):
+        return interaction_log.write([timestamp, subject, days_left, hours_per_day, resource_type, feedback_preference])
+
+def log_topic_request(feature, subject, topic):
+    """Log the subject and topic of a practice questions or smart prompts request"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with stage("log"):
+        return topic_log.write([timestamp, feature, subject, topic])
+
+def save_feedback(feedback_type, feedback_text, plan_details, subject="", feedback_preference=""):
+    """Save user feedback for continuous improvement"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    # The csv module quotes commas and newlines, so the text is stored as-is
+    feedback_log.write([timestamp, feedback_type, feedback_text, plan_details, subject or "", feedback_preference or ""])
+    
+    return "Thank you for your feedback! It helps us improve future study plans."
+
+# Point-in-time stats of caches, request coalescing, the resilience layer and
+# the log writers, exported as gauges next to the request metrics
+REGISTRY.register_stats("codelala_response_cache", response_cache.stats)
+REGISTRY.register_stats("codelala_analysis_cache", syllabus_analysis_cache.stats)
+REGISTRY.register_stats("codelala_extraction", extraction_stats)
+REGISTRY.register_stats("codelala_coalescing", inflight_requests.stats)
+REGISTRY.register_stats("codelala_async_coalescing", async_inflight_requests.stats)
+REGISTRY.register_stats("codelala_worker_locks", worker_locks.stats)
+REGISTRY.register_stats("codelala_upstream", lambda: dict(upstream.stats(), latency={}, breaker_open=upstream.breaker.state == "open"))
+REGISTRY.register_stats("codelala_router", lambda: {key: value for key, value in get_router().stats().items() if key != "routes"})
+REGISTRY.register_stats("codelala_interaction_log", interaction_log.stats)
+REGISTRY.register_stats("codelala_feedback_log", feedback_log.stats)
+REGISTRY.register_stats("codelala_topic_log", topic_log.stats)
+REGISTRY.register_stats("codelala_admission", admission.stats)
+
+# Prometheus metrics (/metrics) and recent request traces (/traces) are served
+# on their own port next to the Gradio app; set CODELALA_METRICS_PORT to "" to disable
+METRICS_PORT = os.environ.get("CODELALA_METRICS_PORT", "9108")
+METRICS_HOST = os.environ.get("CODELALA_METRICS_HOST", "127.0.0.1")
+
+async def with_upstream_errors(texts):
+    """Pass a stream of growing texts through, ending it with a readable notice if upstream fails"""
+    text = ""
+    try:
+        async for text in texts:
+            yield text
+    except UpstreamError:
+        yield (text + "\n\n" if text else "") + UPSTREAM_ERROR_MESSAGE
+
+# Function to handle "Other" subject selection
+def get_final_subject(dropdown_value, other_value):
+    if dropdown_value == OTHER_SUBJECT and other_value:
+        return other_value
+    return dropdown_value
+
+def answered_locally(prompt, task):
+    """Whether a request needs no model call: its prompt is None (off-topic) or its answer is cached"""
+    return prompt is None or response_cache.age(response_cache_key(prompt, task)) is not None
+
+async def local_reply(text):
+    yield text
+
+def rate_limited(event, session=None, ip=None):
+    """The message for a client over its session's or IP's rate limit, or None if the request may go on"""
+    try:
+        admission.check_rate(session, ip)
+    except Rejected as error:
+        ADMISSIONS.inc(event=event, outcome=error.reason)
+        return RATE_LIMITED_MESSAGE.format(seconds=max(round(error.retry_after), 1))
+    return None
+
+async def admitted(event, texts, priority=CHEAP, local=False):
+    """Pass texts through once the request has a slot in the event's pool, or yield BUSY_MESSAGE if it gets none.
+    
+    Requests answered without the model (local) skip the pool; the rest wait
+    for a slot by priority, cheap ones first.
+    """
+    try:
+        pool, waited = (None, 0.0) if local else await admission.acquire(event, priority)
+    except Rejected as error:
+        ADMISSIONS.inc(event=event, outcome=error.reason)
+        yield BUSY_MESSAGE
+        return
+    
+    ADMISSIONS.inc(event=event, outcome="local" if local else "admitted")
+    if pool is not None:
+        QUEUE_SECONDS.observe(waited, event=event)
+    try:
+        async for text in texts:
+            yield text
+    finally:
+        if pool is not None:
+            pool.release()
+
+# Event handlers with the combined subject inputs; module-level so they can be driven
+# without the UI. session and ip identify the client for per-user rate limits.
+async def handle_study_plan(dropdown_subject, other_subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file, session=None, ip=None):
+    final_subject = get_final_subject(dropdown_subject, other_subject)
+    refusal = rate_limited("study_plan", session, ip)
+    if refusal:
+        yield refusal
+        return
+    
+    # Show a processing message if syllabus is uploaded
+    if syllabus_file is not None:
+        processing_message = "⏳ Analyzing your syllabus to identify key topics... This may take a moment."
+        yield processing_message
+        texts = async_stream_study_plan(final_subject, days_left, hours_per_day, resource_type, feedback_preference, syllabus_file)
+        priority, local = HEAVY, False
+    else:
+        # Without a syllabus the plan is laid out locally, so a cached answer to its prompt can be checked first
+        plan = build_study_plan(final_subject, days_left, hours_per_day, resource_type, feedback_preference)
+        if plan is None:
+            texts = local_reply(OFF_TOPIC_SUBJECT_MESSAGE)
+        else:
+            texts = async_stream_study_plan(final_subject, days_left, hours_per_day, resource_type, feedback_preference, plan=plan)
+        priority, local = CHEAP, answered_locally(plan and plan[1], "plan")
+    
+    # Stream the study plan into the output pane as it is generated
+    async for text in admitted("study_plan", with_upstream_errors(texts), priority, local):
+        yield text
+
+async def handle_practice_questions(dropdown_subject, other_subject, topic, materials_file, session=None, ip=None):
+    """Handle practice question generation with subject selection and materials"""
+    final_subject = get_final_subject(dropdown_subject, other_subject)
+    
+    # Validate inputs
+    if not topic or topic.strip() == "":
+        yield "Please enter a specific topic to generate practice questions."
+        return
+    topic = topic.strip()
+    log_topic_request("practice_questions", final_subject, topic)
+    refusal = rate_limited("practice_questions", session, ip)
+    if refusal:
+        yield refusal
+        return
+    
+    # Show appropriate processing message
+    if materials_file is not None:
+        processing_message = "⏳ Analyzing your materials to create targeted practice questions... This may take a moment."
+        yield processing_message
+    else:
+        processing_message = "⏳ Generating practice questions for your topic... This may take a moment."
+        yield processing_message
+    
+    if materials_file is not None:
+        texts = async_stream_practice_questions(final_subject, topic, materials_file)
+        priority, local = HEAVY, False
+    else:
+        prompt = await async_build_practice_questions_prompt(final_subject, topic)
+        texts = async_stream_practice_questions(final_subject, topic, prompt=prompt) if prompt is not None else local_reply(OFF_TOPIC_MESSAGE)
+        priority, local = CHEAP, answered_locally(prompt, "questions")
+    
+    # Stream the practice questions as they are generated
+    async for text in admitted("practice_questions", with_upstream_errors(texts), priority, local):
+        yield text
+
+async def handle_smart_prompts(dropdown_subject, other_subject, topic, session=None, ip=None):
+    final_subject = get_final_subject(dropdown_subject, other_subject)
+    topic = (topic or "").strip()
+    if topic:
+        log_topic_request("smart_prompts", final_subject, topic)
+    refusal = rate_limited("smart_prompts", session, ip)
+    if refusal:
+        yield refusal
+        return
+    prompt = build_smart_prompts_prompt(final_subject, topic)
+    texts = async_stream_smart_prompts(final_subject, topic, prompt) if prompt is not None else local_reply(OFF_TOPIC_PROMPTS_MESSAGE)
+    async for text in admitted("smart_prompts", with_upstream_errors(texts), CHEAP, answered_locally(prompt, "prompts")):
+        yield text
+
+def handle_feedback(feedback_type, feedback_text, plan_details, dropdown_subject, other_subject, feedback_preference):
+    """Save feedback on a study plan with the subject and learning preference it was made for"""
+    return save_feedback(feedback_type, feedback_text, plan_details,
+                         get_final_subject(dropdown_subject, other_subject), feedback_preference)
@@ -0,0 +1,228 @@
+import math
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Token budget for uploaded material placed into a prompt
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CODELALA_CONTEXT_TOKENS", "3000"))
+
+# How much text is extracted before budgeting (instead of a blind 12,000-char cut)
+SOURCE_MAX_CHARS = int(os.environ.get("CODELALA_SOURCE_MAX_CHARS", "200000"))
+
+CHUNK_TOKENS = 250
+
+# Gemini has no local tokenizer; ~4 characters per token is close for English prose
+CHARS_PER_TOKEN = 4
+
+# Map-reduce summarization: input per map call and maximum number of rounds
+MAP_TOKENS = 6000
+MAX_REDUCE_ROUNDS = 3
+
+# Sections of a structured document (a syllabus): every one keeps its opening
+# when the document is budgeted, however little it matches the query
+SECTION_MIN_TOKENS = 25
+
+WORD = re.compile(r"[a-z0-9]+")
+SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+# Extracted text has its line breaks collapsed, so headings are found by their wording
+SECTION_HEADING = re.compile(r"\b(?:unit|module|chapter|section|part|week|lecture)\s*[-:.]?\s*(?:\d+|[ivx]+)\b",
+                             re.IGNORECASE)
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were
+will with which what when where who how why can into than then there these those their
+""".split())
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def tokenize(text):
+    """Lowercased content words with a light plural strip, for ranking"""
+    terms = []
+    for word in WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def split_into_chunks(text, chunk_tokens=CHUNK_TOKENS):
+    """Split text into ~chunk_tokens pieces along sentence boundaries"""
+    chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    length = 0
+    for sentence in SENTENCE_END.split(text):
+        if length + len(sentence) > chunk_chars and current:
+            chunks.append(" ".join(current))
+            current = []
+            length = 0
+        # Hard-split run-on "sentences" (tables, bullet dumps) that exceed a chunk
+        while len(sentence) > chunk_chars:
+            chunks.append(sentence[:chunk_chars])
+            sentence = sentence[chunk_chars:]
+        current.append(sentence)
+        length += len(sentence) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def split_into_sections(text, max_sections):
+    """Split text at its section headings ("Unit 3", "Chapter IV", ...), or into equal slices if it has none.
+
+    Adjacent sections are merged so there are at most max_sections.
+    """
+    starts = [match.start() for match in SECTION_HEADING.finditer(text)]
+    if len(starts) < 2:
+        size = math.ceil(len(text) / max(max_sections, 1))
+        starts = list(range(0, len(text), size))
+    starts[0] = 0
+    # Keep every step-th heading so the sections don't outnumber max_sections
+    step = math.ceil(len(starts) / max(max_sections, 1))
+    starts = starts[::step]
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)]) if text[start:end].strip()]
+
+
+def bm25_scores(chunks, query, k1=1.5, b=0.75):
+    """Okapi BM25 relevance of each chunk to the query"""
+    query_terms = set(tokenize(query))
+    documents = [tokenize(chunk) for chunk in chunks]
+    if not query_terms or not documents:
+        return [0.0] * len(chunks)
+
+    average_length = sum(len(doc) for doc in documents) / len(documents) or 1.0
+    document_frequency = Counter(term for doc in documents for term in set(doc) & query_terms)
+    idf = {
+        term: math.log(1 + (len(documents) - freq + 0.5) / (freq + 0.5))
+        for term, freq in document_frequency.items()
+    }
+
+    scores = []
+    for doc in documents:
+        frequencies = Counter(doc)
+        score = 0.0
+        for term, weight in idf.items():
+            tf = frequencies.get(term, 0)
+            if tf:
+                score += weight * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / average_length))
+        scores.append(score)
+    return scores
+
+
+def pack_chunks(chunks, scores, budget_tokens):
+    """Greedily keep the highest-scoring chunks that fit, in their original order"""
+    order = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    chosen = []
+    used = 0
+    for index in order:
+        cost = estimate_tokens(chunks[index]) + 1
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(index)
+        used += cost
+    chosen.sort()
+
+    parts = []
+    for position, index in enumerate(chosen):
+        if position and index != chosen[position - 1] + 1:
+            parts.append("[...]")
+        parts.append(chunks[index])
+    return " ".join(parts)
+
+
+def map_reduce_summarize(chunks, budget_tokens, summarize, focus):
+    """Summarize chunks in batches (map), then summarize the summaries (reduce) until they fit.
+
+    summarize(text, focus, target_tokens) is the model call; batches of one
+    round are summarized concurrently.
+    """
+    texts = chunks
+    for _ in range(MAX_REDUCE_ROUNDS):
+        batches = []
+        current = []
+        length = 0
+        for text in texts:
+            cost = estimate_tokens(text)
+            if current and length + cost > MAP_TOKENS:
+                batches.append(" ".join(current))
+                current = []
+                length = 0
+            current.append(text)
+            length += cost
+        if current:
+            batches.append(" ".join(current))
+
+        target_tokens = max(budget_tokens // len(batches), 100)
+        with ThreadPoolExecutor(max_workers=min(len(batches), 4)) as pool:
+            texts = list(pool.map(lambda batch: summarize(batch, focus, target_tokens), batches))
+        texts = [text for text in texts if text]
+
+        if estimate_tokens(" ".join(texts)) <= budget_tokens or len(batches) == 1:
+            break
+
+    # Still over after the last round: keep the most relevant summaries
+    return pack_chunks(texts, bm25_scores(texts, focus), budget_tokens)
+
+
+def section_chunks(text, budget_tokens, chunk_tokens):
+    """Chunks of text in document order, and the indices of those that open a section.
+
+    Half the budget is shared out among the sections' openings; the rest of
+    each section is chunked as usual.
+    """
+    sections = split_into_sections(text, max(budget_tokens // (2 * SECTION_MIN_TOKENS), 1))
+    opening_chars = budget_tokens // (2 * len(sections)) * CHARS_PER_TOKEN
+    chunks = []
+    openings = set()
+    for section in sections:
+        section = section.strip()
+        # Cut the opening at a word boundary
+        cut = len(section) if len(section) <= opening_chars else (section.rfind(" ", 0, opening_chars) + 1
+                                                                 or opening_chars)
+        openings.add(len(chunks))
+        chunks.append(section[:cut].strip())
+        chunks.extend(split_into_chunks(section[cut:], chunk_tokens))
+    return chunks, openings
+
+
+def fit_to_budget(text, query, budget_tokens=CONTEXT_TOKEN_BUDGET, summarize=None, keep_sections=False):
+    """Reduce text to budget_tokens, keeping what is most relevant to the query.
+
+    Text that already fits is returned unchanged. Otherwise it is chunked and
+    ranked with BM25 against the query. With a summarize function, relevant
+    material that still exceeds the budget is map-reduce summarized;
+    without one, the top-ranked chunks are packed into the budget.
+    keep_sections is for documents that must stay complete (a syllabus):
+    every section keeps its opening, and with a summarize function all of
+    the text is summarized, not only the part matching the query.
+    """
+    if not text or estimate_tokens(text) <= budget_tokens:
+        return text
+
+    # Small budgets need small chunks, or even the best chunk would not fit
+    chunk_tokens = min(CHUNK_TOKENS, max(budget_tokens // 4, 25))
+    if keep_sections:
+        if summarize is not None:
+            return map_reduce_summarize(split_into_chunks(text, chunk_tokens), budget_tokens, summarize, query)
+        chunks, openings = section_chunks(text, budget_tokens, chunk_tokens)
+        scores = bm25_scores(chunks, query)
+        top = max(scores, default=0.0) + 1
+        return pack_chunks(chunks, [top if index in openings else score for index, score in enumerate(scores)],
+                           budget_tokens)
+
+    chunks = split_into_chunks(text, chunk_tokens)
+    scores = bm25_scores(chunks, query)
+
+    if summarize is not None:
+        relevant = [chunk for chunk, score in zip(chunks, scores) if score > 0] or chunks
+        if sum(estimate_tokens(chunk) + 1 for chunk in relevant) > budget_tokens:
+            return map_reduce_summarize(relevant, budget_tokens, summarize, query)
+
+    return pack_chunks(chunks, scores, budget_tokens)
@@ -0,0 +1,205 @@
+"""Compact the rotated CSV logs into date-partitioned Parquet files.
+
+    python interaction_store.py                     # every table, once
+    python interaction_store.py --delete --every 1  # hourly, removing compacted CSVs
+
+Each rotated file of a table's CSV log (see log_writer) is converted to
+STORE_DIR/<table>/date=YYYY-MM-DD/<file>.parquet and listed in the table's
+manifest, so later runs only convert new files. The active CSV file is left
+to its writer; analytics.py reads the Parquet files together with the CSV
+rows that are not compacted yet. Needs pandas and pyarrow.
+"""
+import argparse
+import csv
+import itertools
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+from log_writer import log_files
+
+STORE_DIR = os.environ.get("CODELALA_STORE_DIR", os.path.join("logs", "store"))
+MANIFEST = "_compacted.txt"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+logger = logging.getLogger("codelala.store")
+
+# Each log's CSV file and columns, in file order. "category" columns are few
+# distinct strings (subjects, features), "text" columns free text. Rows with
+# more fields than the header are joined back into the "overflow" columns: the
+# interaction log was written unquoted before CsvLogWriter, and four of the
+# learning preferences (and any custom subject) can contain a comma.
+TABLES = {
+    "interactions": {
+        "path": os.path.join("logs", "user_interactions.csv"),
+        "overflow": ("feedback_preference", "subject"),
+        "columns": {"timestamp": "timestamp", "subject": "category", "days_left": "number",
+                    "hours_per_day": "number", "resource_type": "category", "feedback_preference": "category"},
+    },
+    "feedback": {
+        "path": os.path.join("feedback", "user_feedback.csv"),
+        "columns": {"timestamp": "timestamp", "feedback_type": "category", "feedback_text": "text",
+                    "plan_details": "text", "subject": "category", "feedback_preference": "category"},
+    },
+    # Topics of practice questions and smart prompts requests, mined by prewarm.py
+    "topics": {
+        "path": os.path.join("logs", "topic_requests.csv"),
+        "columns": {"timestamp": "timestamp", "feature": "category", "subject": "category", "topic": "text"},
+    },
+}
+
+
+def typed(frame, columns):
+    """frame with the table's columns (missing ones empty) in their stored types"""
+    import pandas as pd
+
+    frame = frame.reindex(columns=list(columns))
+    for column, kind in columns.items():
+        if kind == "timestamp":
+            frame[column] = pd.to_datetime(frame[column], format=TIMESTAMP_FORMAT, errors="coerce").astype("datetime64[ns]")
+        elif kind == "number":
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+        else:
+            # Categories are stored as plain strings (Parquet dictionary-encodes them anyway),
+            # so files written at different times share one schema
+            frame[column] = frame[column].fillna("").astype(str)
+    return frame[frame["timestamp"].notna()]
+
+
+def rejoin(row, header, splits, numbers):
+    """row with its extra fields joined back into the columns at splits, or None if no way of doing so parses"""
+    extra = len(row) - len(header)
+    # Every way of sharing the extra fields among the overflow columns, the first column's share largest first
+    for shares in itertools.product(range(extra, -1, -1), repeat=len(splits)):
+        if sum(shares) != extra:
+            continue
+        fields = []
+        position = 0
+        for index in range(len(header)):
+            width = 1 + shares[splits.index(index)] if index in splits else 1
+            fields.append(",".join(row[position:position + width]))
+            position += width
+        if all(not fields[i] or is_number(fields[i]) for i in numbers):
+            return fields
+    return None
+
+
+def is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def read_rows(path, columns, overflow=()):
+    """(header, rows) of a CSV log file, with unquoted commas in the overflow columns joined back.
+
+    Rows that still don't fit the header are left out and counted in a warning.
+    """
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        splits = [header.index(name) for name in overflow if name in header]
+        numbers = [i for i, name in enumerate(header) if columns.get(name) == "number"]
+        rows = []
+        repaired = rejected = 0
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(header):
+                row = rejoin(row, header, splits, numbers) if len(row) > len(header) and splits else None
+                if row is None:
+                    rejected += 1
+                    continue
+                repaired += 1
+            rows.append(row)
+    if repaired or rejected:
+        logger.warning("%s: %d rows with unquoted commas repaired, %d rows that don't fit the header left out",
+                       path, repaired, rejected)
+    return header, rows
+
+
+def read_csv(path, columns, overflow=()):
+    """One CSV log file as a typed DataFrame"""
+    import pandas as pd
+
+    header, rows = read_rows(path, columns, overflow)
+    return typed(pd.DataFrame(rows, columns=header, dtype=str), columns)
+
+
+def compacted(table, store_dir=STORE_DIR):
+    """Names of the table's CSV files already in the store"""
+    try:
+        with open(os.path.join(store_dir, table, MANIFEST), encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def pending_files(table, store_dir=STORE_DIR, path=None):
+    """The table's CSV files not in the store yet, including the active one"""
+    done = compacted(table, store_dir)
+    return [name for name in log_files(path or TABLES[table]["path"]) if os.path.basename(name) not in done]
+
+
+def compact(table, store_dir=STORE_DIR, delete=False):
+    """Convert the table's rotated CSV files to Parquet; returns the number of rows added"""
+    spec = TABLES[table]
+    table_dir = os.path.join(store_dir, table)
+    rows = 0
+    for path in pending_files(table, store_dir):
+        if os.path.abspath(path) == os.path.abspath(spec["path"]):
+            continue
+        name = os.path.basename(path)
+        frame = read_csv(path, spec["columns"], spec.get("overflow", ()))
+        for day, part in frame.groupby(frame["timestamp"].dt.strftime("%Y-%m-%d")):
+            part_dir = os.path.join(table_dir, f"date={day}")
+            os.makedirs(part_dir, exist_ok=True)
+            # Named after the source file, so a run interrupted before the manifest is updated just rewrites it
+            part.to_parquet(os.path.join(part_dir, os.path.splitext(name)[0] + ".parquet"), index=False)
+        os.makedirs(table_dir, exist_ok=True)
+        with open(os.path.join(table_dir, MANIFEST), "a", encoding="utf-8") as f:
+            f.write(name + "\n")
+        if delete:
+            os.remove(path)
+        rows += len(frame)
+    return rows
+
+
+def read_store(table, since=None, store_dir=STORE_DIR):
+    """The table's compacted rows (from the since date's partition on), or None if there are none"""
+    import pandas as pd
+
+    table_dir = os.path.join(store_dir, table)
+    if not os.path.isdir(table_dir) or not any(entry.startswith("date=") for entry in os.listdir(table_dir)):
+        return None
+    filters = [("date", ">=", since.strftime("%Y-%m-%d"))] if since is not None else None
+    return pd.read_parquet(table_dir, filters=filters, columns=list(TABLES[table]["columns"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", default=",".join(TABLES), help=f"comma-separated, from {', '.join(TABLES)}")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--delete", action="store_true", help="remove CSV files once they are compacted")
+    parser.add_argument("--every", type=float, default=None, help="repeat every N hours (default: run once)")
+    args = parser.parse_args()
+
+    tables = [table.strip() for table in args.tables.split(",") if table.strip()]
+    if any(table not in TABLES for table in tables):
+        parser.error(f"--tables must be from {', '.join(TABLES)}")
+    while True:
+        started = time.perf_counter()
+        rows = {table: compact(table, args.store, args.delete) for table in tables}
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} compacted {rows} in {time.perf_counter() - started:.1f}s",
+              file=sys.stderr, flush=True)
+        if args.every is None:
+            return
+        time.sleep(max(args.every * 3600 - (time.perf_counter() - started), 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import atexit
+import csv
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+_STOP = object()
+
+logger = logging.getLogger("codelala.logs")
+
+
+def log_files(path):
+    """The log and the files it was rotated into"""
+    stem, ext = os.path.splitext(path)
+    return sorted(set(glob.glob(f"{stem}-*{ext}")) | ({path} if os.path.exists(path) else set()))
+
+
+class CsvLogWriter:
+    """Append CSV rows from any thread; a single background thread does the file I/O.
+
+    Rows go into a bounded queue and are written in batches when batch_size
+    rows are pending or flush_interval seconds have passed. The file is
+    rotated when it grows past max_bytes, a new day starts or its header
+    differs from the current columns, and pending
+    rows are drained on close (registered with atexit).
+    """
+
+    def __init__(self, path, header, max_queue=10000, batch_size=100, flush_interval=1.0,
+                 max_bytes=10 * 1024 * 1024, rotate_daily=True):
+        self.path = path
+        self.header = list(header)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        # The header of an existing file only needs checking once; later files are ours
+        self._header_checked = False
+
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    def write(self, row):
+        """Queue a row without blocking; returns False if the queue is full and the row was dropped"""
+        if self._closed:
+            return False
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(list(row))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self):
+        """Block until every queued row has been written"""
+        if self._thread is not None:
+            self.queue.join()
+
+    def close(self, timeout=10):
+        """Drain pending rows and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=f"log-writer:{self.path}", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            stop = item is _STOP
+            if item is not None and not stop:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (stop or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    # Any failure loses this batch only; the thread keeps going so flush() and close() return
+                    logger.exception("%s: dropped %d rows", self.path, len(batch))
+                    self.dropped += len(batch)
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+                batch = []
+                deadline = None
+
+            if stop:
+                self.queue.task_done()
+                return
+
+    def _write_batch(self, rows):
+        log_dir = os.path.dirname(self.path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        self._maybe_rotate()
+
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.header)
+            writer.writerows(rows)
+        self.written += len(rows)
+
+    def _maybe_rotate(self):
+        if not os.path.exists(self.path):
+            return
+        stat = os.stat(self.path)
+        modified = datetime.fromtimestamp(stat.st_mtime)
+        too_big = self.max_bytes and stat.st_size >= self.max_bytes
+        new_day = self.rotate_daily and modified.date() != date.today()
+        header_changed = not self._header_checked and self._header_changed()
+        self._header_checked = True
+        if not (too_big or new_day or header_changed):
+            return
+
+        stem, ext = os.path.splitext(self.path)
+        rotated = f"{stem}-{modified.strftime('%Y%m%d-%H%M%S')}{ext}"
+        suffix = 1
+        while os.path.exists(rotated):
+            rotated = f"{stem}-{modified.strftime('%Y%m%d-%H%M%S')}-{suffix}{ext}"
+            suffix += 1
+        os.replace(self.path, rotated)
+        self.rotations += 1
+
+    def _header_changed(self):
+        """Whether the file was started with other columns (rows of both kinds can't share one header)"""
+        with open(self.path, newline='', encoding='utf-8') as f:
+            return next(csv.reader(f), self.header) != self.header
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "written": self.written, "dropped": self.dropped,
+                "rotations": self.rotations}
+
+
+class RemoteLogWriter(CsvLogWriter):
+    """A CsvLogWriter whose batches go to a LogSink instead of the file, so worker processes can share one log.
+
+    Rows are queued and batched exactly as by CsvLogWriter; a batch the sink
+    can't be reached for is dropped (and counted) like one that fails to write.
+    """
+
+    def __init__(self, path, header, address, authkey, **kwargs):
+        super().__init__(path, header, **kwargs)
+        self.address = address
+        self.authkey = authkey
+        self._connection = None
+
+    def _write_batch(self, rows):
+        try:
+            if self._connection is None:
+                self._connection = Client(self.address, authkey=self.authkey)
+            self._connection.send((self.path, self.header, rows))
+        except (OSError, EOFError, AuthenticationError) as e:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            raise OSError(f"log sink unreachable: {e}") from e
+        self.written += len(rows)
+
+    def close(self, timeout=10):
+        super().close(timeout)
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class LogSink:
+    """The one process that writes the CSV logs of several workers: a CsvLogWriter per log file, fed by RemoteLogWriters.
+
+    address is a Unix socket path or a (host, port) pair; authkey (bytes) is
+    shared with the workers. Each connection is served by its own thread.
+    """
+
+    def __init__(self, address, authkey, **writer_options):
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.writer_options = writer_options
+        self.writers = {}
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        threading.Thread(target=self._accept, name="log-sink", daemon=True).start()
+        return self
+
+    def _writer(self, path, header):
+        with self._lock:
+            writer = self.writers.get(path)
+            if writer is None:
+                writer = self.writers[path] = CsvLogWriter(path, header, **self.writer_options)
+            return writer
+
+    def _accept(self):
+        while not self._closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._closed:
+                    return
+                continue  # e.g. a client with the wrong authkey
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(connection,), name="log-sink-connection", daemon=True).start()
+
+    def _serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    path, header, rows = connection.recv()
+                except (EOFError, OSError):
+                    return
+                writer = self._writer(path, header)
+                for row in rows:
+                    writer.write(row)
+
+    def close(self):
+        """Stop accepting rows and drain every log"""
+        self._closed = True
+        self.listener.close()
+        with self._lock:
+            writers = list(self.writers.values())
+        for writer in writers:
+            writer.close()
+
+    def stats(self):
+        with self._lock:
+            return {"connections": self.connections,
+                    **{path: writer.stats() for path, writer in self.writers.items()}}
+
+
+def open_log(path, header):
+    """A writer for a CSV log: to the LogSink at CODELALA_LOG_SINK if one is set (multi-worker mode), else to the file"""
+    address = os.environ.get("CODELALA_LOG_SINK", "")
+    if not address:
+        return CsvLogWriter(path, header)
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        address = (host, int(port))
+    return RemoteLogWriter(path, header, address, bytes.fromhex(os.environ.get("CODELALA_LOG_SINK_KEY", "")))
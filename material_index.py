@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from context_budget import split_into_chunks, tokenize
+
+# Candidates pulled from the inverted index before embedding re-ranking
+RERANK_CANDIDATES = 50
+
+
+def subject_key(subject):
+    """Normalize a subject name so "OS" and " os " share one index partition"""
+    return " ".join(str(subject or "").lower().split())
+
+
+def chunk_hash(text):
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def fts_query(query):
+    """Turn free text into an FTS5 OR-query of quoted terms"""
+    terms = sorted(set(tokenize(query)))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+class LocalEmbedder:
+    """Sentence embeddings from a local CPU model (requires sentence-transformers)"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        import numpy
+
+        self.numpy = numpy
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(self.numpy.float32)
+
+    def to_blob(self, vector):
+        return vector.tobytes()
+
+    def from_blob(self, blob):
+        return self.numpy.frombuffer(blob, dtype=self.numpy.float32)
+
+
+class MaterialIndex:
+    """On-disk, per-subject retrieval index over uploaded course materials.
+
+    Text is chunked, deduplicated by chunk hash and stored in SQLite with an
+    FTS5 inverted index ranked by BM25. With an embedder, results are
+    re-ranked by cosine similarity of local sentence embeddings.
+    """
+
+    def __init__(self, db_path, embedder=None):
+        self.db_path = db_path
+        self.embedder = embedder
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS documents (
+                subject TEXT NOT NULL, doc_hash TEXT NOT NULL, source TEXT, added REAL NOT NULL,
+                PRIMARY KEY (subject, doc_hash));
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY, subject TEXT NOT NULL, chunk_hash TEXT NOT NULL,
+                text TEXT NOT NULL, added REAL NOT NULL, UNIQUE (subject, chunk_hash));
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text, content='chunks', content_rowid='id', tokenize='porter unicode61');
+            CREATE TABLE IF NOT EXISTS embeddings (chunk_id INTEGER PRIMARY KEY, vector BLOB NOT NULL);
+        """)
+        self._db.commit()
+
+    def add_document(self, subject, text, source=None):
+        """Chunk and index a document; returns the number of new (non-duplicate) chunks"""
+        if not text:
+            return 0
+        subject = subject_key(subject)
+        doc_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        now = time.time()
+
+        with self._lock:
+            seen = self._db.execute("SELECT 1 FROM documents WHERE subject = ? AND doc_hash = ?",
+                                    (subject, doc_hash)).fetchone()
+            if seen:
+                return 0
+            self._db.execute("INSERT INTO documents (subject, doc_hash, source, added) VALUES (?, ?, ?, ?)",
+                             (subject, doc_hash, source, now))
+            added = self._insert_chunks(subject, split_into_chunks(text), now)
+            self._db.commit()
+        return added
+
+    def add_chunks(self, subject, chunks):
+        """Index pre-chunked text (bulk loads, benchmarks); returns the number of new chunks"""
+        with self._lock:
+            added = self._insert_chunks(subject_key(subject), chunks, time.time())
+            self._db.commit()
+        return added
+
+    def _insert_chunks(self, subject, chunks, now):
+        # Caller holds the lock
+        new_ids = []
+        new_texts = []
+        for text in chunks:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO chunks (subject, chunk_hash, text, added) VALUES (?, ?, ?, ?)",
+                (subject, chunk_hash(text), text, now)
+            )
+            if cursor.rowcount:
+                new_ids.append(cursor.lastrowid)
+                new_texts.append(text)
+
+        self._db.executemany("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", zip(new_ids, new_texts))
+        if self.embedder is not None and new_texts:
+            vectors = self.embedder.encode(new_texts)
+            self._db.executemany("INSERT INTO embeddings (chunk_id, vector) VALUES (?, ?)",
+                                 ((chunk_id, self.embedder.to_blob(vector)) for chunk_id, vector in zip(new_ids, vectors)))
+        return len(new_ids)
+
+    def search(self, subject, query, k=5):
+        """Top-k (text, score) passages for the query within a subject, best first"""
+        match = fts_query(query)
+        if not match:
+            return []
+        limit = RERANK_CANDIDATES if self.embedder is not None else k
+
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT c.id, c.text, bm25(chunks_fts) AS rank FROM chunks_fts "
+                "JOIN chunks c ON c.id = chunks_fts.rowid "
+                "WHERE chunks_fts MATCH ? AND c.subject = ? ORDER BY rank LIMIT ?",
+                (match, subject_key(subject), limit)
+            ).fetchall()
+
+            if self.embedder is None or not rows:
+                # FTS5's bm25() is lower-is-better; flip it so higher means more relevant
+                return [(text, -rank) for _, text, rank in rows]
+
+            placeholders = ",".join("?" * len(rows))
+            vectors = dict(self._db.execute(
+                f"SELECT chunk_id, vector FROM embeddings WHERE chunk_id IN ({placeholders})",
+                [chunk_id for chunk_id, _, _ in rows]
+            ).fetchall())
+
+        query_vector = self.embedder.encode([query])[0]
+        scored = []
+        for chunk_id, text, rank in rows:
+            blob = vectors.get(chunk_id)
+            score = float(self.embedder.from_blob(blob) @ query_vector) if blob is not None else 0.0
+            scored.append((text, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def stats(self):
+        """Number of documents and chunks, per subject"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT subject, COUNT(*) FROM chunks GROUP BY subject ORDER BY COUNT(*) DESC"
+            ).fetchall()
+            documents = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"documents": documents, "chunks": sum(count for _, count in rows), "subjects": dict(rows)}
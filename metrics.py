@@ -0,0 +1,431 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("codelala.trace")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Sampled profiling: fraction of traced requests to profile, with which profiler and where to write it
+PROFILE_RATE = float(os.environ.get("CODELALA_PROFILE_RATE", "0"))
+PROFILER = os.environ.get("CODELALA_PROFILER", "cprofile")
+PROFILE_DIR = os.environ.get("CODELALA_PROFILE_DIR", "profiles")
+
+# Finished traces kept in memory for the /traces endpoint
+TRACE_HISTORY = 200
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels.get(label, "")) for label in self.labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{format_labels(self.labels, key, ('le', format_value(bound)))} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{format_labels(self.labels, key)} {series['count']}")
+        return lines
+
+
+def flatten_stats(stats, prefix=""):
+    """Numeric (and boolean) values of a possibly nested stats dict, keyed by underscore-joined path"""
+    flat = {}
+    for key, value in stats.items():
+        name = f"{prefix}_{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten_stats(value, name))
+        elif isinstance(value, (bool, int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+class Registry:
+    """Metrics rendered in the Prometheus text exposition format.
+
+    Besides counters and histograms, stats functions (such as
+    ResponseCache.stats) can be registered; they are read at scrape time and
+    exported as gauges.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._stats = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, stats_function, help=""):
+        self._stats.append((prefix, stats_function, help))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats_function, help in self._stats:
+            try:
+                stats = flatten_stats(stats_function())
+            except Exception:
+                continue
+            for key, value in sorted(stats.items()):
+                name = f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {help or prefix} ({key})")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "codelala_request_seconds", "End-to-end time of a traced request", ("feature", "outcome"))
+STAGE_SECONDS = REGISTRY.histogram(
+    "codelala_stage_seconds", "Time spent in each stage of a request", ("feature", "stage"))
+
+_current_trace = contextvars.ContextVar("codelala_trace", default=None)
+recent_traces = deque(maxlen=TRACE_HISTORY)
+_profile_lock = threading.Lock()
+
+
+class Trace:
+    """Stage timings and attributes (pages, tokens, cache hits...) of one request"""
+
+    def __init__(self, feature):
+        self.feature = feature
+        self.id = uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.seconds = None
+        self.outcome = None
+        self.stages = []
+        self.attributes = {}
+        self._clock = time.perf_counter()
+        self._profiler = None
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - started
+            self.stages.append({"stage": name, "seconds": round(seconds, 6)})
+            STAGE_SECONDS.observe(seconds, feature=self.feature, stage=name)
+
+    def annotate(self, **attributes):
+        """Record attributes; numbers add up, so tokens from several calls are totalled"""
+        for key, value in attributes.items():
+            previous = self.attributes.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(previous, (int, float)):
+                self.attributes[key] = previous + value
+            else:
+                self.attributes[key] = value
+
+    def to_dict(self):
+        return {"id": self.id, "feature": self.feature, "started": self.started, "seconds": self.seconds,
+                "outcome": self.outcome, "stages": self.stages, "attributes": self.attributes}
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def annotate(**attributes):
+    """Add attributes to the current request's trace, if there is one"""
+    current = _current_trace.get()
+    if current is not None:
+        current.annotate(**attributes)
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current request's trace (no-op outside a trace)"""
+    current = _current_trace.get()
+    if current is None:
+        yield None
+        return
+    with current.stage(name):
+        yield current
+
+
+def begin_trace(feature, profile=True):
+    current = Trace(feature)
+    if profile:
+        current._profiler = start_profiler()
+    return current
+
+
+def finish_trace(current, outcome):
+    current.outcome = outcome
+    current.seconds = round(time.perf_counter() - current._clock, 6)
+    if current._profiler is not None:
+        stop_profiler(current._profiler, current)
+    REQUEST_SECONDS.observe(current.seconds, feature=current.feature, outcome=outcome)
+    recent_traces.append(current.to_dict())
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(current.to_dict(), default=str))
+
+
+def outcome_of(error):
+    if error is None:
+        return "ok"
+    if isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+        return "cancelled"
+    return "error"
+
+
+@contextmanager
+def trace(feature, profile=True):
+    """Trace one request: stage timings, attributes, end-to-end latency and (sampled) profiling"""
+    current = begin_trace(feature, profile)
+    token = _current_trace.set(current)
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_trace.reset(token)
+        finish_trace(current, outcome_of(error))
+
+
+def traced(feature):
+    """Decorator: run each call of a function, coroutine function or (async) generator in a trace.
+
+    For generators the trace is made current again on every step, so nested
+    stage() and annotate() calls land in it even when the steps are resumed
+    from different threads or tasks. Sync generators are never profiled:
+    cProfile only sees the thread it was started on.
+    """
+    def decorate(function):
+        if inspect.isasyncgenfunction(function):
+            @functools.wraps(function)
+            async def async_generator_wrapper(*args, **kwargs):
+                current = begin_trace(feature)
+                generator = function(*args, **kwargs)
+                error = None
+                try:
+                    while True:
+                        token = _current_trace.set(current)
+                        try:
+                            value = await generator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            _current_trace.reset(token)
+                        yield value
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    token = _current_trace.set(current)
+                    try:
+                        await generator.aclose()
+                    finally:
+                        _current_trace.reset(token)
+                        finish_trace(current, outcome_of(error))
+            return async_generator_wrapper
+
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                current = begin_trace(feature, profile=False)
+                generator = function(*args, **kwargs)
+                error = None
+                try:
+                    while True:
+                        token = _current_trace.set(current)
+                        try:
+                            value = next(generator)
+                        except StopIteration:
+                            break
+                        finally:
+                            _current_trace.reset(token)
+                        yield value
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    token = _current_trace.set(current)
+                    try:
+                        generator.close()
+                    finally:
+                        _current_trace.reset(token)
+                        finish_trace(current, outcome_of(error))
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def coroutine_wrapper(*args, **kwargs):
+                with trace(feature):
+                    return await function(*args, **kwargs)
+            return coroutine_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with trace(feature):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_profiler():
+    """Start a profiler for a sampled request (one at a time), or return None"""
+    if PROFILE_RATE <= 0 or random.random() >= PROFILE_RATE:
+        return None
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        if PROFILER == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+                profiler = Profiler(async_mode="enabled")
+                profiler.start()
+                return profiler
+            except ImportError:
+                pass
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    except Exception:
+        _profile_lock.release()
+        raise
+
+
+def stop_profiler(profiler, current):
+    """Stop the profiler and write its report to PROFILE_DIR, noting the path in the trace"""
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{current.feature}-{time.strftime('%Y%m%d-%H%M%S')}-{current.id}")
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            path += ".prof"
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path += ".html"
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        current.attributes["profile"] = path
+    finally:
+        _profile_lock.release()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path in ("", "/metrics"):
+            body = self.registry.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/traces":
+            body = json.dumps(list(recent_traces), default=str).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /traces (recent traces as JSON) on a background thread"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
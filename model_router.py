@@ -0,0 +1,301 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from resilience import CircuitBreaker, Resilience, UpstreamError
+
+# USD per million prompt and completion tokens, for the cost estimates
+DEFAULT_PRICES = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+
+# Routes tried in order for each task ("analysis", "plan", "questions", "prompts",
+# "summary"; other tasks use "default"). The light tasks go to the cheaper, faster
+# model first and fall back to the regular one.
+DEFAULT_ROUTES = {
+    "default": [{"model": "gemini-1.5-flash"}],
+    "analysis": [{"model": "gemini-1.5-flash", "temperature": 0.2, "max_tokens": 2048}],
+    "plan": [{"model": "gemini-1.5-flash", "temperature": 0.7, "max_tokens": 4096}],
+    "questions": [{"model": "gemini-1.5-flash", "temperature": 0.5, "max_tokens": 3072}],
+    "prompts": [
+        {"model": "gemini-1.5-flash-8b", "temperature": 0.9, "max_tokens": 1024, "slo": 4.0},
+        {"model": "gemini-1.5-flash", "temperature": 0.9, "max_tokens": 1024},
+    ],
+    "summary": [
+        {"model": "gemini-1.5-flash-8b", "temperature": 0.3, "max_tokens": 1024, "slo": 10.0},
+        {"model": "gemini-1.5-flash", "temperature": 0.3, "max_tokens": 1024},
+    ],
+}
+
+# Latencies kept per route, how many are needed before its SLO is judged, and
+# how long a route breaching its SLO is passed over in favour of its fallbacks
+SLO_WINDOW = 50
+MIN_SLO_SAMPLES = 20
+SLO_COOLDOWN = 30.0
+
+_END = object()
+
+
+class Backend:
+    """An OpenAI-compatible endpoint with its own clients, connection pool and circuit breaker"""
+
+    def __init__(self, name, base_url, api_key, upstream, max_connections=32):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.upstream = upstream
+        self.max_connections = max_connections
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        """Sync client, created on first use"""
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+                self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    def async_client(self):
+        """Async client with a pooled, keep-alive connection pool, created on first use"""
+        with self._lock:
+            if self._async_client is None:
+                import httpx
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+                self._async_client = AsyncOpenAI(
+                    api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections,
+                        keepalive_expiry=60
+                    ))
+                )
+        return self._async_client
+
+
+class Route:
+    """One way to serve a task: a backend, a model and its generation settings.
+
+    slo is the latency (seconds to the answer, or to the first chunk of a
+    stream) the route must keep at p95; a route that breaches it is skipped
+    for a while when it has a fallback.
+    """
+
+    def __init__(self, backend, model, max_tokens=None, temperature=None, slo=None, prices=None):
+        self.backend = backend
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.slo = slo
+        self.prices = prices if prices is not None else DEFAULT_PRICES.get(model, (0.0, 0.0))
+        self.name = f"{backend.name}/{model}"
+
+    def params(self):
+        """Keyword arguments for chat.completions.create"""
+        params = {"model": self.model}
+        if self.max_tokens is not None:
+            params["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            params["temperature"] = self.temperature
+        return params
+
+    def cost(self, prompt_tokens, completion_tokens):
+        return (prompt_tokens * self.prices[0] + completion_tokens * self.prices[1]) / 1e6
+
+
+class ModelRouter:
+    """Picks the model, max_tokens and temperature for each task and falls back along its routes.
+
+    A call goes to the first usable route of its task, under that backend's
+    retries and circuit breaker. If the route fails for good (or its backend's
+    breaker is open) the next route is tried; streams fall back only until
+    their first chunk. Routes whose p95 latency breaches their SLO are passed
+    over for SLO_COOLDOWN seconds, as long as a later route remains.
+    """
+
+    def __init__(self, routes, backends):
+        self.routes = routes  # task -> [Route]
+        self.backends = backends  # name -> Backend
+        self._latencies = defaultdict(lambda: deque(maxlen=SLO_WINDOW))
+        self._demoted_until = {}
+        self._route_stats = defaultdict(lambda: {"calls": 0, "failures": 0, "cost": 0.0})
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+        self.slo_skips = 0
+
+    def primary(self, task):
+        return self.routes_of(task)[0]
+
+    def routes_of(self, task):
+        return self.routes.get(task) or self.routes["default"]
+
+    def candidates(self, task):
+        """Routes of the task in the order to try them now"""
+        routes = self.routes_of(task)
+        now = time.monotonic()
+        usable = []
+        with self._lock:
+            for index, route in enumerate(routes):
+                if index < len(routes) - 1 and self._demoted_until.get(route.name, 0) > now:
+                    self.slo_skips += 1
+                    continue
+                usable.append(route)
+        return usable
+
+    def record_usage(self, route, prompt_tokens, completion_tokens):
+        """Count a successful call and its cost; returns the cost"""
+        cost = route.cost(prompt_tokens, completion_tokens)
+        with self._lock:
+            stats = self._route_stats[route.name]
+            stats["calls"] += 1
+            stats["cost"] += cost
+        return cost
+
+    def record_latency(self, route, seconds):
+        """Record the time to a route's answer (or first chunk); demotes the route if it breaches its SLO"""
+        with self._lock:
+            latencies = self._latencies[route.name]
+            latencies.append(seconds)
+            if route.slo is not None and len(latencies) >= MIN_SLO_SAMPLES:
+                if sorted(latencies)[int((len(latencies) - 1) * 0.95)] > route.slo:
+                    self._demoted_until[route.name] = time.monotonic() + SLO_COOLDOWN
+                    # Judged afresh when it comes back
+                    latencies.clear()
+
+    def _failed(self, route, last):
+        with self._lock:
+            self._route_stats[route.name]["failures"] += 1
+            if not last:
+                self.fallbacks += 1
+
+    def call(self, task, attempt):
+        """Run attempt(route, timeout) on the task's routes in turn and return the first result"""
+        routes = self.candidates(task)
+        for index, route in enumerate(routes):
+            try:
+                return route.backend.upstream.call(task, lambda timeout, route=route: attempt(route, timeout))
+            except UpstreamError:
+                self._failed(route, index == len(routes) - 1)
+                if index == len(routes) - 1:
+                    raise
+
+    def stream(self, task, open_stream):
+        """Iterate open_stream(route, timeout), falling back to the next route until the first chunk arrives"""
+        routes = self.candidates(task)
+        for index, route in enumerate(routes):
+            chunks = route.backend.upstream.stream(task, lambda timeout, route=route: open_stream(route, timeout))
+            try:
+                first = next(chunks, _END)
+            except UpstreamError:
+                self._failed(route, index == len(routes) - 1)
+                if index == len(routes) - 1:
+                    raise
+                continue
+            try:
+                if first is not _END:
+                    yield first
+                    yield from chunks
+            finally:
+                chunks.close()
+            return
+
+    async def async_call(self, task, attempt):
+        """Async version of call; attempt(route, timeout) returns a coroutine"""
+        routes = self.candidates(task)
+        for index, route in enumerate(routes):
+            try:
+                return await route.backend.upstream.async_call(task, lambda timeout, route=route: attempt(route, timeout))
+            except UpstreamError:
+                self._failed(route, index == len(routes) - 1)
+                if index == len(routes) - 1:
+                    raise
+
+    async def async_stream(self, task, open_stream):
+        """Async version of stream; open_stream(route, timeout) returns an async iterator"""
+        routes = self.candidates(task)
+        for index, route in enumerate(routes):
+            chunks = route.backend.upstream.async_stream(task, lambda timeout, route=route: open_stream(route, timeout))
+            try:
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            except UpstreamError:
+                await chunks.aclose()
+                self._failed(route, index == len(routes) - 1)
+                if index == len(routes) - 1:
+                    raise
+                continue
+            try:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+            return
+
+    def stats(self):
+        """Fallback and SLO counts, plus calls, failures, cost and latency per route"""
+        with self._lock:
+            now = time.monotonic()
+            routes = {}
+            for task, task_routes in self.routes.items():
+                for route in task_routes:
+                    latencies = sorted(self._latencies[route.name])
+                    routes[route.name] = dict(
+                        self._route_stats[route.name],
+                        demoted=self._demoted_until.get(route.name, 0) > now,
+                        p50=latencies[len(latencies) // 2] if latencies else None,
+                        p95=latencies[int(len(latencies) * 0.95)] if latencies else None,
+                    )
+            return {"fallbacks": self.fallbacks, "slo_skips": self.slo_skips, "routes": routes}
+
+
+def load_config(text=None):
+    """Router configuration from CODELALA_ROUTES: inline JSON or the path of a JSON file"""
+    if text is None:
+        text = os.environ.get("CODELALA_ROUTES", "")
+    text = text.strip()
+    if not text:
+        return {}
+    if not text.startswith("{"):
+        with open(text, encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(text)
+
+
+def build_router(default_backend, config=None, policies=None, breaker_settings=None):
+    """A ModelRouter from a configuration like
+
+        {"backends": {"local": {"base_url": "http://127.0.0.1:8765/v1", "api_key": "x"}},
+         "routes": {"prompts": [{"backend": "local", "model": "small", "max_tokens": 800, "slo": 2}]},
+         "prices": {"small": [0.01, 0.02]}}
+
+    merged over DEFAULT_ROUTES. Routes without a backend use default_backend;
+    "api_key_env" names an environment variable holding a backend's key.
+    Every other backend gets its own Resilience, with the same policies.
+    """
+    if config is None:
+        config = load_config()
+    backends = {default_backend.name: default_backend}
+    for name, settings in config.get("backends", {}).items():
+        api_key = settings.get("api_key") or os.environ.get(settings.get("api_key_env", ""), "") or "none"
+        upstream = Resilience(policies=policies, breaker=CircuitBreaker(**(breaker_settings or {})))
+        backends[name] = Backend(name, settings["base_url"], api_key, upstream,
+                                 settings.get("max_connections", default_backend.max_connections))
+
+    prices = dict(DEFAULT_PRICES, **{model: tuple(value) for model, value in config.get("prices", {}).items()})
+    routes = {}
+    for task, specs in dict(DEFAULT_ROUTES, **config.get("routes", {})).items():
+        routes[task] = []
+        for spec in specs:
+            spec = dict(spec)
+            backend = spec.pop("backend", default_backend.name)
+            if backend not in backends:
+                raise ValueError(f"route for {task} uses unknown backend {backend!r}")
+            routes[task].append(Route(backends[backend], prices=prices.get(spec["model"], (0.0, 0.0)), **spec))
+    return ModelRouter(routes, backends)
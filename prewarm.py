@@ -0,0 +1,150 @@
+"""Pre-generate smart prompts and practice questions for popular topics into the response cache.
+
+    python prewarm.py --limit 300                        # most requested topics of the last 30 days
+    python prewarm.py --topics topics.txt --every 6h     # a supplied list, refreshed every 6 hours
+
+Topics are mined from the topic request log (logs/topic_requests.csv, its
+rotated files and their Parquet store, via analytics.py) and/or read from a file with one "subject,topic" or bare
+"topic" per line; a bare topic is paired with every catalog subject. An
+answer already cached and younger than --refresh-after is left alone, an
+older one is regenerated before it expires, so peak-hour requests for these
+topics are served without calling the model. The answers go to the
+persistent response cache (CODELALA_CACHE_DB).
+"""
+import argparse
+import asyncio
+import csv
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import analytics
+import codelala_core
+from interaction_store import TABLES
+
+FEATURES = ("smart_prompts", "practice_questions")
+# Resilience policy (and metrics label) each feature's model calls run under
+FEATURE_TASKS = {"smart_prompts": "prompts", "practice_questions": "questions"}
+TOPIC_LOG = TABLES["topics"]["path"]
+
+
+def parse_duration(text):
+    """Seconds in "90", "30m", "6h" or "2d" """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def popular_topics(log_path=TOPIC_LOG, limit=None, days=30, subjects=None, min_count=1):
+    """[(subject, topic)] from the topic request log and its compacted store, most requested first"""
+    # Spellings of one topic share a cached answer, so analytics counts them together
+    # and returns each topic once, as it is most often typed
+    return analytics.popular_topics(limit, days, subjects, min_count, path=log_path)
+
+
+def read_topic_list(path, subjects=codelala_core.SUBJECTS):
+    """[(subject, topic)] from a file of "subject,topic" or bare "topic" lines"""
+    pairs = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for fields in csv.reader(f):
+            fields = [field.strip() for field in fields if field.strip()]
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields) >= 2:
+                pairs.append((fields[0], ",".join(fields[1:])))
+            else:
+                pairs.extend((subject, fields[0]) for subject in subjects)
+    return pairs
+
+
+async def warm(subject, topic, feature, refresh_after, dry_run=False):
+    """Make sure the answer for one subject/topic/feature is cached and fresh; returns what happened"""
+    if feature == "practice_questions":
+        prompt = await codelala_core.async_build_practice_questions_prompt(subject, topic)
+    else:
+        prompt = codelala_core.build_smart_prompts_prompt(subject, topic)
+    if prompt is None:
+        return "off_topic"
+
+    # Same key as a user request for this subject and topic
+    key = codelala_core.response_cache_key(prompt, FEATURE_TASKS[feature])
+    age = codelala_core.response_cache.age(key)
+    if age is not None and age < refresh_after:
+        return "fresh"
+    if dry_run:
+        return "missing" if age is None else "stale"
+    try:
+        content = await codelala_core.async_get_gemini_response(prompt, use_cache=False, task=FEATURE_TASKS[feature])
+    except Exception:
+        return "failed"
+    codelala_core.response_cache.set(key, content)
+    return "warmed" if age is None else "refreshed"
+
+
+async def prewarm(pairs, features=FEATURES, refresh_after=None, concurrency=8, dry_run=False):
+    """Warm every (subject, topic) for every feature with bounded concurrency; returns counts by outcome"""
+    if refresh_after is None:
+        refresh_after = codelala_core.response_cache.ttl / 2
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def job(subject, topic, feature):
+        async with semaphore:
+            return await warm(subject, topic, feature, refresh_after, dry_run)
+
+    # Spellings of one topic share a cached answer, so only the first listed is warmed
+    unique = {}
+    for subject, topic in pairs:
+        unique.setdefault((subject, codelala_core.canonical_topic(subject, topic)), (subject, topic))
+    jobs = [job(subject, topic, feature) for subject, topic in unique.values() for feature in features]
+    return Counter(await asyncio.gather(*jobs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topics", default=None, help='file of "subject,topic" or "topic" lines')
+    parser.add_argument("--log", default=TOPIC_LOG, help="topic request log to mine ('' to skip)")
+    parser.add_argument("--limit", type=int, default=300, help="most requested subject/topic pairs to take from the log")
+    parser.add_argument("--days", type=float, default=30, help="only count requests from the last N days (0 = all)")
+    parser.add_argument("--min-count", type=int, default=2, help="ignore topics requested fewer times")
+    parser.add_argument("--catalog-only", action="store_true", help="only mine topics of the catalog subjects")
+    parser.add_argument("--features", default=",".join(FEATURES), help=f"comma-separated, from {', '.join(FEATURES)}")
+    parser.add_argument("--refresh-after", default=None,
+                        help="regenerate answers older than this, e.g. 3d (default: half the cache TTL)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--every", default=None, help="repeat on this schedule, e.g. 6h (default: run once)")
+    parser.add_argument("--dry-run", action="store_true", help="only report what is missing or stale")
+    args = parser.parse_args()
+
+    features = tuple(feature.strip() for feature in args.features.split(",") if feature.strip())
+    if not features or any(feature not in FEATURES for feature in features):
+        parser.error(f"--features must be from {', '.join(FEATURES)}")
+    if codelala_core.response_cache.db_path is None and not args.dry_run:
+        parser.error("CODELALA_CACHE_DB is empty, so pre-warmed answers would be lost when this process exits")
+    refresh_after = parse_duration(args.refresh_after) if args.refresh_after else None
+    every = parse_duration(args.every) if args.every else None
+
+    async def run():
+        # One event loop for every round: the async client and its connection pool are bound to it
+        while True:
+            started = time.perf_counter()
+            # Re-mined every round, so the schedule follows what students are asking about now
+            pairs = read_topic_list(args.topics) if args.topics else []
+            if args.log:
+                pairs += popular_topics(args.log, args.limit, args.days,
+                                        set(codelala_core.SUBJECTS) if args.catalog_only else None, args.min_count)
+            counts = await prewarm(pairs, features, refresh_after, args.concurrency, args.dry_run)
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} {len(set(pairs))} topics x {len(features)} features in "
+                  f"{time.perf_counter() - started:.1f}s: {dict(counts)}", file=sys.stderr, flush=True)
+            if every is None:
+                return counts
+            await asyncio.sleep(max(every - (time.perf_counter() - started), 0))
+
+    counts = asyncio.run(run())
+    if counts["failed"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+
+# Statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = frozenset((408, 409, 429))
+
+# Successful latencies kept per task, and how many are needed before p95 drives hedging
+LATENCY_WINDOW = 200
+MIN_HEDGE_SAMPLES = 20
+
+_END = object()
+
+
+class UpstreamError(Exception):
+    """The model endpoint could not produce a response (final error, retries exhausted or deadline passed)"""
+
+
+class CircuitOpenError(UpstreamError):
+    """Upstream has been failing; calls fail fast until the breaker lets a probe through"""
+
+
+class TaskPolicy:
+    """Timeouts, retries and hedging for one kind of request.
+
+    timeout is per attempt (for streams, the longest wait for the next chunk);
+    deadline bounds the whole call including retries and backoff. With hedge,
+    a duplicate request is sent if the first has not answered after the
+    task's observed p95 latency (hedge_after until enough samples exist).
+    """
+
+    def __init__(self, timeout=60.0, deadline=120.0, max_attempts=3, backoff_base=0.5, backoff_max=8.0,
+                 hedge=False, hedge_after=5.0):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+
+
+DEFAULT_POLICIES = {
+    "default": TaskPolicy(),
+    "analysis": TaskPolicy(timeout=60, deadline=150),
+    "summary": TaskPolicy(timeout=45, deadline=90, max_attempts=2),
+    "plan": TaskPolicy(timeout=60, deadline=150),
+    "questions": TaskPolicy(timeout=45, deadline=120),
+    # Short, cheap and the most duplicated by classes: worth hedging
+    "prompts": TaskPolicy(timeout=30, deadline=60, hedge=True, hedge_after=4.0),
+}
+
+
+def load_policies(overrides=None):
+    """DEFAULT_POLICIES with per-task overrides, e.g. CODELALA_RESILIENCE='{"plan": {"timeout": 90}}'"""
+    if overrides is None:
+        overrides = json.loads(os.environ.get("CODELALA_RESILIENCE") or "{}")
+    policies = {name: TaskPolicy(**vars(policy)) for name, policy in DEFAULT_POLICIES.items()}
+    for name, values in overrides.items():
+        base = vars(policies.get(name, policies["default"]))
+        policies[name] = TaskPolicy(**dict(base, **values))
+    return policies
+
+
+def is_retryable(error):
+    """Whether the error means upstream is unhealthy (as opposed to a bad request)"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    # openai is only imported once a client exists, and no openai error can happen before that
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(error, openai.APIConnectionError):
+        return True
+    status = getattr(error, "status_code", None)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def describe(error):
+    return str(error) or type(error).__name__
+
+
+def retry_after_seconds(error):
+    """Delay requested by the server in Retry-After (seconds or HTTP date), if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive upstream failures and rejects calls for reset_timeout seconds.
+
+    After the cool-down a single probe call is let through (half-open): its
+    success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call must not go upstream"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError("upstream is unavailable (circuit open)")
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open":
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError("upstream is unavailable (circuit half-open, probe in flight)")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.opens += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give up a probe slot without a verdict (the call was cancelled)"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures, "opens": self.opens, "rejected": self.rejected}
+
+
+class Resilience:
+    """Per-task deadlines, retries with jittered exponential backoff, hedging and a circuit breaker around upstream calls.
+
+    Calls are given as attempt(timeout) functions (or coroutine functions)
+    that make one upstream request; streams as open_stream(timeout) returning
+    an iterator of chunks. Streams are retried only until their first chunk,
+    so a caller never sees a chunk twice. Every failure that reaches the
+    caller is an UpstreamError, with the original exception as its cause.
+    """
+
+    def __init__(self, policies=None, breaker=None, hedge_workers=16):
+        self.policies = policies if policies is not None else load_policies()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.hedge_workers = hedge_workers
+        self._hedge_pool = None
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def policy(self, task):
+        return self.policies.get(task) or self.policies["default"]
+
+    def _attempt_timeout(self, policy, deadline, error=None):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.failures += 1
+            raise UpstreamError("upstream deadline exceeded") from error
+        return min(policy.timeout, remaining)
+
+    def _record_latency(self, task, seconds):
+        with self._lock:
+            self._latencies[task].append(seconds)
+
+    def _record_error(self, error):
+        if isinstance(error, CircuitOpenError):
+            return
+        if is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            # Upstream answered; the request itself was bad
+            self.breaker.record_success()
+
+    def _retry_delay(self, policy, number, deadline, error):
+        """Seconds to wait before the next attempt; raises UpstreamError when the error is final"""
+        if isinstance(error, CircuitOpenError):
+            self.failures += 1
+            raise error
+        if not is_retryable(error):
+            self.failures += 1
+            raise UpstreamError(f"upstream request failed: {describe(error)}") from error
+
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(policy.backoff_max, policy.backoff_base * 2 ** number))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        if number + 1 >= policy.max_attempts or time.monotonic() + delay >= deadline:
+            self.failures += 1
+            raise UpstreamError(f"upstream request failed after {number + 1} attempt(s): {describe(error)}") from error
+        self.retries += 1
+        return delay
+
+    def _hedge_delay(self, task, policy, timeout):
+        """When to send the duplicate request: the task's p95 latency, or None for no hedging"""
+        if not policy.hedge:
+            return None
+        with self._lock:
+            latencies = sorted(self._latencies[task])
+        delay = latencies[int(len(latencies) * 0.95)] if len(latencies) >= MIN_HEDGE_SAMPLES else policy.hedge_after
+        return delay if delay < timeout else None
+
+    def _run_attempt(self, task, attempt, timeout):
+        self.breaker.before_call()
+        self.attempts += 1
+        started = time.monotonic()
+        try:
+            result = attempt(timeout)
+        except Exception as e:
+            self._record_error(e)
+            raise
+        self.breaker.record_success()
+        self._record_latency(task, time.monotonic() - started)
+        return result
+
+    def _get_hedge_pool(self):
+        if self._hedge_pool is None:
+            with self._lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix="hedge")
+        return self._hedge_pool
+
+    def _hedged(self, task, policy, attempt, timeout):
+        delay = self._hedge_delay(task, policy, timeout)
+        if delay is None:
+            return self._run_attempt(task, attempt, timeout)
+
+        pool = self._get_hedge_pool()
+        first = pool.submit(self._run_attempt, task, attempt, timeout)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        # A blocking request can't be cancelled; the slower one finishes in the background
+        self.hedged += 1
+        second = pool.submit(self._run_attempt, task, attempt, timeout - delay)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, task, attempt):
+        """Run attempt(timeout) under the task's policy and return its result"""
+        policy = self.policy(task)
+        deadline = time.monotonic() + policy.deadline
+        error = None
+        for number in range(policy.max_attempts):
+            timeout = self._attempt_timeout(policy, deadline, error)
+            try:
+                return self._hedged(task, policy, attempt, timeout)
+            except Exception as e:
+                error = e
+                delay = self._retry_delay(policy, number, deadline, e)
+            time.sleep(delay)
+
+    def stream(self, task, open_stream):
+        """Iterate open_stream(timeout), retrying until the first chunk arrives"""
+        policy = self.policy(task)
+        deadline = time.monotonic() + policy.deadline
+        error = None
+        for number in range(policy.max_attempts):
+            timeout = self._attempt_timeout(policy, deadline, error)
+            chunks = None
+            started = time.monotonic()
+            try:
+                self.breaker.before_call()
+                self.attempts += 1
+                chunks = iter(open_stream(timeout))
+                first = next(chunks, _END)
+            except Exception as e:
+                if chunks is not None and hasattr(chunks, "close"):
+                    chunks.close()
+                self._record_error(e)
+                error = e
+                time.sleep(self._retry_delay(policy, number, deadline, e))
+                continue
+            self.breaker.record_success()
+            self._record_latency(task, time.monotonic() - started)
+            break
+
+        try:
+            if first is _END:
+                return
+            yield first
+            for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            self._record_error(e)
+            self.failures += 1
+            raise UpstreamError(f"upstream stream failed: {describe(e)}") from e
+        finally:
+            if hasattr(chunks, "close"):
+                chunks.close()
+
+    async def _async_run_attempt(self, task, attempt, timeout):
+        self.breaker.before_call()
+        self.attempts += 1
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(attempt(timeout), timeout)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self._record_error(e)
+            raise
+        self.breaker.record_success()
+        self._record_latency(task, time.monotonic() - started)
+        return result
+
+    async def _async_hedged(self, task, policy, attempt, timeout):
+        delay = self._hedge_delay(task, policy, timeout)
+        if delay is None:
+            return await self._async_run_attempt(task, attempt, timeout)
+
+        first = asyncio.ensure_future(self._async_run_attempt(task, attempt, timeout))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+
+            self.hedged += 1
+            second = asyncio.ensure_future(self._async_run_attempt(task, attempt, timeout - delay))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if future is second:
+                            self.hedge_wins += 1
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # The loser (or everything, if the caller was cancelled) is cancelled
+            for future in pending:
+                future.cancel()
+
+    async def async_call(self, task, attempt):
+        """Async version of call; attempt(timeout) returns a coroutine"""
+        policy = self.policy(task)
+        deadline = time.monotonic() + policy.deadline
+        error = None
+        for number in range(policy.max_attempts):
+            timeout = self._attempt_timeout(policy, deadline, error)
+            try:
+                return await self._async_hedged(task, policy, attempt, timeout)
+            except Exception as e:
+                error = e
+                delay = self._retry_delay(policy, number, deadline, e)
+            await asyncio.sleep(delay)
+
+    async def async_stream(self, task, open_stream):
+        """Async version of stream; open_stream(timeout) returns an async iterator"""
+        policy = self.policy(task)
+        deadline = time.monotonic() + policy.deadline
+        error = None
+        for number in range(policy.max_attempts):
+            timeout = self._attempt_timeout(policy, deadline, error)
+            chunks = None
+            started = time.monotonic()
+            try:
+                self.breaker.before_call()
+                self.attempts += 1
+                chunks = open_stream(timeout).__aiter__()
+                first = await asyncio.wait_for(chunks.__anext__(), timeout)
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                return
+            except asyncio.CancelledError:
+                self.breaker.release()
+                if chunks is not None and hasattr(chunks, "aclose"):
+                    await chunks.aclose()
+                raise
+            except Exception as e:
+                if chunks is not None and hasattr(chunks, "aclose"):
+                    await chunks.aclose()
+                self._record_error(e)
+                error = e
+                await asyncio.sleep(self._retry_delay(policy, number, deadline, e))
+                continue
+            self.breaker.record_success()
+            self._record_latency(task, time.monotonic() - started)
+            break
+
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            self._record_error(e)
+            self.failures += 1
+            raise UpstreamError(f"upstream stream failed: {describe(e)}") from e
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+
+    def stats(self):
+        """Attempt, retry, hedge and failure counts, breaker state and per-task latency"""
+        with self._lock:
+            latencies = {task: sorted(values) for task, values in self._latencies.items() if values}
+        return {
+            "attempts": self.attempts, "retries": self.retries, "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins, "failures": self.failures, "breaker": self.breaker.stats(),
+            "latency": {task: {"p50": values[len(values) // 2], "p95": values[int(len(values) * 0.95)],
+                               "samples": len(values)} for task, values in latencies.items()},
+        }
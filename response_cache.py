@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Disk hits record their last_access in memory and write them out in one batch
+ACCESS_FLUSH_SIZE = 64
+ACCESS_FLUSH_INTERVAL = 30.0
+# Recount the table every so many inserts so rows stored by other workers are seen too
+RECOUNT_EVERY = 256
+
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic prompt differences map to the same key"""
+    return re.sub(r'\s+', ' ', str(text or '')).strip()
+
+
+def value_size(value):
+    """Size of a cached value in bytes, as max_bytes counts it"""
+    return len(value.encode('utf-8'))
+
+
+def make_cache_key(system_message, model_name, prompt):
+    """Build a content-addressed key from the system message, model name and prompt"""
+    payload = json.dumps(
+        [normalize_text(system_message), model_name, normalize_text(prompt)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (in-memory LRU + optional SQLite) cache for model responses.
+
+    The SQLite file is opened in WAL mode, so several worker processes can
+    share it: readers don't block the writer, and a worker sees what the
+    others stored as soon as its own memory tier misses. max_bytes bounds the
+    memory tier by the UTF-8 size of the stored values.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024, ttl=24 * 3600,
+                 db_path=None, max_disk_entries=50000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+
+        self._memory = OrderedDict()  # key -> (created, value, size)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_entries = 0  # Estimate; replaced rows count again until the next recount
+        self._inserts = 0
+        self._pending_access = {}  # key -> last_access not yet written
+        self._access_flushed = time.monotonic()
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        # Wait out another process's write instead of failing with "database is locked"
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._db.commit()
+        self._disk_entries = self._count_disk_entries()
+
+    def _count_disk_entries(self):
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _flush_access(self):
+        # Caller holds the lock and commits
+        if self._pending_access:
+            self._db.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._access_flushed = time.monotonic()
+
+    def _evict_disk(self):
+        # Caller holds the lock and commits; pending accesses are written first so LRU order is right
+        self._flush_access()
+        count = self._count_disk_entries()
+        if count > self.max_disk_entries:
+            # Drop the least recently used rows first
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_disk_entries,)
+            )
+            self.evictions += count - self.max_disk_entries
+            count = self.max_disk_entries
+        self._disk_entries = count
+        self._inserts = 0
+
+    def _expired(self, created, now):
+        return self.ttl is not None and self.ttl > 0 and now - created > self.ttl
+
+    def _memory_put(self, key, created, value):
+        # Caller holds the lock
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[2]
+        size = value_size(value)
+        self._memory[key] = (created, value, size)
+        self._memory_bytes += size
+
+        while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.evictions += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value, size = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+                self._memory_bytes -= size
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created, now):
+                        self._pending_access[key] = now
+                        if (len(self._pending_access) >= ACCESS_FLUSH_SIZE
+                                or time.monotonic() - self._access_flushed >= ACCESS_FLUSH_INTERVAL):
+                            self._flush_access()
+                            self._db.commit()
+                        self._memory_put(key, created, value)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._pending_access.pop(key, None)
+                    self._disk_entries -= 1
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def age(self, key):
+        """Seconds since key was stored, or None if it isn't cached (or has expired); doesn't count as a lookup"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            created = entry[0] if entry is not None else None
+            if created is None and self._db is not None:
+                row = self._db.execute("SELECT created FROM responses WHERE key = ?", (key,)).fetchone()
+                created = row[0] if row is not None else None
+        if created is None or self._expired(created, now):
+            return None
+        return now - created
+
+    def set(self, key, value):
+        """Store value under key in both tiers"""
+        if not value:
+            return
+        now = time.time()
+        with self._lock:
+            self._memory_put(key, now, value)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._pending_access.pop(key, None)
+                self._disk_entries += 1
+                self._inserts += 1
+                if self._disk_entries > self.max_disk_entries or self._inserts >= RECOUNT_EVERY:
+                    self._evict_disk()
+                self._db.commit()
+
+    def purge_expired(self):
+        """Remove expired entries from both tiers"""
+        if not self.ttl:
+            return
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (created, _, _) in self._memory.items() if self._expired(created, now)]:
+                _, _, size = self._memory.pop(key)
+                self._memory_bytes -= size
+            if self._db is not None:
+                self._flush_access()
+                self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                self._db.commit()
+                self._disk_entries = self._count_disk_entries()
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._pending_access.clear()
+                self._disk_entries = self._inserts = 0
+            self.hits = self.memory_hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                # The running count, recounted on eviction and purge: no table scan per metrics scrape
+                "disk_entries": self._disk_entries,
+            }
@@ -0,0 +1,343 @@
+"""Lay out a day-by-day study plan locally from a syllabus analysis or the built-in topic catalog.
+
+    python scheduler.py "Operating Systems (OS)" --days 3 --hours 4
+    python scheduler.py "Compiler Design" --days 5 --hours 3 --analysis analysis.json --json
+
+Topics get study sessions in proportion to their priority (high-priority
+topics first and with HIGH_PRIORITY_WEIGHT times the time), high-priority
+topics are revised REVIEW_OFFSETS days after they are studied, the last day
+is kept for review and a practice paper, and sessions are separated by
+5-minute breaks. The same inputs always give the same plan; the model is
+only asked for per-topic tips and the motivational note.
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict, deque
+
+SESSION_MINUTES = 50
+BREAK_MINUTES = 5
+REVIEW_MINUTES = 15
+# A shorter session than this isn't worth starting at the end of a day
+MIN_SESSION_MINUTES = 20
+HIGH_PRIORITY_WEIGHT = 3
+# More sessions than this on one topic go to mixed practice instead
+MAX_SESSIONS_PER_TOPIC = 6
+# Days after a high-priority topic is finished that it comes back for a short review
+REVIEW_OFFSETS = (1, 3)
+TOPICS_PER_REVIEW_SESSION = 3
+
+BREAK_IDEAS = (
+    "stand up, stretch and drink some water",
+    "look away from the screen and recall the last session's key points",
+    "take a short walk",
+    "jot down one question you still have",
+    "breathe slowly for a minute and relax your shoulders",
+)
+
+# Topics of the predefined subjects, in course order, used when no syllabus was uploaded
+TOPIC_CATALOG = {
+    "Data Structures & Algorithms (DSA)": {
+        "all_topics": ["Big O notation", "Arrays and strings", "Linked lists", "Stacks and queues", "Recursion",
+                       "Sorting algorithms", "Binary search", "Binary trees", "Binary search trees", "Heaps",
+                       "Hash tables", "Graph traversal", "Shortest paths", "Greedy algorithms",
+                       "Dynamic programming"],
+        "high_priority_topics": ["Big O notation", "Sorting algorithms", "Binary search trees", "Graph traversal",
+                                 "Dynamic programming"],
+    },
+    "Operating Systems (OS)": {
+        "all_topics": ["Processes and threads", "CPU scheduling", "Process synchronization", "Semaphores and mutexes",
+                       "Deadlocks", "Memory management", "Paging and segmentation", "Virtual memory",
+                       "Page replacement", "File systems", "Disk scheduling", "I/O systems"],
+        "high_priority_topics": ["CPU scheduling", "Process synchronization", "Deadlocks", "Paging and segmentation",
+                                 "Page replacement"],
+    },
+    "Database Management Systems (DBMS)": {
+        "all_topics": ["ER diagrams", "Relational model", "Relational algebra", "SQL queries", "SQL joins",
+                       "Functional dependencies", "Normalization", "Transactions and ACID properties",
+                       "Concurrency control", "Recovery", "Indexing and B+ trees", "Query processing"],
+        "high_priority_topics": ["SQL queries", "Normalization", "Transactions and ACID properties",
+                                 "Concurrency control", "Indexing and B+ trees"],
+    },
+    "Computer Networks (CN)": {
+        "all_topics": ["OSI and TCP/IP models", "Physical layer basics", "Data link layer and framing",
+                       "Error detection and correction", "MAC protocols", "IP addressing and subnetting",
+                       "Routing algorithms", "Transport layer: TCP and UDP", "TCP congestion control",
+                       "DNS", "HTTP and the application layer", "Network security basics"],
+        "high_priority_topics": ["OSI and TCP/IP models", "IP addressing and subnetting", "Routing algorithms",
+                                 "Transport layer: TCP and UDP", "TCP congestion control"],
+    },
+    "Machine Learning (ML)": {
+        "all_topics": ["Types of learning", "Linear regression", "Gradient descent", "Logistic regression",
+                       "Bias-variance and overfitting", "Regularization", "Decision trees", "Support vector machines",
+                       "K-means clustering", "Neural networks", "Model evaluation metrics",
+                       "Dimensionality reduction"],
+        "high_priority_topics": ["Linear regression", "Gradient descent", "Bias-variance and overfitting",
+                                 "Neural networks", "Model evaluation metrics"],
+    },
+    "Web Development": {
+        "all_topics": ["HTML semantics", "CSS box model", "CSS flexbox and grid", "JavaScript fundamentals",
+                       "DOM manipulation", "Asynchronous JavaScript", "HTTP and REST APIs", "React components",
+                       "React hooks and state", "Authentication", "Web performance", "Web security"],
+        "high_priority_topics": ["JavaScript fundamentals", "Asynchronous JavaScript", "HTTP and REST APIs",
+                                 "React hooks and state"],
+    },
+    "Software Engineering": {
+        "all_topics": ["SDLC models", "Agile and Scrum", "Requirements engineering", "UML diagrams",
+                       "Software design principles", "Design patterns", "Software testing", "Unit testing",
+                       "Software metrics", "Project estimation", "Maintenance and refactoring",
+                       "Version control"],
+        "high_priority_topics": ["SDLC models", "Agile and Scrum", "UML diagrams", "Software testing"],
+    },
+    "Artificial Intelligence": {
+        "all_topics": ["Intelligent agents", "Uninformed search", "Heuristic search and A*", "Adversarial search",
+                       "Constraint satisfaction", "Propositional logic", "First-order logic",
+                       "Knowledge representation", "Probabilistic reasoning", "Bayesian networks",
+                       "Planning", "Learning basics"],
+        "high_priority_topics": ["Uninformed search", "Heuristic search and A*", "Adversarial search",
+                                 "First-order logic", "Bayesian networks"],
+    },
+    "Theory of Computation": {
+        "all_topics": ["Finite automata (DFA and NFA)", "Regular expressions", "Regular languages and closure",
+                       "Pumping lemma", "Context free grammars", "Pushdown automata", "Turing machines",
+                       "Decidability", "Reducibility", "Complexity classes P and NP"],
+        "high_priority_topics": ["Finite automata (DFA and NFA)", "Regular expressions", "Context free grammars",
+                                 "Turing machines", "Decidability"],
+    },
+    "Computer Architecture": {
+        "all_topics": ["Number representation", "Instruction set architecture", "Addressing modes",
+                       "ALU and datapath", "Control unit", "Pipelining", "Pipeline hazards", "Memory hierarchy",
+                       "Cache memory", "Virtual memory", "I/O and interrupts", "RISC vs CISC"],
+        "high_priority_topics": ["Instruction set architecture", "Pipelining", "Pipeline hazards", "Cache memory",
+                                 "Memory hierarchy"],
+    },
+}
+
+
+def topic_names(values):
+    """Topic names from a model's list (strings, or objects with a topic/name), without duplicates"""
+    names = {}
+    for value in values if isinstance(values, list) else []:
+        if isinstance(value, dict):
+            value = value.get("topic") or value.get("name")
+        if isinstance(value, str) and value.strip():
+            names.setdefault(value.strip().casefold(), value.strip())
+    return list(names.values())
+
+
+def plan_topics(subject, analysis=None):
+    """(all topics, high-priority topics, importance notes) from a parsed syllabus analysis or the catalog; None if neither has any"""
+    source = analysis if isinstance(analysis, dict) else TOPIC_CATALOG.get(subject)
+    if not source:
+        return None
+    high = topic_names(source.get("high_priority_topics"))
+    topics = topic_names(high + topic_names(source.get("all_topics")))
+    if not topics:
+        return None
+    importance = source.get("topic_importance")
+    return topics, high, importance if isinstance(importance, dict) else {}
+
+
+def allocate(topics, high, sessions):
+    """({topic: study sessions}, topics left to skim) for sessions shared by priority weight.
+
+    High-priority topics come first; if there are fewer sessions than topics,
+    the last normal-priority ones are left to skim.
+    """
+    high = set(high)
+    ordered = [topic for topic in topics if topic in high] + [topic for topic in topics if topic not in high]
+    included, skim = ordered[:sessions], ordered[sessions:]
+    weights = {topic: HIGH_PRIORITY_WEIGHT if topic in high else 1 for topic in included}
+    extra = sessions - len(included)
+    shares = {topic: extra * weight / sum(weights.values()) for topic, weight in weights.items()} if extra else {}
+    counts = {topic: 1 + int(shares.get(topic, 0)) for topic in included}
+    # Largest remainder, ties broken by order
+    by_remainder = sorted(included, key=lambda topic: -(shares.get(topic, 0) % 1))
+    for topic in by_remainder[:sessions - sum(counts.values())]:
+        counts[topic] += 1
+    return {topic: min(count, MAX_SESSIONS_PER_TOPIC) for topic, count in counts.items()}, skim
+
+
+class DayBuilder:
+    """Blocks of one day, each {"start", "end", "kind", "topics", ...} in minutes from the start of the day"""
+
+    def __init__(self, day, minutes):
+        self.day = day
+        self.minutes = minutes
+        self.clock = 0
+        self.blocks = []
+
+    def left(self):
+        return self.minutes - self.clock
+
+    def add(self, kind, minutes, topics=(), **details):
+        self.blocks.append(dict(start=self.clock, end=self.clock + minutes, kind=kind, topics=list(topics), **details))
+        self.clock += minutes
+
+    def add_break(self):
+        """A break, unless the day is over anyway"""
+        if self.left() >= BREAK_MINUTES + MIN_SESSION_MINUTES:
+            self.add("break", BREAK_MINUTES)
+
+    def add_session(self, kind, topics=(), **details):
+        """A session of up to SESSION_MINUTES followed by a break; False if none fits any more"""
+        if self.left() < MIN_SESSION_MINUTES:
+            return False
+        minutes = min(SESSION_MINUTES, self.left())
+        if self.left() - minutes < BREAK_MINUTES + MIN_SESSION_MINUTES:
+            # Too little would be left for another session, so this one runs to the end of the day
+            minutes = self.left()
+        self.add(kind, minutes, topics, **details)
+        self.add_break()
+        return True
+
+
+def lay_out(counts, high, days_left, minutes_per_day):
+    """(days of blocks, study sessions that didn't fit) for the sessions in counts"""
+    final_review = days_left >= 2
+    queue = deque((topic, part, count) for topic, count in counts.items() for part in range(1, count + 1))
+    reviews_due = defaultdict(list)
+    studied = []
+    days = []
+    for day in range(1, days_left + 1):
+        builder = DayBuilder(day, minutes_per_day)
+        if final_review and day == days_left:
+            # The last day: revise everything studied, high priority first, then a practice paper
+            ordered = [topic for topic in high if topic in studied] + [topic for topic in studied if topic not in high]
+            for start in range(0, len(ordered), TOPICS_PER_REVIEW_SESSION):
+                if not builder.add_session("review", ordered[start:start + TOPICS_PER_REVIEW_SESSION]):
+                    break
+            while builder.add_session("practice", studied, paper=True):
+                pass
+        else:
+            due = reviews_due.pop(day, [])
+            if due:
+                # At most a third of the day, so short days still move on to new topics
+                builder.add("review", min(REVIEW_MINUTES * len(due), minutes_per_day // 3), due)
+                builder.add_break()
+            while queue and builder.left() >= MIN_SESSION_MINUTES:
+                topic, part, parts = queue.popleft()
+                builder.add_session("study", [topic], part=part, parts=parts)
+                if part == parts:
+                    studied.append(topic)
+                    if topic in high:
+                        for offset in REVIEW_OFFSETS:
+                            # Reviews falling on the final review day are covered by it
+                            if day + offset < days_left or (not final_review and day + offset <= days_left):
+                                reviews_due[day + offset].append(topic)
+            # Time left once every topic is covered goes to mixed practice
+            while not queue and builder.add_session("practice", studied[-TOPICS_PER_REVIEW_SESSION:]):
+                pass
+        if builder.blocks and builder.blocks[-1]["kind"] == "break":
+            builder.blocks.pop()
+        days.append({"day": day, "blocks": builder.blocks})
+    return days, list(queue)
+
+
+def schedule(subject, topics, high, days_left, hours_per_day):
+    """A structured, deterministic study plan (see the module docstring)"""
+    days_left = max(int(days_left), 1)
+    minutes_per_day = max(int(float(hours_per_day) * 60), MIN_SESSION_MINUTES)
+    learning_days = days_left - 1 if days_left >= 2 else 1
+    high = [topic for topic in high if topic in topics]
+
+    # Start from every session the learning days could hold and give up the ones
+    # reviews and short day ends crowd out, until the plan fits
+    day = DayBuilder(0, minutes_per_day)
+    sessions = 0
+    while day.add_session("study"):
+        sessions += learning_days
+    while True:
+        counts, skim = allocate(topics, high, max(sessions, 1))
+        days, leftover = lay_out(counts, high, days_left, minutes_per_day)
+        if not leftover or sessions <= 1:
+            break
+        sessions -= len(leftover)
+
+    skim += list(dict.fromkeys(topic for topic, _, _ in leftover))
+    minutes = defaultdict(int)
+    for day in days:
+        for block in day["blocks"]:
+            if block["kind"] == "study":
+                minutes[block["topics"][0]] += block["end"] - block["start"]
+    return {
+        "subject": subject,
+        "days_left": days_left,
+        "hours_per_day": float(hours_per_day),
+        "priority_ranking": high,
+        "topics": [{"topic": topic, "priority": "high" if topic in high else "normal", "minutes": minutes[topic]}
+                   for topic in counts if minutes[topic]],
+        "skim": skim,
+        "days": days,
+    }
+
+
+def clock(minutes):
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def render_block(block, break_number):
+    """One schedule line in Markdown"""
+    span = f"{clock(block['start'])}–{clock(block['end'])}"
+    topics = ", ".join(block["topics"])
+    if block["kind"] == "break":
+        return f"- {span} ☕ Break: {BREAK_IDEAS[break_number % len(BREAK_IDEAS)]}"
+    if block["kind"] == "study":
+        part = f" (part {block['part']} of {block['parts']})" if block["parts"] > 1 else ""
+        return f"- {span} 📖 **{topics}**{part}"
+    if block["kind"] == "review":
+        return f"- {span} 🔁 Review: {topics}"
+    if block.get("paper"):
+        return f"- {span} 📝 Timed practice paper on everything you studied"
+    return f"- {span} ✍️ Practice questions: {topics or 'mixed topics'}"
+
+
+def render_markdown(plan, importance=None):
+    """The plan as Markdown for the study plan output"""
+    importance = importance or {}
+    lines = [f"## 📅 Your {plan['days_left']}-day study plan for {plan['subject']}", "",
+             f"{plan['hours_per_day']:g} hours a day in {SESSION_MINUTES}-minute sessions with {BREAK_MINUTES}-minute "
+             f"breaks. High-yield topics come first, get the most time and come back for short reviews."]
+    if plan["priority_ranking"]:
+        lines += ["", "### 🎯 Priority ranking (high-yield topics)"]
+        for rank, topic in enumerate(plan["priority_ranking"], 1):
+            reason = importance.get(topic)
+            lines.append(f"{rank}. **{topic}**" + (f" — {reason}" if isinstance(reason, str) and reason else ""))
+    breaks = 0
+    for day in plan["days"]:
+        title = "final review" if day["day"] == plan["days_left"] and plan["days_left"] >= 2 else None
+        lines += ["", f"### Day {day['day']}" + (f" ({title})" if title else "")]
+        for block in day["blocks"]:
+            lines.append(render_block(block, breaks))
+            breaks += block["kind"] == "break"
+    if plan["skim"]:
+        lines += ["", "### ⏩ Skim if you have time", ", ".join(plan["skim"])]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("subject")
+    parser.add_argument("--days", type=int, default=3, help="days left until the exam")
+    parser.add_argument("--hours", type=float, default=4, help="study hours per day")
+    parser.add_argument("--analysis", default=None, help="JSON file with all_topics/high_priority_topics")
+    parser.add_argument("--json", action="store_true", help="print the structured plan instead of Markdown")
+    args = parser.parse_args()
+
+    analysis = None
+    if args.analysis:
+        with open(args.analysis, encoding="utf-8") as f:
+            analysis = json.load(f)
+    topics = plan_topics(args.subject, analysis)
+    if topics is None:
+        parser.error(f"no topics for {args.subject!r}: pass --analysis or use one of: {', '.join(TOPIC_CATALOG)}")
+    plan = schedule(args.subject, topics[0], topics[1], args.days, args.hours)
+    if args.json:
+        json.dump(plan, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print(render_markdown(plan, topics[2]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process coalescing
+    fcntl = None
+
+
+class _Flight:
+    """One in-flight call shared by every concurrent caller with the same key"""
+
+    def __init__(self):
+        self.chunks = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.condition = threading.Condition()
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls (thread-based) into one upstream execution.
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight wait for and share its result or exception. Streams are driven to
+    completion by a background thread, and every caller replays the chunks
+    from the start, so a caller that stops reading does not stall the others.
+    do() and stream() keep separate flights, so a call never joins a stream
+    with the same key (or the other way round).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    def _join(self, flights, key):
+        """Return (flight, is_leader)"""
+        with self._lock:
+            self.calls += 1
+            flight = flights.get(key)
+            if flight is not None:
+                self.collapsed += 1
+                return flight, False
+            flight = _Flight()
+            flights[key] = flight
+            self.executions += 1
+            return flight, True
+
+    def _finish(self, flights, key, flight, result=None, error=None):
+        with self._lock:
+            flights.pop(key, None)
+        with flight.condition:
+            flight.result = result
+            flight.error = error
+            flight.done = True
+            flight.condition.notify_all()
+
+    def do(self, key, fn):
+        """Call fn() once for all concurrent callers with this key and return its result"""
+        flight, is_leader = self._join(self._flights, key)
+        if is_leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._finish(self._flights, key, flight, error=e)
+                raise
+            self._finish(self._flights, key, flight, result=result)
+            return result
+
+        with flight.condition:
+            while not flight.done:
+                flight.condition.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key, make_iterator, on_complete=None):
+        """Share one upstream iterator among concurrent callers; yields every chunk to each of them.
+
+        on_complete(chunks) runs once, in the driver thread, after the upstream
+        iterator finishes without error.
+        """
+        flight, is_leader = self._join(self._streams, key)
+        if is_leader:
+            # The driver runs in the leader's context (so e.g. its request trace sees the upstream call)
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(self._drive, key, flight, make_iterator, on_complete),
+                             daemon=True).start()
+
+        index = 0
+        while True:
+            with flight.condition:
+                while index >= len(flight.chunks) and not flight.done:
+                    flight.condition.wait()
+                pending = flight.chunks[index:]
+                done = flight.done
+                error = flight.error
+            for chunk in pending:
+                yield chunk
+            index += len(pending)
+            if done and index >= len(flight.chunks):
+                if error is not None:
+                    raise error
+                return
+
+    def _drive(self, key, flight, make_iterator, on_complete):
+        try:
+            for chunk in make_iterator():
+                with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+            if on_complete is not None:
+                on_complete(flight.chunks)
+        except BaseException as e:
+            self._finish(self._streams, key, flight, error=e)
+            return
+        self._finish(self._streams, key, flight)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "executions": self.executions, "collapsed": self.collapsed,
+                    "in_flight": len(self._flights) + len(self._streams)}
+
+
+class AsyncSingleFlight:
+    """asyncio version of SingleFlight; the shared work runs as a task so one caller's cancellation doesn't cancel it"""
+
+    def __init__(self):
+        self._flights = {}
+        self._streams = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    def _join(self, flights, key, start):
+        """Return the (task, state) of the flight for key in flights, starting it if there is none"""
+        self.calls += 1
+        flight = flights.get(key)
+        if flight is not None:
+            self.collapsed += 1
+            return flight
+        self.executions += 1
+        flight = start()
+        flights[key] = flight
+        flight[0].add_done_callback(lambda _: flights.pop(key, None))
+        return flight
+
+    async def do(self, key, make_coroutine):
+        """Await make_coroutine() once for all concurrent callers with this key"""
+        task, _ = self._join(self._flights, key, lambda: (asyncio.ensure_future(make_coroutine()), None))
+        return await asyncio.shield(task)
+
+    async def stream(self, key, make_async_iterator, on_complete=None):
+        """Share one upstream async iterator among concurrent callers; yields every chunk to each of them"""
+        def start():
+            state = {"chunks": [], "changed": asyncio.Event()}
+            return asyncio.ensure_future(drive(state)), state
+
+        async def drive(state):
+            try:
+                async for chunk in make_async_iterator():
+                    state["chunks"].append(chunk)
+                    state["changed"].set()
+                if on_complete is not None:
+                    on_complete(state["chunks"])
+            finally:
+                state["changed"].set()
+
+        task, state = self._join(self._streams, key, start)
+
+        index = 0
+        while True:
+            chunks = state["chunks"]
+            while index < len(chunks):
+                yield chunks[index]
+                index += 1
+            if task.done():
+                if index >= len(state["chunks"]):
+                    task.result()  # re-raises the upstream error, if any
+                    return
+                continue
+            state["changed"].clear()
+            if index < len(state["chunks"]) or task.done():
+                continue
+            await state["changed"].wait()
+
+    def stats(self):
+        return {"calls": self.calls, "executions": self.executions, "collapsed": self.collapsed,
+                "in_flight": len(self._flights) + len(self._streams)}
+
+
+class FileLocks:
+    """Cross-process counterpart of SingleFlight, for workers sharing a cache: one flock'd file per key.
+
+    A worker holds the key's lock while it fetches, so the others wait for
+    it and then find the answer in the shared cache instead of calling
+    upstream too. The OS releases the lock if its holder dies, and a wait
+    longer than max_wait gives up and fetches anyway. The lock files (one
+    empty file per key) are left in lock_dir. With lock_dir None (a single
+    process) or without fcntl, hold() never waits.
+    """
+
+    def __init__(self, lock_dir=None, max_wait=120.0, poll_interval=0.05):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.acquired = 0
+        self.waited = 0
+        self.timeouts = 0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _open(self, key):
+        return os.open(os.path.join(self.lock_dir, key + ".lock"), os.O_CREAT | os.O_RDWR, 0o600)
+
+    def _try_lock(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _release(self, fd, locked):
+        # The file stays: removing it would let a newcomer lock a fresh file at
+        # the same path while a waiter holds the old one, and both would fetch
+        if locked:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _count(self, waited, locked):
+        if not locked:
+            self.timeouts += 1
+            return
+        self.acquired += 1
+        self.waited += waited
+
+    @contextlib.contextmanager
+    def hold(self, key):
+        """Hold key's lock for the with block; yields whether another worker held it first (so the cache is worth checking again)"""
+        if not self.lock_dir or key is None:
+            yield False
+            return
+        fd = self._open(key)
+        started = time.monotonic()
+        waited = False
+        locked = self._try_lock(fd)
+        while not locked and time.monotonic() - started < self.max_wait:
+            waited = True
+            time.sleep(self.poll_interval)
+            locked = self._try_lock(fd)
+        self._count(waited, locked)
+        try:
+            yield waited
+        finally:
+            self._release(fd, locked)
+
+    @contextlib.asynccontextmanager
+    async def async_hold(self, key):
+        """Async version of hold; polls instead of blocking the event loop"""
+        if not self.lock_dir or key is None:
+            yield False
+            return
+        fd = self._open(key)
+        started = time.monotonic()
+        waited = False
+        try:
+            locked = self._try_lock(fd)
+            while not locked and time.monotonic() - started < self.max_wait:
+                waited = True
+                await asyncio.sleep(self.poll_interval)
+                locked = self._try_lock(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._count(waited, locked)
+        try:
+            yield waited
+        finally:
+            self._release(fd, locked)
+
+    def stats(self):
+        return {"acquired": self.acquired, "waited": self.waited, "timeouts": self.timeouts}
@@ -0,0 +1,40 @@
+"""Shared test setup: the repo and benchmarks/ importable, in-memory caches, and a local mock model endpoint."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
+
+# Set before codelala_core is imported: keep caches in memory and the metrics server off
+for name in ("CODELALA_CACHE_DB", "CODELALA_ANALYSIS_DB", "CODELALA_EXTRACTION_DB", "CODELALA_INDEX_DB",
+             "CODELALA_METRICS_PORT", "CODELALA_WORKER_LOCKS"):
+    os.environ[name] = ""
+os.environ["CODELALA_API_KEY"] = "mock"
+# Anything the app writes (logs, profiles) goes to a scratch directory
+os.chdir(tempfile.mkdtemp(prefix="codelala-tests-"))
+
+import mock_llm_server
+
+
+@pytest.fixture
+def mock_llm():
+    """A mock model server on a background thread; change server.config to inject latency and errors"""
+    server = mock_llm_server.start_server(latency=0.0, tokens=20)
+    server.url = mock_llm_server.base_url(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def core(mock_llm, monkeypatch):
+    """codelala_core talking to the mock server, with a fresh router"""
+    import codelala_core
+
+    monkeypatch.setenv("CODELALA_API_BASE", mock_llm.url)
+    monkeypatch.setattr(codelala_core, "router", None)
+    monkeypatch.setattr(codelala_core, "upstream_semaphore", None)
+    return codelala_core
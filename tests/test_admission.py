@@ -0,0 +1,120 @@
+"""Admission control: token buckets, pool queueing by priority, and shedding when full or too slow."""
+import asyncio
+
+import pytest
+
+from admission import CHEAP, HEAVY, Admission, Pool, Rejected, TokenBuckets
+
+
+def test_token_bucket_refills_at_its_rate():
+    buckets = TokenBuckets(rate=2.0, burst=2)
+
+    assert buckets.take("a", now=0.0) == 0
+    assert buckets.take("a", now=0.0) == 0
+    assert buckets.take("a", now=0.0) == pytest.approx(0.5)
+    # The failed take leaves the bucket empty; a quarter second refills half a token
+    assert buckets.take("a", now=0.25) == pytest.approx(0.25)
+    assert buckets.take("a", now=0.75) == 0
+    # Other keys have buckets of their own, and a long idle refills only up to burst
+    assert buckets.take("b", now=0.75) == 0
+    assert [buckets.take("a", now=100.0) for _ in range(3)][2] == pytest.approx(0.5)
+
+
+def test_least_recently_used_buckets_are_forgotten():
+    buckets = TokenBuckets(rate=1.0, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        buckets.take(key, now=0.0)
+
+    assert len(buckets) == 2
+    assert buckets.take("a", now=0.0) == 0
+
+
+def test_rate_limited_client_is_told_when_to_retry():
+    admission = Admission(session_rate=1.0, session_burst=1)
+    admission.check_rate(session="s")
+
+    with pytest.raises(Rejected) as rejected:
+        admission.check_rate(session="s")
+    assert rejected.value.reason == "rate_limited"
+    assert 0 < rejected.value.retry_after <= 1.0
+    admission.check_rate(session="other")
+
+
+def test_full_queue_is_rejected():
+    async def run():
+        pool = Pool("test", limit=1, queue=1, max_wait=5)
+        await pool.acquire()
+        waiter = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Rejected) as rejected:
+            await pool.acquire()
+        assert rejected.value.reason == "queue_full"
+
+        pool.release()
+        await waiter
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert stats["shed"] == 1
+    assert stats["admitted"] == 2
+    assert stats["active"] == 1 and stats["waiting"] == 0
+
+
+def test_waiter_past_max_wait_times_out():
+    async def run():
+        pool = Pool("test", limit=1, queue=4, max_wait=0.05)
+        await pool.acquire()
+
+        with pytest.raises(Rejected) as rejected:
+            await pool.acquire()
+        assert rejected.value.reason == "queue_timeout"
+
+        # The slot goes back to the pool, not to the request that gave up
+        pool.release()
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert stats["timeouts"] == 1
+    assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+def test_higher_priority_waiter_is_admitted_first():
+    async def run():
+        pool = Pool("test", limit=1, queue=4, max_wait=5)
+        order = []
+
+        async def request(name, priority):
+            await pool.acquire(priority)
+            order.append(name)
+            pool.release()
+
+        await pool.acquire()
+        waiters = [asyncio.ensure_future(request("heavy", HEAVY)), asyncio.ensure_future(request("cheap 1", CHEAP)),
+                   asyncio.ensure_future(request("cheap 2", CHEAP))]
+        await asyncio.sleep(0)
+        pool.release()
+        await asyncio.gather(*waiters)
+        return order, pool.stats()
+
+    order, stats = asyncio.run(run())
+    assert order == ["cheap 1", "cheap 2", "heavy"]
+    assert stats["active"] == 0 and stats["queued"] == 3
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def run():
+        pool = Pool("test", limit=1, queue=4, max_wait=5)
+        await pool.acquire()
+        gone = asyncio.ensure_future(pool.acquire())
+        staying = asyncio.ensure_future(pool.acquire())
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.gather(gone, return_exceptions=True)
+
+        pool.release()
+        await staying
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 1 and stats["waiting"] == 0
@@ -0,0 +1,52 @@
+"""Interaction logs written unquoted before CsvLogWriter are read back with their commas rejoined."""
+import logging
+
+import pytest
+
+import analytics
+import interaction_store
+from interaction_store import TABLES
+
+pytest.importorskip("pandas")
+
+LEGACY_LOG = """timestamp,subject,days_left,hours_per_day,resource_type,feedback_preference
+2025-03-01 09:00:00,Operating Systems (OS),14,3,Videos,Mix of multiple styles
+2025-03-01 10:00:00,Machine Learning (ML),7,2.5,Articles,Visual learner (diagrams, charts)
+2025-03-01 11:00:00,Signals, Systems,30,1,Videos,Mix of multiple styles
+2025-03-01 12:00:00,Signals, Systems,30,1,Practice problems,Kinesthetic learner (practice, examples)
+2025-03-01 13:00:00,Machine Learning (ML),ten,2,Videos,Visual learner (diagrams, charts)
+2025-03-01 14:00:00,Operating Systems (OS)
+"""
+
+REPAIRED = [
+    ["2025-03-01 09:00:00", "Operating Systems (OS)", "14", "3", "Videos", "Mix of multiple styles"],
+    ["2025-03-01 10:00:00", "Machine Learning (ML)", "7", "2.5", "Articles", "Visual learner (diagrams, charts)"],
+    ["2025-03-01 11:00:00", "Signals, Systems", "30", "1", "Videos", "Mix of multiple styles"],
+    ["2025-03-01 12:00:00", "Signals, Systems", "30", "1", "Practice problems",
+     "Kinesthetic learner (practice, examples)"],
+]
+
+
+@pytest.fixture
+def legacy_log(tmp_path):
+    path = tmp_path / "user_interactions.csv"
+    path.write_text(LEGACY_LOG, encoding="utf-8")
+    return str(path)
+
+
+def test_unquoted_commas_are_joined_back_and_unfixable_rows_left_out(legacy_log, caplog):
+    spec = TABLES["interactions"]
+    with caplog.at_level(logging.WARNING, logger="codelala.store"):
+        header, rows = interaction_store.read_rows(legacy_log, spec["columns"], spec["overflow"])
+    assert header == list(spec["columns"])
+    assert rows == REPAIRED
+    assert "3 rows with unquoted commas repaired, 2 rows" in caplog.text
+
+
+def test_analytics_load_reads_the_repaired_rows(legacy_log, tmp_path):
+    interactions = analytics.load("interactions", store_dir=str(tmp_path / "store"), path=legacy_log)
+    assert list(interactions["subject"]) == [row[1] for row in REPAIRED]
+    assert list(interactions["feedback_preference"]) == [row[5] for row in REPAIRED]
+    assert list(interactions["hours_per_day"]) == [3.0, 2.5, 1.0, 1.0]
+    assert analytics.top_subjects(interactions).to_dict() == {
+        "Signals, Systems": 2, "Machine Learning (ML)": 1, "Operating Systems (OS)": 1}
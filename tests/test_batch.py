@@ -0,0 +1,63 @@
+"""Headless batch generation: row parsing, deduplication of identical rows and resuming from the output."""
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def batch(core):
+    import batch
+    core.response_cache.clear()
+    return batch
+
+
+def row(subject="Operating Systems (OS)", days_left="3", hours_per_day="2", resource_type="Textbooks", **extra):
+    return {"subject": subject, "days_left": days_left, "hours_per_day": hours_per_day,
+            "resource_type": resource_type, "feedback_preference": "Detailed explanations", **extra}
+
+
+def run(batch, rows, path, tasks=("study_plan",)):
+    results = batch.open_results(str(path))
+    try:
+        counts = asyncio.run(batch.run_batch(list(enumerate(rows, 1)), results, tasks, concurrency=4))
+    finally:
+        results.close()
+    with open(path, encoding="utf-8") as f:
+        return counts, [json.loads(line) for line in f]
+
+
+def test_fractional_hours_are_accepted(batch):
+    assert batch.job_params("study_plan", row(hours_per_day="2.5"))["hours_per_day"] == 2.5
+    assert batch.job_params("study_plan", row(hours_per_day="2.0"))["hours_per_day"] == 2
+    with pytest.raises(ValueError):
+        batch.job_params("study_plan", row(hours_per_day="a lot"))
+
+
+def test_duplicate_rows_are_generated_once(batch, tmp_path):
+    rows = [row(id="a"), row(id="b"), row(id="c", resource_type="Videos"), row(id="d", subject="Cooking")]
+
+    counts, records = run(batch, rows, tmp_path / "out.jsonl")
+
+    assert counts["ok"] == 3 and counts["off_topic"] == 1 and counts["deduplicated"] == 1
+    by_id = {record["id"]: record for record in records}
+    assert by_id["a"]["key"] == by_id["b"]["key"] != by_id["c"]["key"]
+    assert by_id["a"]["output"] == by_id["b"]["output"]
+    assert [by_id[name]["deduplicated"] for name in "abc"].count(True) == 1
+
+
+def test_rerun_skips_finished_rows_and_retries_failed_ones(batch, tmp_path):
+    path = tmp_path / "out.jsonl"
+    rows = [row(resource_type=resource) for resource in ("Textbooks", "Videos", "Practice problems", "Online courses")]
+    run(batch, rows[:2], path)
+    # One row failed, and an interrupted run left a partial line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"row": 4, "task": "study_plan", "key": None, "status": "error"}) + "\n")
+        f.write('{"row": 3, "task": "stu')
+
+    counts, records = run(batch, rows, path)
+
+    assert counts["resumed"] == 2
+    assert counts["ok"] == 2 and not counts["deduplicated"]
+    assert [record["row"] for record in records[:3]] in ([1, 2, 4], [2, 1, 4])
+    assert sorted((record["row"], record["status"]) for record in records[3:]) == [(3, "ok"), (4, "ok")]
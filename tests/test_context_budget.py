@@ -0,0 +1,62 @@
+"""Fitting uploaded material into the prompt's token budget."""
+import re
+
+from context_budget import estimate_tokens, fit_to_budget
+
+FILLER = "Students work through the exercises in this part of the course and discuss them in class. "
+
+
+def paragraph(words, repeat=6):
+    return " ".join(f"{words} is explained with worked examples number {n}." for n in range(repeat)) + " "
+
+
+def test_text_that_fits_is_unchanged():
+    assert fit_to_budget("Short notes on paging.", "paging", budget_tokens=100) == "Short notes on paging."
+
+
+def test_most_relevant_chunks_are_kept_in_order():
+    text = (FILLER * 8 + paragraph("Page replacement with LRU") + FILLER * 8 + paragraph("TLB and page tables")
+            + FILLER * 8)
+
+    budgeted = fit_to_budget(text, "page replacement page tables", budget_tokens=200)
+
+    assert estimate_tokens(budgeted) <= 200
+    assert budgeted.index("Page replacement") < budgeted.index("TLB and page tables")
+    assert "[...]" in budgeted
+    assert budgeted.count("Students work through") < 3
+
+
+def test_syllabus_keeps_every_unit():
+    units = ["Process scheduling", "Deadlock handling", "Memory paging", "Disk storage", "Shell scripting",
+             "Case study Linux", "Security and protection", "Virtualization"]
+    text = "".join(f"Unit {n}: {title}. " + FILLER * 12 for n, title in enumerate(units, 1))
+
+    budgeted = fit_to_budget(text, "Operating Systems", budget_tokens=400, keep_sections=True)
+
+    assert estimate_tokens(budgeted) <= 400
+    assert re.findall(r"Unit (\d+)", budgeted) == [str(n) for n in range(1, len(units) + 1)]
+    assert all(title in budgeted for title in units)
+
+
+def test_syllabus_without_headings_is_covered_end_to_end():
+    text = "Opening topics: processes. " + FILLER * 60 + "Closing topics: distributed systems."
+
+    budgeted = fit_to_budget(text, "Operating Systems", budget_tokens=300, keep_sections=True)
+
+    assert estimate_tokens(budgeted) <= 300
+    assert budgeted.startswith("Opening topics")
+    assert "distributed systems" in budgeted
+
+
+def test_syllabus_is_summarized_in_full():
+    seen = []
+
+    def summarize(text, focus, target_tokens):
+        seen.append(text)
+        return text[:40]
+
+    text = "Unit 1: Scheduling. " + FILLER * 20 + "Unit 2: Filesystems. " + FILLER * 20
+    fit_to_budget(text, "Operating Systems", budget_tokens=200, summarize=summarize, keep_sections=True)
+
+    summarized = " ".join(seen)
+    assert "Scheduling" in summarized and "Filesystems" in summarized
@@ -0,0 +1,31 @@
+"""The background CSV writer keeps running when a batch fails to write."""
+import csv
+import threading
+
+from log_writer import CsvLogWriter
+
+
+def test_failed_batch_is_dropped_and_later_rows_are_written(tmp_path):
+    path = tmp_path / "log.csv"
+    writer = CsvLogWriter(str(path), ["n"], batch_size=1, flush_interval=0.01)
+    write_batch = writer._write_batch
+    failures = [ValueError("bad row")]
+
+    def flaky(rows):
+        if failures:
+            raise failures.pop()
+        write_batch(rows)
+    writer._write_batch = flaky
+
+    writer.write([1])
+    flushed = threading.Thread(target=writer.flush, daemon=True)
+    flushed.start()
+    flushed.join(5)
+    assert not flushed.is_alive()
+
+    writer.write([2])
+    writer.close()
+    with open(path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["n"], ["2"]]
+    assert writer.stats()["dropped"] == 1
+    assert writer.stats()["written"] == 1
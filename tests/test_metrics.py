@@ -0,0 +1,66 @@
+"""The Prometheus endpoint: registered counters, histograms and stats gauges, and the recent traces."""
+import json
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+from metrics import Registry, start_metrics_server
+
+
+@pytest.fixture
+def metrics_url():
+    server = start_metrics_server(0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read().decode("utf-8")
+
+
+def sample(text, name, **labels):
+    """Value of the series name{labels} in a scrape, or None"""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}{re.escape('{' + label_text + '}') if labels else ''} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_registry_renders_counters_histograms_and_stats():
+    registry = Registry()
+    requests = registry.counter("demo_requests_total", "Requests", ("route",))
+    latency = registry.histogram("demo_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.register_stats("demo_cache", lambda: {"hits": 3, "tier": {"disk": 2}, "name": "skipped"})
+    registry.register_stats("demo_broken", lambda: 1 / 0)
+    requests.inc(route='a "quoted" route')
+    requests.inc(2, route="b")
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = registry.render()
+
+    assert "# TYPE demo_requests_total counter" in text
+    assert sample(text, "demo_requests_total", route='a \\"quoted\\" route') == 1
+    assert sample(text, "demo_requests_total", route="b") == 2
+    assert sample(text, "demo_seconds_bucket", le="0.1") == 1
+    assert sample(text, "demo_seconds_bucket", le="+Inf") == 2
+    assert sample(text, "demo_seconds_count") == 2
+    assert sample(text, "demo_cache_hits") == 3 and sample(text, "demo_cache_tier_disk") == 2
+    assert "demo_cache_name" not in text and "demo_broken" not in text
+
+
+def test_endpoint_serves_the_app_metrics(core, mock_llm, metrics_url):
+    core.generate_smart_prompts("Operating Systems (OS)", "Scrape test topic")
+
+    text = fetch(metrics_url + "/metrics")
+
+    assert sample(text, "codelala_request_seconds_count", feature="smart_prompts", outcome="ok") >= 1
+    assert sample(text, "codelala_response_cache_lookups_total", task="prompts", result="miss") >= 1
+    assert sample(text, "codelala_response_cache_misses") >= 1
+    assert "# TYPE codelala_upstream_seconds histogram" in text
+    assert any(trace["feature"] == "smart_prompts" for trace in json.loads(fetch(metrics_url + "/traces")))
+    with pytest.raises(urllib.error.HTTPError):
+        fetch(metrics_url + "/nothing")
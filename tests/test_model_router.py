@@ -0,0 +1,103 @@
+"""Task routing, fallback on errors and SLO demotion across two mock backends."""
+import json
+import time
+
+import pytest
+
+import mock_llm_server
+import model_router
+
+
+@pytest.fixture
+def secondary():
+    server = mock_llm_server.start_server(latency=0.0, tokens=20)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def routed(core, mock_llm, secondary, monkeypatch):
+    """codelala_core routing "prompts" to a small model on mock_llm with a large one on secondary as fallback"""
+    config = {
+        "backends": {"primary": {"base_url": mock_llm.url, "api_key": "mock"},
+                     "secondary": {"base_url": mock_llm_server.base_url(secondary), "api_key": "mock"}},
+        "routes": {
+            "prompts": [{"backend": "primary", "model": "small", "max_tokens": 10, "slo": 0.1},
+                        {"backend": "secondary", "model": "large", "max_tokens": 15}],
+            "plan": [{"backend": "primary", "model": "large", "max_tokens": 20}],
+            "summary": [{"backend": "primary", "model": "small", "slo": 0.1}],
+        },
+    }
+    monkeypatch.setenv("CODELALA_ROUTES", json.dumps(config))
+    monkeypatch.setenv("CODELALA_RESILIENCE", json.dumps({"default": {"max_attempts": 1, "timeout": 5}}))
+    monkeypatch.setattr(model_router, "MIN_SLO_SAMPLES", 3)
+    monkeypatch.setattr(model_router, "SLO_COOLDOWN", 0.5)
+    return core
+
+
+def test_each_task_gets_its_route_settings(routed, mock_llm):
+    prompts = routed.get_gemini_response("route prompts", use_cache=False, task="prompts")
+    plan = routed.get_gemini_response("route plan", use_cache=False, task="plan")
+
+    assert dict(mock_llm.model_counts) == {"small": 1, "large": 1}
+    # The mock stops at the route's max_tokens
+    assert len(prompts.split()) == 10
+    assert len(plan.split()) == 20
+
+
+def test_falls_back_to_the_next_route_on_errors(routed, mock_llm, secondary):
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+
+    assert routed.get_gemini_response("fallback on error", use_cache=False, task="prompts")
+
+    router = routed.get_router()
+    assert secondary.model_counts["large"] == 1
+    assert router.fallbacks == 1
+    assert router.stats()["routes"]["primary/small"]["failures"] == 1
+
+
+def test_stream_falls_back_before_its_first_chunk(routed, mock_llm, secondary):
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+
+    text = "".join(routed.stream_gemini_response("stream fallback", use_cache=False, task="prompts"))
+
+    assert len(text.split()) == 15
+    assert secondary.request_count == 1
+    assert routed.get_router().fallbacks == 1
+
+
+def test_last_route_error_reaches_the_caller(routed, mock_llm, secondary):
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+    secondary.config.update(error_rate=1.0, error_status=503)
+
+    with pytest.raises(routed.UpstreamError):
+        routed.get_gemini_response("nowhere to go", use_cache=False, task="prompts")
+
+
+def test_route_breaching_its_slo_is_demoted_for_a_while(routed, mock_llm, secondary):
+    mock_llm.config["latency"] = 0.2
+    for n in range(model_router.MIN_SLO_SAMPLES):
+        routed.get_gemini_response(f"slow {n}", use_cache=False, task="prompts")
+    assert mock_llm.request_count == model_router.MIN_SLO_SAMPLES
+    assert secondary.request_count == 0
+
+    router = routed.get_router()
+    assert router.stats()["routes"]["primary/small"]["demoted"]
+    routed.get_gemini_response("while demoted", use_cache=False, task="prompts")
+    assert secondary.request_count == 1
+    assert router.slo_skips == 1
+
+    time.sleep(model_router.SLO_COOLDOWN)
+    routed.get_gemini_response("after cooldown", use_cache=False, task="prompts")
+    assert mock_llm.request_count == model_router.MIN_SLO_SAMPLES + 1
+
+
+def test_last_route_is_never_demoted(routed):
+    router = routed.get_router()
+    routes = router.routes_of("summary")
+    for _ in range(model_router.MIN_SLO_SAMPLES):
+        router.record_latency(routes[0], 1.0)
+
+    assert router.stats()["routes"]["primary/small"]["demoted"]
+    assert router.candidates("summary") == routes
@@ -0,0 +1,69 @@
+"""Pre-warming the response cache: what warm() reports for each state of a cached answer."""
+import asyncio
+
+import pytest
+
+SUBJECT = "Operating Systems (OS)"
+HOUR = 3600
+
+
+@pytest.fixture
+def prewarm(core):
+    import prewarm
+    core.response_cache.clear()
+    return prewarm
+
+
+def warm_all(prewarm, calls):
+    """Outcomes of warm() for each (topic, keyword arguments), run in one event loop as prewarm.main does"""
+    async def run():
+        outcomes = []
+        for topic, options in calls:
+            options = dict({"feature": "smart_prompts", "refresh_after": HOUR}, **options)
+            outcomes.append(await prewarm.warm(options.pop("subject", SUBJECT), topic, **options))
+        return outcomes
+    return asyncio.run(run())
+
+
+def test_missing_answer_is_reported_then_warmed_then_fresh(prewarm, core, mock_llm):
+    outcomes = warm_all(prewarm, [("Page replacement", {"dry_run": True}), ("Page replacement", {}),
+                                  ("Page replacement", {})])
+
+    assert outcomes == ["missing", "warmed", "fresh"]
+    assert mock_llm.request_count == 1
+    # A student asking for it is answered from the cache
+    core.generate_smart_prompts(SUBJECT, "Page replacement")
+    assert mock_llm.request_count == 1
+
+
+def test_old_answer_is_reported_stale_then_refreshed(prewarm, mock_llm):
+    outcomes = warm_all(prewarm, [("Deadlock avoidance", {}),
+                                  ("Deadlock avoidance", {"refresh_after": 0, "dry_run": True}),
+                                  ("Deadlock avoidance", {"refresh_after": 0})])
+
+    assert outcomes == ["warmed", "stale", "refreshed"]
+    assert mock_llm.request_count == 2
+
+
+def test_practice_questions_are_warmed_under_their_own_key(prewarm, mock_llm):
+    outcomes = warm_all(prewarm, [("Thrashing", {}), ("Thrashing", {"feature": "practice_questions"})])
+
+    assert outcomes == ["warmed", "warmed"]
+    assert mock_llm.request_count == 2
+
+
+def test_off_topic_and_failed_topics_are_not_cached(prewarm, core, mock_llm):
+    mock_llm.config.update(error_rate=1.0, error_status=400)
+
+    outcomes = warm_all(prewarm, [("Pasta recipes", {"subject": "Cooking"}), ("Belady's anomaly", {})])
+
+    assert outcomes == ["off_topic", "failed"]
+    assert core.response_cache.stats()["memory_entries"] == 0
+
+
+def test_spellings_of_one_topic_are_warmed_once(prewarm, mock_llm):
+    counts = asyncio.run(prewarm.prewarm([(SUBJECT, "Binary Trees"), (SUBJECT, "binary-tree"), (SUBJECT, "Paging")],
+                                         features=("smart_prompts",), refresh_after=HOUR))
+
+    assert counts == {"warmed": 2}
+    assert mock_llm.request_count == 2
@@ -0,0 +1,192 @@
+"""Retries, deadlines, hedging and circuit breaker transitions against the mock model server."""
+import time
+
+import pytest
+from openai import OpenAI
+
+from resilience import CircuitBreaker, CircuitOpenError, Resilience, TaskPolicy, UpstreamError
+
+
+def make_resilience(breaker=None, **policy):
+    settings = dict(timeout=2.0, deadline=5.0, max_attempts=3, backoff_base=0.01, backoff_max=0.05)
+    settings.update(policy)
+    return Resilience(policies={"default": TaskPolicy(**settings)}, breaker=breaker)
+
+
+@pytest.fixture
+def complete(mock_llm):
+    """attempt(timeout) function making one chat completion against the mock server"""
+    client = OpenAI(api_key="mock", base_url=mock_llm.url, max_retries=0)
+
+    def attempt(timeout):
+        response = client.chat.completions.create(model="mock", messages=[{"role": "user", "content": "hi"}],
+                                                  timeout=timeout)
+        return response.choices[0].message.content
+    return attempt
+
+
+def recover_after(mock_llm, attempt, failures):
+    """Wrap attempt so the mock server stops failing once it has answered `failures` requests"""
+    def wrapped(timeout):
+        if mock_llm.request_count >= failures:
+            mock_llm.config["error_rate"] = 0.0
+        return attempt(timeout)
+    return wrapped
+
+
+def test_retries_transient_errors(mock_llm, complete):
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+    resilience = make_resilience()
+
+    assert resilience.call("default", recover_after(mock_llm, complete, 2))
+    assert mock_llm.request_count == 3
+    assert resilience.retries == 2
+
+
+def test_honors_retry_after(mock_llm, complete):
+    mock_llm.config.update(error_rate=1.0, error_status=429, retry_after=0.3)
+    resilience = make_resilience()
+
+    started = time.monotonic()
+    resilience.call("default", recover_after(mock_llm, complete, 1))
+
+    assert time.monotonic() - started >= 0.3
+    assert mock_llm.request_count == 2
+
+
+def test_gives_up_after_max_attempts(mock_llm, complete):
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+
+    with pytest.raises(UpstreamError):
+        make_resilience().call("default", complete)
+    assert mock_llm.request_count == 3
+
+
+def test_bad_request_is_not_retried(mock_llm, complete):
+    mock_llm.config.update(error_rate=1.0, error_status=400)
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    with pytest.raises(UpstreamError):
+        make_resilience(breaker).call("default", complete)
+    assert mock_llm.request_count == 1
+    # Upstream answered, so it is not counted against its health
+    assert breaker.state == "closed"
+
+
+def test_attempt_timeout(mock_llm, complete):
+    mock_llm.config["latency"] = 1.0
+    resilience = make_resilience(timeout=0.2, max_attempts=2)
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamError):
+        resilience.call("default", complete)
+
+    assert time.monotonic() - started < 1.0
+    assert mock_llm.request_count == 2
+
+
+def test_deadline_bounds_the_whole_call(mock_llm, complete):
+    mock_llm.config.update(error_rate=1.0, error_status=503, retry_after=1.0)
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamError):
+        make_resilience(deadline=0.5, max_attempts=5).call("default", complete)
+
+    # The Retry-After wait would pass the deadline, so it fails without waiting
+    assert time.monotonic() - started < 0.5
+    assert mock_llm.request_count == 1
+
+
+def test_breaker_opens_rejects_then_closes_after_a_good_probe(mock_llm, complete):
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    resilience = make_resilience(breaker, max_attempts=1)
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            resilience.call("default", complete)
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        resilience.call("default", complete)
+    assert mock_llm.request_count == 2
+
+    time.sleep(0.25)
+    mock_llm.config["error_rate"] = 0.0
+    assert resilience.call("default", complete)
+    assert breaker.state == "closed"
+    assert breaker.stats()["opens"] == 1
+
+
+def test_failed_probe_reopens_the_breaker(mock_llm, complete):
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.2)
+    resilience = make_resilience(breaker, max_attempts=1)
+
+    with pytest.raises(UpstreamError):
+        resilience.call("default", complete)
+    time.sleep(0.25)
+    with pytest.raises(UpstreamError):
+        resilience.call("default", complete)
+
+    assert breaker.state == "open"
+    assert breaker.stats()["opens"] == 2
+    assert mock_llm.request_count == 2
+
+
+def test_hedged_request_beats_a_slow_one(mock_llm, complete):
+    calls = []
+
+    def attempt(timeout):
+        # The first request is slow, the duplicate is not
+        calls.append(timeout)
+        mock_llm.config["latency"] = 1.0 if len(calls) == 1 else 0.0
+        return complete(timeout)
+
+    resilience = make_resilience(hedge=True, hedge_after=0.1)
+    started = time.monotonic()
+    assert resilience.call("default", attempt)
+
+    assert time.monotonic() - started < 1.0
+    assert resilience.hedged == 1
+    assert resilience.hedge_wins == 1
+
+
+def test_stream_retries_until_the_first_chunk(mock_llm):
+    client = OpenAI(api_key="mock", base_url=mock_llm.url, max_retries=0)
+    mock_llm.config.update(error_rate=1.0, error_status=503)
+
+    def open_stream(timeout):
+        if mock_llm.request_count >= 1:
+            mock_llm.config["error_rate"] = 0.0
+        stream = client.chat.completions.create(model="mock", messages=[{"role": "user", "content": "hi"}],
+                                                stream=True, timeout=timeout)
+        return (chunk.choices[0].delta.content for chunk in stream if chunk.choices and chunk.choices[0].delta.content)
+
+    chunks = list(make_resilience().stream("default", open_stream))
+
+    assert len(chunks) == mock_llm.config["tokens"]
+    assert mock_llm.request_count == 2
+
+
+@pytest.mark.parametrize("read", [1, 2])
+def test_closing_the_stream_closes_the_upstream_chunks(read):
+    closed = []
+    opened = []
+
+    def chunks():
+        try:
+            yield from ["a", "b", "c"]
+        finally:
+            closed.append(True)
+
+    def open_stream(timeout):
+        # Kept referenced, so only an explicit close (not garbage collection) ends it
+        opened.append(chunks())
+        return opened[-1]
+
+    stream = make_resilience().stream("default", open_stream)
+    assert [next(stream) for _ in range(read)] == ["a", "b"][:read]
+    stream.close()
+
+    assert closed == [True]
@@ -0,0 +1,78 @@
+"""The two-tier response cache: byte accounting, disk eviction and batched last_access writes."""
+import sqlite3
+
+import response_cache
+from response_cache import ResponseCache
+
+
+def test_max_bytes_counts_encoded_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.set("a", "ééééé")  # 5 characters, 10 bytes
+    cache.set("b", "é")
+
+    assert cache.stats()["memory_bytes"] == 2
+    assert cache.get("a") is None
+    assert cache.get("b") == "é"
+
+
+def test_disk_keeps_the_most_recently_used_rows(tmp_path):
+    cache = ResponseCache(max_entries=1, db_path=str(tmp_path / "cache.sqlite3"), max_disk_entries=3)
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.get("a") == "a"  # Moves "a" ahead of "b" once its access is written
+    cache.set("d", "d")
+
+    assert cache.stats()["disk_entries"] == 3
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["a", "c", "d"]
+
+
+def test_disk_hits_write_last_access_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(response_cache, "ACCESS_FLUSH_SIZE", 3)
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(max_entries=1, db_path=db_path)
+    for key in "abc":
+        cache.set(key, key)
+    with sqlite3.connect(db_path) as db:
+        db.execute("UPDATE responses SET last_access = 0")
+
+    def accessed():
+        with sqlite3.connect(db_path) as db:
+            return {key for (key,) in db.execute("SELECT key FROM responses WHERE last_access > 0")}
+
+    cache.get("a")
+    cache.get("b")
+    assert accessed() == set()
+
+    cache.get("c")
+    assert accessed() == {"a", "b", "c"}
+    assert cache.disk_hits == 3
+
+
+def test_rows_from_another_worker_are_counted(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    other = ResponseCache(db_path=db_path)
+    for n in range(5):
+        other.set(f"other {n}", "x")
+    cache = ResponseCache(db_path=db_path, max_disk_entries=4)
+    cache.set("mine", "x")
+
+    assert cache.stats()["disk_entries"] == 4
+    assert cache.get("mine") == "x"
+
+
+def test_stats_reports_the_running_disk_count_without_a_scan(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(ttl=60, db_path=db_path)
+    for key in "abc":
+        cache.set(key, key)
+    with sqlite3.connect(db_path) as db:
+        db.execute("UPDATE responses SET created = 0 WHERE key = 'a'")
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+
+    assert cache.stats()["disk_entries"] == 3
+    assert statements == []
+
+    cache.purge_expired()
+    assert cache.stats()["disk_entries"] == 2
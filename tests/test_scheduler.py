@@ -0,0 +1,69 @@
+"""The local study-plan scheduler: every day filled, deterministic, priority-weighted."""
+import pytest
+
+import scheduler
+
+SUBJECTS = list(scheduler.TOPIC_CATALOG)
+ANALYSIS = {"all_topics": [f"Topic {n}" for n in range(1, 13)], "high_priority_topics": ["Topic 3", "Topic 7"],
+            "topic_importance": {"Topic 3": "frequently tested"}}
+
+
+def catalog_plan(subject, days_left, hours_per_day):
+    topics, high, _ = scheduler.plan_topics(subject)
+    return scheduler.schedule(subject, topics, high, days_left, hours_per_day)
+
+
+@pytest.mark.parametrize("subject", SUBJECTS)
+@pytest.mark.parametrize("days_left", [1, 2, 3, 7, 30])
+@pytest.mark.parametrize("hours_per_day", [0.5, 1, 1.5, 2, 3.25, 6, 12])
+def test_blocks_fill_each_day(subject, days_left, hours_per_day):
+    plan = catalog_plan(subject, days_left, hours_per_day)
+
+    assert [day["day"] for day in plan["days"]] == list(range(1, days_left + 1))
+    for day in plan["days"]:
+        blocks = day["blocks"]
+        assert blocks[0]["start"] == 0
+        assert all(block["end"] == following["start"] for block, following in zip(blocks, blocks[1:]))
+        assert sum(block["end"] - block["start"] for block in blocks) == hours_per_day * 60
+        assert blocks[-1]["kind"] != "break"
+        assert all(block["end"] - block["start"] == scheduler.BREAK_MINUTES
+                   for block in blocks if block["kind"] == "break")
+
+
+def test_same_inputs_give_the_same_plan():
+    assert catalog_plan(SUBJECTS[0], 5, 4) == catalog_plan(SUBJECTS[0], 5, 4)
+
+
+def test_high_priority_topics_get_more_time():
+    topics, high, _ = scheduler.plan_topics("Compiler Design", ANALYSIS)
+    plan = scheduler.schedule("Compiler Design", topics, high, 6, 4)
+    minutes = {entry["topic"]: entry["minutes"] for entry in plan["topics"]}
+
+    assert plan["priority_ranking"] == ["Topic 3", "Topic 7"]
+    normal = [value for topic, value in minutes.items() if topic not in high]
+    assert min(minutes[topic] for topic in high) > max(normal)
+
+
+def test_last_day_is_kept_for_review():
+    plan = catalog_plan(SUBJECTS[0], 4, 3)
+
+    assert {block["kind"] for block in plan["days"][-1]["blocks"]} <= {"review", "practice", "break"}
+    studied = {topic for day in plan["days"][:-1] for block in day["blocks"] if block["kind"] == "study"
+               for topic in block["topics"]}
+    reviewed = {topic for block in plan["days"][-1]["blocks"] if block["kind"] == "review"
+                for topic in block["topics"]}
+    assert reviewed == studied
+
+
+def test_topics_that_dont_fit_are_left_to_skim():
+    topics, high, _ = scheduler.plan_topics("Compiler Design", ANALYSIS)
+    plan = scheduler.schedule("Compiler Design", topics, high, 1, 2)
+    scheduled = {entry["topic"] for entry in plan["topics"]}
+
+    assert set(high) <= scheduled
+    assert scheduled | set(plan["skim"]) == set(topics)
+
+
+def test_plan_topics_needs_an_analysis_or_a_catalog_subject():
+    assert scheduler.plan_topics("Underwater Basket Weaving") is None
+    assert scheduler.plan_topics("Anything", {"all_topics": []}) is None
@@ -0,0 +1,131 @@
+"""Coalescing of concurrent identical model requests into one upstream call."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from resilience import UpstreamError
+from singleflight import FileLocks
+
+CALLERS = 10
+
+
+def test_concurrent_identical_requests_share_one_upstream_call(core, mock_llm):
+    mock_llm.config["latency"] = 0.3
+    before = core.inflight_requests.stats()
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = list(pool.map(lambda _: core.get_gemini_response("coalesce me", task="prompts"), range(CALLERS)))
+
+    after = core.inflight_requests.stats()
+    assert mock_llm.request_count == 1
+    assert len(set(results)) == 1
+    assert after["collapsed"] - before["collapsed"] == CALLERS - 1
+    assert after["in_flight"] == 0
+
+
+def test_different_prompts_are_not_coalesced(core, mock_llm):
+    mock_llm.config["latency"] = 0.1
+
+    with ThreadPoolExecutor(3) as pool:
+        results = list(pool.map(lambda n: core.get_gemini_response(f"distinct {n}", task="prompts"), range(3)))
+
+    assert mock_llm.request_count == 3
+    assert len(set(results)) == 3
+
+
+def test_upstream_error_reaches_every_waiter(core, mock_llm):
+    # 400 is not retried and "questions" has no fallback route, so exactly one request fails
+    mock_llm.config.update(latency=0.3, error_rate=1.0, error_status=400)
+
+    def call(_):
+        with pytest.raises(UpstreamError):
+            core.get_gemini_response("failing together", task="questions")
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        list(pool.map(call, range(CALLERS)))
+
+    assert mock_llm.request_count == 1
+    assert core.inflight_requests.stats()["in_flight"] == 0
+
+
+def test_concurrent_async_requests_share_one_upstream_call(core, mock_llm):
+    mock_llm.config["latency"] = 0.3
+
+    async def run():
+        return await asyncio.gather(*(core.async_get_gemini_response("coalesce async", task="prompts")
+                                      for _ in range(CALLERS)))
+
+    results = asyncio.run(run())
+
+    assert mock_llm.request_count == 1
+    assert len(set(results)) == 1
+
+
+def test_concurrent_streams_share_one_upstream_stream(core, mock_llm):
+    mock_llm.config.update(latency=0.2, token_delay=0.01)
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        texts = list(pool.map(lambda _: "".join(core.stream_gemini_response("coalesce stream", task="prompts")),
+                              range(CALLERS)))
+
+    assert mock_llm.request_count == 1
+    assert len(set(texts)) == 1 and texts[0]
+
+
+def test_call_and_stream_with_the_same_prompt_run_separately(core, mock_llm):
+    mock_llm.config.update(latency=0.3, token_delay=0.01)
+
+    with ThreadPoolExecutor(2) as pool:
+        answer = pool.submit(core.get_gemini_response, "called and streamed", task="prompts")
+        streamed = pool.submit(lambda: "".join(core.stream_gemini_response("called and streamed", task="prompts")))
+        answer, streamed = answer.result(), streamed.result()
+
+    assert answer and streamed
+    assert mock_llm.request_count == 2
+
+
+def test_async_call_and_stream_with_the_same_prompt_run_separately(core, mock_llm):
+    mock_llm.config.update(latency=0.3, token_delay=0.01)
+
+    async def run():
+        async def stream():
+            return "".join([chunk async for chunk in core.async_stream_gemini_response("mixed async", task="prompts")])
+        return await asyncio.gather(core.async_get_gemini_response("mixed async", task="prompts"), stream(),
+                                    core.async_get_gemini_response("mixed async", task="prompts"))
+
+    first, streamed, second = asyncio.run(run())
+
+    assert first and streamed and second == first
+    assert mock_llm.request_count == 2
+
+
+def test_file_lock_passes_from_holder_to_waiter_without_letting_a_newcomer_in(tmp_path):
+    locks = FileLocks(str(tmp_path), poll_interval=0.01)
+    waiter_holds, release_waiter = threading.Event(), threading.Event()
+    waited = []
+
+    def waiter():
+        with locks.hold("key") as was_held:
+            waited.append(was_held)
+            waiter_holds.set()
+            release_waiter.wait(5)
+
+    thread = threading.Thread(target=waiter)
+    with locks.hold("key") as was_held:
+        assert not was_held
+        thread.start()
+        time.sleep(0.1)
+    assert waiter_holds.wait(5)
+
+    # Another worker arriving now must wait for the waiter, not lock a file of its own
+    newcomer = FileLocks(str(tmp_path), max_wait=0.2, poll_interval=0.01)
+    with newcomer.hold("key") as was_held:
+        assert was_held
+    release_waiter.set()
+    thread.join(5)
+
+    assert waited == [True]
+    assert newcomer.stats()["timeouts"] == 1
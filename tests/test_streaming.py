@@ -0,0 +1,74 @@
+"""Streaming model output: incremental chunks, caching of the full text, and readers that stop early."""
+import asyncio
+import time
+
+
+def test_stream_yields_the_same_text_as_a_full_response(core):
+    chunks = list(core.stream_gemini_response("stream equals full", use_cache=False, task="prompts"))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == core.get_gemini_response("stream equals full", use_cache=False, task="prompts")
+
+
+def test_first_chunk_arrives_before_the_stream_ends(core, mock_llm):
+    mock_llm.config["token_delay"] = 0.02  # 20 tokens: 0.4s in all
+    started = time.perf_counter()
+    stream = core.stream_gemini_response("first chunk early", task="prompts")
+    next(stream)
+    first_chunk = time.perf_counter() - started
+    rest = list(stream)
+
+    assert rest
+    assert first_chunk < 0.2
+
+
+def test_completed_stream_is_cached(core, mock_llm):
+    text = "".join(core.stream_gemini_response("cache after stream", task="prompts"))
+    requests = mock_llm.request_count
+
+    assert core.response_cache.get(core.response_cache_key("cache after stream", "prompts")) == text
+    assert list(core.stream_gemini_response("cache after stream", task="prompts")) == [text]
+    assert mock_llm.request_count == requests
+
+
+def test_closing_a_stream_early_does_not_cut_off_other_readers(core, mock_llm):
+    mock_llm.config["token_delay"] = 0.02
+    expected = core.get_gemini_response("close early", use_cache=False, task="prompts")
+    requests = mock_llm.request_count
+
+    first = core.stream_gemini_response("close early", task="prompts")
+    next(first)
+    second = core.stream_gemini_response("close early", task="prompts")
+    first.close()
+
+    assert "".join(second) == expected
+    assert mock_llm.request_count == requests + 1
+    assert core.response_cache.get(core.response_cache_key("close early", "prompts")) == expected
+
+
+def test_cancelled_async_reader_does_not_cancel_the_shared_stream(core, mock_llm):
+    mock_llm.config["token_delay"] = 0.02
+    expected = core.get_gemini_response("cancel async", use_cache=False, task="prompts")
+    requests = mock_llm.request_count
+
+    async def read(received):
+        async for delta in core.async_stream_gemini_response("cancel async", task="prompts"):
+            received.append(delta)
+
+    async def run():
+        received = []
+        reader = asyncio.create_task(read(received))
+        while not received:
+            await asyncio.sleep(0.01)
+        other = []
+        other_reader = asyncio.create_task(read(other))
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        await other_reader
+        return received, other
+
+    received, other = asyncio.run(run())
+
+    assert "".join(received) != expected
+    assert "".join(other) == expected
+    assert mock_llm.request_count == requests + 1
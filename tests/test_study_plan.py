@@ -0,0 +1,65 @@
+"""Study plans with an uploaded syllabus: the pipelined stream ends with the same plan as the sequential path."""
+import asyncio
+
+import pytest
+
+import synthetic_pdf
+
+SUBJECT = "Operating Systems (OS)"
+ARGS = (SUBJECT, 5, 3, "Textbooks", "Detailed explanations")
+
+
+@pytest.fixture
+def syllabus(core, tmp_path):
+    core.response_cache.clear()
+    core.syllabus_analysis_cache.clear()
+    path = str(tmp_path / "syllabus.pdf")
+    synthetic_pdf.make_pdf(path, 2, lines_per_page=10)
+    return path
+
+
+def stream_plan(core, *args, **kwargs):
+    async def run():
+        return [text async for text in core.async_stream_study_plan(*args, **kwargs)]
+    return asyncio.run(run())
+
+
+def test_pipelined_plan_matches_the_sequential_plan(core, mock_llm, syllabus):
+    # The analysis takes longer than the first draft chunks, so the draft is shown first
+    mock_llm.config.update(latency=0.2, token_delay=0.01)
+
+    streamed = stream_plan(core, *ARGS, syllabus_file=syllabus)
+    assert streamed[0].startswith(core.DRAFT_PLAN_NOTICE)
+    assert "Topic 1" in streamed[-1] and not streamed[-1].startswith(core.DRAFT_PLAN_NOTICE)
+
+    core.response_cache.clear()
+    core.syllabus_analysis_cache.clear()
+    assert streamed[-1] == core.generate_study_plan(*ARGS, syllabus_file=syllabus)
+
+
+def test_draft_is_kept_when_the_syllabus_gives_nothing_to_analyze(core, mock_llm, tmp_path):
+    core.response_cache.clear()
+    # A page with nothing but its heading is too little text to analyze
+    short = str(tmp_path / "short.pdf")
+    synthetic_pdf.make_pdf(short, 1, lines_per_page=0)
+
+    streamed = stream_plan(core, *ARGS, syllabus_file=short)
+
+    assert streamed[-1] == core.generate_study_plan(*ARGS)
+    assert mock_llm.request_count == 1  # The draft; the plan then comes from the cache and nothing is analyzed
+
+
+def test_closing_the_stream_cancels_the_analysis(core, mock_llm, syllabus):
+    mock_llm.config.update(latency=0.5)
+
+    async def run():
+        stream = core.async_stream_study_plan(*ARGS, syllabus_file=syllabus)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return first, [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    first, pending = asyncio.run(run())
+    assert first.startswith(core.DRAFT_PLAN_NOTICE)
+    assert pending == []
+    assert not core.syllabus_analysis_cache.stats()["memory_entries"]
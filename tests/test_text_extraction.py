@@ -0,0 +1,121 @@
+"""Upload text extraction: the streaming DOCX reader and the PDF process pool."""
+import itertools
+import time
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import synthetic_pdf
+import text_extraction
+
+TRANSITIONAL = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+STRICT = "http://purl.oclc.org/ooxml/wordprocessingml/main"
+
+
+def write_docx(path, body, namespace=TRANSITIONAL):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/document.xml", f'<?xml version="1.0" encoding="UTF-8"?>'
+                                              f'<w:document xmlns:w="{namespace}"><w:body>{body}')
+    return str(path)
+
+
+def paragraph(*runs):
+    return "<w:p>" + "".join(f"<w:r>{run}</w:r>" for run in runs) + "</w:p>"
+
+
+def text(value):
+    return f'<w:t xml:space="preserve">{value}</w:t>'
+
+
+def cell(value):
+    return f"<w:tc>{paragraph(text(value))}</w:tc>"
+
+
+@pytest.mark.parametrize("namespace", [TRANSITIONAL, STRICT])
+def test_paragraphs_and_table_cells_come_in_document_order(tmp_path, namespace):
+    body = (paragraph(text("Syllabus"))
+            + "<w:tbl>" + "".join(f"<w:tr>{cell(f'Unit {row}')}{cell(f'Week {row}')}</w:tr>" for row in (1, 2))
+            + "</w:tbl>"
+            + paragraph(text("Part"), "<w:tab/>", text("one"), "<w:br/>", text("next line"))
+            + "<w:p/>"
+            + paragraph(text("End"))
+            + "</w:body></w:document>")
+    path = write_docx(tmp_path / "syllabus.docx", body, namespace)
+
+    assert list(text_extraction.iter_docx_paragraphs(path)) == [
+        "Syllabus", "Unit 1", "Week 1", "Unit 2", "Week 2", "Part\tone\nnext line", "End"]
+
+
+def test_reading_stops_at_the_budget(tmp_path):
+    # Well-formed for far longer than the budget, then broken: only a full read reaches the error
+    body = "".join(paragraph(text(f"Topic {n} covers trees and graphs.")) for n in range(5000)) + "<w:p><broken"
+    path = write_docx(tmp_path / "long.docx", body)
+
+    assert list(itertools.islice(text_extraction.iter_docx_paragraphs(path), 2)) == [
+        "Topic 0 covers trees and graphs.", "Topic 1 covers trees and graphs."]
+    extracted = text_extraction.extract_text(path, max_chars=200)
+    assert extracted.startswith("Topic 0 covers") and extracted.endswith("... [truncated]")
+    with pytest.raises(ValueError):
+        list(text_extraction.iter_docx_paragraphs(path))
+
+
+def test_files_that_are_not_docx_are_rejected(tmp_path):
+    not_zip = tmp_path / "notes.docx"
+    not_zip.write_text("plain text")
+    no_document = tmp_path / "empty.docx"
+    with zipfile.ZipFile(no_document, "w") as archive:
+        archive.writestr("word/styles.xml", "<styles/>")
+
+    for path in (not_zip, no_document):
+        with pytest.raises(ValueError):
+            list(text_extraction.iter_docx_paragraphs(str(path)))
+
+
+def nap(seconds):
+    """Pool job standing in for a PDF that takes this long to parse"""
+    time.sleep(seconds)
+    return seconds
+
+
+def stuck_pages(file_path, start, stop):
+    """Pool job standing in for extract_pdf_pages on a PDF the parser gets stuck on"""
+    time.sleep(3)
+    return [], 0
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(text_extraction, "EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(text_extraction, "_pool", None)
+
+
+def test_timed_out_extraction_retires_the_pool(fresh_pool, monkeypatch, tmp_path):
+    path = str(tmp_path / "notes.pdf")
+    synthetic_pdf.make_pdf(path, 2, lines_per_page=5)
+    extract_pdf_pages = text_extraction.extract_pdf_pages
+    monkeypatch.setattr(text_extraction, "extract_pdf_pages", stuck_pages)
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(text_extraction.iter_pdf_pages_parallel(path, timeout=1.0))
+    assert time.monotonic() - started < 2.5
+    assert text_extraction._pool is None
+
+    # The next upload gets a new pool rather than queueing behind the stuck worker
+    monkeypatch.setattr(text_extraction, "extract_pdf_pages", extract_pdf_pages)
+    pages = list(text_extraction.iter_pdf_pages_parallel(path, timeout=10))
+    assert len(pages) == 2 and pages[0].startswith("Chapter 1")
+
+
+def test_retired_pool_finishes_other_jobs_then_kills_the_stuck_one(fresh_pool):
+    pool, quick = text_extraction.submit_extraction(nap, 0.5)
+    same_pool, stuck = text_extraction.submit_extraction(nap, 60)
+    assert same_pool is pool
+
+    text_extraction.retire_extraction_pool(pool, drain_timeout=5.0)
+
+    assert quick.result(timeout=10) == 0.5
+    with pytest.raises(BrokenProcessPool):
+        stuck.result(timeout=10)
+    assert text_extraction.submit_extraction(nap, 0)[0] is not pool
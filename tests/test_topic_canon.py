@@ -0,0 +1,36 @@
+"""Topic spellings share a cached answer, while the model sees the topic as the student typed it."""
+import asyncio
+
+SUBJECT = "Data Structures & Algorithms (DSA)"
+
+
+def test_prompt_keeps_the_typed_topic(core):
+    prompt = core.build_smart_prompts_prompt(SUBJECT, "  Kruskal's algorithm ")
+
+    assert "'Kruskal's algorithm'" in prompt
+    assert core.canonical_topic(SUBJECT, "Kruskal's algorithm") not in prompt
+
+
+def test_spellings_share_one_cache_key(core):
+    keys = {core.response_cache_key(core.build_smart_prompts_prompt(SUBJECT, topic), "prompts")
+            for topic in ("Binary Trees", "binary-tree", "binary trees basics")}
+    other = core.response_cache_key(core.build_smart_prompts_prompt(SUBJECT, "Linked lists"), "prompts")
+
+    assert len(keys) == 1
+    assert other not in keys
+
+
+def test_practice_questions_prompt_keeps_the_typed_topic(core):
+    prompt = asyncio.run(core.async_build_practice_questions_prompt(SUBJECT, "Binary Trees"))
+
+    assert "Binary Trees" in prompt
+    assert core.response_cache_key(prompt, "questions") == core.response_cache_key(
+        core.build_practice_questions_prompt(SUBJECT, "binary-tree"), "questions")
+
+
+def test_second_spelling_is_answered_from_the_cache(core, mock_llm):
+    first = core.get_gemini_response(core.build_smart_prompts_prompt(SUBJECT, "Hash Tables"), task="prompts")
+    second = core.get_gemini_response(core.build_smart_prompts_prompt(SUBJECT, "hash-table"), task="prompts")
+
+    assert second == first
+    assert mock_llm.request_count == 1
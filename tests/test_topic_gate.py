@@ -0,0 +1,48 @@
+"""The topic gate against the labeled requests in benchmarks/topic_labels.csv."""
+import csv
+import os
+
+import pytest
+
+import topic_gate
+
+LABELS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "topic_labels.csv")
+
+with open(LABELS, newline="", encoding="utf-8") as f:
+    STUDY = [(row["subject"], row["topic"]) for row in csv.DictReader(f) if row["label"] == "study"]
+
+
+@pytest.mark.parametrize("subject, topic", STUDY)
+def test_study_requests_are_allowed(subject, topic):
+    assert topic_gate.is_study_topic(subject, topic or None)
+
+
+@pytest.mark.parametrize("subject, topic", [
+    ("Data Structures & Algorithms (DSA)", "Traveling salesman problem"),
+    ("Software Engineering", "Third-party libraries"),
+    ("Theory of Computation", "Cook-Levin theorem"),
+    ("Machine Learning (ML)", "Pie charts and histograms"),
+    ("Machine Learning (ML)", "Movie recommendation system"),
+    ("Machine Learning (ML)", "Movie recommender"),
+    ("Machine Learning (ML)", "Fashion MNIST"),
+    ("Data Structures & Algorithms (DSA)", "Flight itinerary reconstruction"),
+    ("Operating Systems (OS)", "Holiday"),
+])
+def test_curriculum_topics_with_blocklisted_words_are_allowed(subject, topic):
+    assert topic_gate.is_study_topic(subject, topic)
+
+
+def test_study_subject_admits_any_topic():
+    assert topic_gate.classify("Operating Systems (OS)", "Best pizza toppings") == (True, "subject")
+    assert topic_gate.classify("Physics", "Movie night snacks") == (True, "subject")
+
+
+@pytest.mark.parametrize("subject, topic", [
+    ("Cooking", "Chocolate cake recipe"),
+    ("Weekend", "Best pizza toppings"),
+    ("Random", "Movie night snacks"),
+])
+def test_off_topic_requests_are_rejected(subject, topic):
+    allowed, reason = topic_gate.classify(subject, topic)
+    assert not allowed
+    assert reason
@@ -0,0 +1,391 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+
+from metrics import REGISTRY, annotate
+from response_cache import ResponseCache
+
+# Character budget for text sent to the API
+MAX_CHARS = 12000
+
+# TXT files are read in blocks of this many characters
+TEXT_BLOCK_CHARS = 64 * 1024
+
+WHITESPACE = re.compile(r'\s+')
+
+# Upload limits: larger files are rejected, pages past the limit are ignored
+MAX_UPLOAD_BYTES = int(os.environ.get("CODELALA_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.environ.get("CODELALA_MAX_PDF_PAGES", "500"))
+# Uncompressed size limit of a DOCX's document.xml, against zip bombs
+MAX_DOCX_XML_BYTES = int(os.environ.get("CODELALA_MAX_DOCX_XML_BYTES", str(512 * 1024 * 1024)))
+
+# PDF parsing is CPU-bound pure Python, so it runs on a bounded process pool
+# instead of the request thread. 0 workers parses in-process.
+EXTRACTION_WORKERS = int(os.environ.get("CODELALA_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_TIMEOUT = float(os.environ.get("CODELALA_EXTRACTION_TIMEOUT", "30"))
+PAGES_PER_JOB = 8
+
+# Bump when extraction or normalization changes so stale cached text is not reused
+EXTRACTOR_VERSION = 2
+
+# Extracted, normalized text keyed by the content hash of the uploaded bytes.
+# Set CODELALA_EXTRACTION_DB to an empty string to keep it in memory only.
+extraction_cache = ResponseCache(
+    max_entries=128,
+    ttl=int(os.environ.get("CODELALA_EXTRACTION_TTL", str(90 * 24 * 3600))),
+    db_path=os.environ.get("CODELALA_EXTRACTION_DB", os.path.join("cache", "extracted_text.sqlite3")) or None
+)
+
+EXTRACTIONS = REGISTRY.counter(
+    "codelala_extractions_total", "Uploaded files extracted, by type and whether the text was cached",
+    ("file_type", "cached"))
+EXTRACTION_SECONDS = REGISTRY.histogram(
+    "codelala_extraction_parse_seconds", "Time spent parsing uploaded files (cache misses)", ("file_type",))
+EXTRACTION_PAGES = REGISTRY.counter(
+    "codelala_extraction_pages_total", "PDF pages parsed", ("file_type",))
+EXTRACTION_TRUNCATED = REGISTRY.counter(
+    "codelala_extraction_truncated_total", "Extractions cut off at the character budget", ("file_type",))
+
+_stats_lock = threading.Lock()
+_stats = {
+    "files": 0,
+    "cache_hits": 0,
+    "parsed": 0,
+    "parse_seconds": 0.0,
+    "max_parse_seconds": 0.0,
+}
+
+
+def file_path_of(file):
+    """Gradio hands us either a tempfile wrapper or a plain path"""
+    return file.name if hasattr(file, 'name') else file
+
+
+def file_sha256(file):
+    """SHA-256 of an uploaded file's bytes"""
+    digest = hashlib.sha256()
+    with open(file_path_of(file), 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_pdf_pages(file_path, max_pages=MAX_PDF_PAGES):
+    """Yield the text of each PDF page in order"""
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        for page_num, page in enumerate(pdf_reader.pages):
+            if page_num >= max_pages:
+                break
+            yield page.extract_text() or ""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# pool -> its jobs that are not done yet, so a retired pool is only shut down once they are
+_inflight = {}
+
+
+def submit_extraction(function, *args):
+    """Submit a job to the process pool shared by all extractions (created on first use); returns (pool, future)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the web server process is multi-threaded
+            _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        pool = _pool
+        future = pool.submit(function, *args)
+        _inflight.setdefault(pool, set()).add(future)
+    future.add_done_callback(lambda done: _job_done(pool, done))
+    return pool, future
+
+
+def _job_done(pool, future):
+    with _pool_lock:
+        _inflight.get(pool, set()).discard(future)
+
+
+def retire_extraction_pool(pool, drain_timeout=EXTRACTION_TIMEOUT):
+    """Stop giving jobs to pool, then kill its workers once the jobs already on it are done.
+
+    Used when a job timed out: its worker may be stuck on a pathological
+    PDF and can only be stopped by killing it, but other extractions'
+    jobs on the pool are left to finish (for up to drain_timeout, the
+    longest they may run). Later jobs go to a new pool, created on demand.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    threading.Thread(target=_drain_pool, args=(pool, drain_timeout), name="extraction-pool-drain",
+                     daemon=True).start()
+
+
+def _drain_pool(pool, timeout):
+    with _pool_lock:
+        jobs = set(_inflight.get(pool, ()))
+    wait(jobs, timeout=timeout)
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+    with _pool_lock:
+        _inflight.pop(pool, None)
+
+
+def extract_pdf_pages(file_path, start, stop):
+    """Pool job: whitespace-collapsed text of pages [start, stop) and the document's page count"""
+    import PyPDF2
+    with open(file_path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        total = len(pdf_reader.pages)
+        texts = [WHITESPACE.sub(' ', pdf_reader.pages[i].extract_text() or "")
+                 for i in range(start, min(stop, total))]
+    return texts, total
+
+
+def iter_pdf_pages_parallel(file_path, max_pages=MAX_PDF_PAGES, timeout=EXTRACTION_TIMEOUT):
+    """Yield PDF page texts in order, parsed in page batches on the process pool.
+
+    The first batch runs alone (most documents hit the character budget
+    within it); after that up to EXTRACTION_WORKERS batches are parsed in
+    parallel. Closing the generator cancels batches that were not started.
+    """
+    deadline = time.monotonic() + timeout
+
+    def result(job):
+        pool, future = job
+        try:
+            return future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FuturesTimeoutError:
+            retire_extraction_pool(pool)
+            raise TimeoutError(f"PDF extraction took longer than {timeout:g} seconds")
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start fresh next time
+            retire_extraction_pool(pool)
+            raise
+
+    texts, total = result(submit_extraction(extract_pdf_pages, file_path, 0, min(PAGES_PER_JOB, max_pages)))
+    total = min(total, max_pages)
+    yield from texts
+
+    pending = deque()
+    next_start = PAGES_PER_JOB
+    try:
+        while True:
+            while next_start < total and len(pending) < EXTRACTION_WORKERS:
+                pending.append(submit_extraction(extract_pdf_pages, file_path, next_start,
+                                                 min(next_start + PAGES_PER_JOB, total)))
+                next_start += PAGES_PER_JOB
+            if not pending:
+                break
+            texts, _ = result(pending.popleft())
+            yield from texts
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def iter_docx_paragraphs(file_path, max_xml_bytes=MAX_DOCX_XML_BYTES):
+    """Yield the text of each paragraph in a DOCX body, streamed out of the zip.
+
+    word/document.xml is decompressed and parsed incrementally, and every
+    paragraph (and top-level table) is cleared and detached once read, so
+    memory stays constant however long the document is, and closing the
+    generator stops reading. Tabs and line breaks are kept as whitespace.
+    Handles both transitional and strict OOXML namespaces.
+    """
+    from xml.etree.ElementTree import ParseError, iterparse
+
+    try:
+        archive = zipfile.ZipFile(file_path)
+    except zipfile.BadZipFile:
+        raise ValueError("Not a valid DOCX file (it is not a zip archive)")
+    with archive:
+        try:
+            member = archive.getinfo("word/document.xml")
+        except KeyError:
+            raise ValueError("Not a valid DOCX file (word/document.xml is missing)")
+        if member.file_size > max_xml_bytes:
+            raise ValueError(f"DOCX document is too large ({member.file_size / 1024 / 1024:.0f} MB uncompressed)")
+
+        with archive.open(member) as xml:
+            stack = []
+            try:
+                for event, element in iterparse(xml, events=("start", "end")):
+                    if event == "start":
+                        stack.append(element)
+                        continue
+                    stack.pop()
+                    name = element.tag.rpartition("}")[2]
+                    if name == "p":
+                        parts = []
+                        for node in element.iter():
+                            kind = node.tag.rpartition("}")[2]
+                            if kind == "t" and node.text:
+                                parts.append(node.text)
+                            elif kind == "tab":
+                                parts.append("\t")
+                            elif kind in ("br", "cr"):
+                                parts.append("\n")
+                        if parts:
+                            yield "".join(parts)
+                    elif len(stack) != 2:
+                        # Runs and cells are read with their paragraph; only body-level blocks are dropped here
+                        continue
+                    # stack is [document, body, ...]: detach what has been read from its parent
+                    element.clear()
+                    if stack:
+                        stack[-1].remove(element)
+            except ParseError as e:
+                raise ValueError(f"Not a valid DOCX file ({e})")
+
+
+def iter_raw_chunks(file_path, file_type, info=None):
+    """Lazily yield raw text chunks (PDF pages, TXT blocks) according to the file type.
+
+    If info is given, the number of PDF pages parsed is counted into info["pages"].
+    """
+    if file_type == '.pdf':
+        pages = iter_pdf_pages_parallel(file_path) if EXTRACTION_WORKERS > 0 else iter_pdf_pages(file_path)
+        for page_text in pages:
+            if info is not None:
+                info["pages"] = info.get("pages", 0) + 1
+            yield page_text
+            yield "\n"
+
+    elif file_type == '.txt':
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            for block in iter(lambda: f.read(TEXT_BLOCK_CHARS), ''):
+                yield block
+
+    elif file_type == '.docx':
+        for paragraph in iter_docx_paragraphs(file_path):
+            yield paragraph
+            yield "\n"
+
+
+def iter_normalized_chunks(raw_chunks):
+    """Collapse whitespace across chunk boundaries.
+
+    Joining the output gives the same text as collapsing whitespace over the
+    concatenated input and stripping it, without building that input first.
+    """
+    started = False
+    pending_space = False
+    for chunk in raw_chunks:
+        if not chunk:
+            continue
+        body = WHITESPACE.sub(' ', chunk).strip()
+        if not body:
+            pending_space = True
+            continue
+        if started and (pending_space or chunk[0].isspace()):
+            yield ' '
+        yield body
+        started = True
+        pending_space = chunk[-1].isspace()
+
+
+def collect_text(chunks, max_chars=MAX_CHARS):
+    """Join normalized chunks into a list buffer, stopping as soon as the budget is hit"""
+    parts = []
+    length = 0
+    truncated = False
+    for chunk in chunks:
+        if length + len(chunk) > max_chars:
+            parts.append(chunk[:max_chars - length])
+            truncated = True
+            break
+        parts.append(chunk)
+        length += len(chunk)
+
+    text = "".join(parts)
+    if truncated:  # Truncate if too long for the API
+        text += "... [truncated]"
+    return text
+
+
+def extract_text_with_info(file, file_type=None, max_chars=MAX_CHARS, file_hash=None):
+    """Extract normalized text from an uploaded file, parsing only on a cache miss.
+
+    Returns (text, info) where info reports the file hash, whether the text
+    came from the cache, and how long parsing took.
+    """
+    file_path = file_path_of(file)
+    file_size = os.path.getsize(file_path)
+    if file_size > MAX_UPLOAD_BYTES:
+        raise ValueError(f"File is too large ({file_size / 1024 / 1024:.1f} MB); "
+                         f"the limit is {MAX_UPLOAD_BYTES / 1024 / 1024:.0f} MB")
+    if file_type is None:
+        file_type = os.path.splitext(file_path)[1].lower()
+    if file_hash is None:
+        file_hash = file_sha256(file_path)
+
+    cache_key = f"{file_hash}:{file_type}:{max_chars}:v{EXTRACTOR_VERSION}"
+    info = {"file_hash": file_hash, "file_type": file_type, "cached": False, "parse_seconds": 0.0}
+
+    text = extraction_cache.get(cache_key)
+    if text is not None:
+        info["cached"] = True
+        info["chars"] = len(text)
+        info["truncated"] = text.endswith("... [truncated]")
+        _record(info)
+        return text, info
+
+    started = time.perf_counter()
+    # Pages are only parsed until the character budget is reached
+    text = collect_text(iter_normalized_chunks(iter_raw_chunks(file_path, file_type, info)), max_chars)
+    info["parse_seconds"] = time.perf_counter() - started
+    info["chars"] = len(text)
+    info["truncated"] = text.endswith("... [truncated]")
+
+    extraction_cache.set(cache_key, text)
+    _record(info)
+    return text, info
+
+
+def extract_text(file, file_type=None, max_chars=MAX_CHARS, file_hash=None):
+    """Extract normalized text from an uploaded file (PDF, TXT, DOCX)"""
+    return extract_text_with_info(file, file_type, max_chars, file_hash)[0]
+
+
+def _record(info):
+    file_type = info["file_type"]
+    EXTRACTIONS.inc(file_type=file_type, cached=info["cached"])
+    if not info["cached"]:
+        EXTRACTION_SECONDS.observe(info["parse_seconds"], file_type=file_type)
+        EXTRACTION_PAGES.inc(info.get("pages", 0), file_type=file_type)
+    if info["truncated"]:
+        EXTRACTION_TRUNCATED.inc(file_type=file_type)
+    annotate(extracted_files=1, extracted_chars=info["chars"], pages_parsed=info.get("pages", 0),
+             extraction_cached=info["cached"], extraction_truncated=info["truncated"],
+             parse_seconds=round(info["parse_seconds"], 6))
+
+    with _stats_lock:
+        _stats["files"] += 1
+        if info["cached"]:
+            _stats["cache_hits"] += 1
+        else:
+            _stats["parsed"] += 1
+            _stats["parse_seconds"] += info["parse_seconds"]
+            _stats["max_parse_seconds"] = max(_stats["max_parse_seconds"], info["parse_seconds"])
+
+
+def extraction_stats():
+    """Aggregate extraction counters: cache hit rate and parse times"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["hit_rate"] = stats["cache_hits"] / stats["files"] if stats["files"] else 0.0
+    stats["avg_parse_seconds"] = stats["parse_seconds"] / stats["parsed"] if stats["parsed"] else 0.0
+    return stats
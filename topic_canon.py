@@ -0,0 +1,162 @@
+import re
+import threading
+from functools import lru_cache
+
+# Canonical topic -> spellings students use for it, per catalog subject. Aliases
+# are compared after canonicalization, so case, hyphens and plurals don't need listing.
+TOPIC_ALIASES = {
+    "Data Structures & Algorithms (DSA)": {
+        "binary tree": ["bt", "binarytree"],
+        "binary search tree": ["bst"],
+        "dynamic programming": ["dp", "dynamic programing"],
+        "linked list": ["ll", "linkedlist"],
+        "hash table": ["hashmap", "hash map", "hashtable"],
+        "big o notation": ["big o", "asymptotic notation", "time complexity"],
+        "graph traversal": ["bfs and dfs", "dfs and bfs", "bfs dfs"],
+        "priority queue": ["heap and priority queue", "priority queues and heaps"],
+    },
+    "Operating Systems (OS)": {
+        "cpu scheduling": ["process scheduling", "scheduling algorithm", "cpu scheduling algorithm"],
+        "page replacement": ["page replacement algorithm"],
+        "virtual memory": ["vm"],
+        "deadlock": ["deadlock handling"],
+        "inter process communication": ["ipc", "interprocess communication"],
+    },
+    "Database Management Systems (DBMS)": {
+        "normalization": ["normalisation", "normal form", "database normalization"],
+        "sql join": ["join", "joins in sql"],
+        "acid property": ["acid"],
+        "er diagram": ["entity relationship diagram", "er model", "erd"],
+        "b+ tree": ["b plus tree", "b+tree"],
+    },
+    "Computer Networks (CN)": {
+        "osi model": ["osi layer", "osi reference model"],
+        "subnetting": ["subnet", "subnet mask"],
+        "dns": ["domain name system"],
+        "tcp congestion control": ["congestion control", "tcp congestion"],
+    },
+    "Machine Learning (ML)": {
+        "support vector machine": ["svm"],
+        "neural network": ["nn", "neural net", "ann"],
+        "k means clustering": ["k mean", "kmean"],
+        "overfitting": ["over fitting", "overfit"],
+    },
+    "Web Development": {
+        "rest api": ["rest", "restful api"],
+        "css flexbox": ["flexbox", "flex box"],
+        "react hook": ["hook in react"],
+    },
+    "Software Engineering": {
+        "sdlc": ["software development life cycle", "software development lifecycle"],
+        "unit testing": ["unit test"],
+    },
+    "Artificial Intelligence": {
+        "a* search": ["a star", "a star search", "a*"],
+        "minimax": ["min max", "minimax algorithm"],
+        "alpha beta pruning": ["alpha beta"],
+    },
+    "Theory of Computation": {
+        "dfa": ["deterministic finite automaton", "deterministic finite automata"],
+        "nfa": ["non deterministic finite automaton", "nondeterministic finite automata"],
+        "turing machine": ["tm"],
+        "context free grammar": ["cfg"],
+    },
+    "Computer Architecture": {
+        "pipelining": ["pipeline", "instruction pipelining"],
+        "risc vs cisc": ["risc and cisc", "cisc vs risc"],
+        "cache memory": ["cache"],
+    },
+}
+
+# Words that don't change what the topic is about
+ARTICLES = {"a", "an", "the"}
+LEADING_FILLER = {"intro", "introduction", "to", "what", "is", "are", "explain", "about", "basics", "of",
+                  "overview", "fundamentals"}
+TRAILING_FILLER = {"basics", "basic", "fundamentals", "overview", "introduction", "intro", "explained",
+                   "concept", "tutorial"}
+# Singular words that look plural
+NOT_PLURAL = {"series", "species", "news", "bus", "gas", "lens", "analysis", "basis", "axis", "chaos", "dns",
+              "os", "ios", "https", "aws", "css"}
+TOKEN = re.compile(r"[a-z0-9+*#]+")
+
+
+def singular(word):
+    """Plural noun -> singular, by rule"""
+    if len(word) <= 3 or word in NOT_PLURAL or word.endswith(("ss", "us", "is", "ics")) or not word.endswith("s"):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    return word[:-1]
+
+
+def clean(topic):
+    """Case-folded, punctuation-free, singular topic without filler words"""
+    words = [singular(word) for word in TOKEN.findall(topic.lower().replace("&", " and "))
+             if word not in ARTICLES]
+    while len(words) > 1 and words[0] in LEADING_FILLER:
+        words.pop(0)
+    while len(words) > 1 and words[-1] in TRAILING_FILLER:
+        words.pop()
+    return " ".join(words)
+
+
+def build_alias_lookup(aliases):
+    """{subject: {cleaned alias or canonical topic: canonical topic}}"""
+    lookup = {}
+    for subject, topics in aliases.items():
+        table = lookup.setdefault(subject, {})
+        for canonical, spellings in topics.items():
+            for spelling in [canonical] + spellings:
+                table[clean(spelling)] = canonical
+    return lookup
+
+
+ALIAS_LOOKUP = build_alias_lookup(TOPIC_ALIASES)
+
+
+@lru_cache(maxsize=8192)
+def canonical_topic(subject, topic):
+    """The canonical form of a free-text topic: its catalog name if it is a known alias, otherwise the cleaned text"""
+    cleaned = clean(topic)
+    if not cleaned:
+        return topic.strip()
+    return ALIAS_LOOKUP.get(subject, {}).get(cleaned, cleaned)
+
+
+class NearestTopic:
+    """Maps free-text topics to the most similar catalog topic of their subject by embedding similarity.
+
+    Topics whose best cosine similarity is below threshold are left as they are.
+    """
+
+    def __init__(self, embedder, threshold, aliases=TOPIC_ALIASES):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.aliases = aliases
+        self._vectors = {}  # subject -> (canonical topics, normalized embedding matrix)
+        self._matches = {}
+        self._lock = threading.Lock()
+
+    def _catalog(self, subject):
+        if subject not in self._vectors:
+            topics = list(self.aliases.get(subject, {}))
+            self._vectors[subject] = (topics, self.embedder.encode(topics) if topics else None)
+        return self._vectors[subject]
+
+    def match(self, subject, topic):
+        """The closest catalog topic, or topic itself if none is similar enough"""
+        with self._lock:
+            if (subject, topic) in self._matches:
+                return self._matches[(subject, topic)]
+            topics, vectors = self._catalog(subject)
+            match = topic
+            if topics:
+                scores = vectors @ self.embedder.encode([topic])[0]
+                best = int(scores.argmax())
+                if scores[best] >= self.threshold:
+                    match = topics[best]
+            if len(self._matches) < 65536:
+                self._matches[(subject, topic)] = match
+            return match
@@ -0,0 +1,185 @@
+import re
+from functools import lru_cache
+
+# Abbreviations and alternative spellings, rewritten before matching
+SYNONYMS = {
+    "dsa": "data structure algorithm", "ds": "data structure", "algo": "algorithm", "algos": "algorithm",
+    "os": "operating system", "dbms": "database", "rdbms": "relational database", "db": "database",
+    "cn": "computer network", "ml": "machine learning", "ai": "artificial intelligence", "dl": "deep learning",
+    "nn": "neural network", "cnn": "neural network", "rnn": "neural network", "llm": "language model",
+    "nlp": "natural language processing", "dp": "dynamic programming", "oop": "object oriented",
+    "oops": "object oriented", "toc": "theory of computation", "coa": "computer architecture",
+    "se": "software engineering", "js": "javascript", "ts": "typescript", "maths": "mathematics",
+    "math": "mathematics", "stats": "statistics", "dfs": "graph search", "bfs": "graph search",
+    "ipc": "process communication", "cpp": "c++", "vm": "virtual memory",
+}
+
+# Study vocabulary: the original keyword list, the catalog subjects' core terms and other academic subjects
+STUDY_TERMS = (
+    # Computer science / IT
+    "algorithm", "data structure", "programming", "program", "software", "database", "operating system",
+    "network", "machine learning", "artificial intelligence", "web", "development", "computation",
+    "architecture", "compiler", "memory", "process", "thread", "sql", "query", "normalization", "index",
+    "transaction", "protocol", "routing", "encryption", "security", "api", "interface", "computer",
+    "array", "linked list", "stack", "queue", "tree", "graph", "heap", "hashing", "hash table", "sorting",
+    "searching", "recursion", "dynamic programming", "greedy", "backtracking", "complexity", "binary search",
+    "trie", "dijkstra", "pointer", "scheduling", "deadlock", "semaphore", "mutex", "paging", "segmentation",
+    "virtual memory", "kernel", "file system", "cpu", "synchronization", "concurrency", "interrupt", "cache",
+    "relational", "schema", "er diagram", "join", "acid", "primary key", "foreign key", "nosql", "tcp", "udp",
+    "ip address", "http", "dns", "osi", "subnet", "router", "ethernet", "congestion", "packet", "socket",
+    "regression", "classification", "clustering", "neural network", "deep learning", "gradient descent",
+    "overfitting", "dataset", "supervised", "unsupervised", "reinforcement learning", "heuristic",
+    "transformer", "language model", "natural language processing", "decision tree", "html", "css",
+    "javascript", "typescript", "react", "frontend", "backend", "rest", "dom", "server", "testing", "agile",
+    "scrum", "uml", "requirement", "sdlc", "refactoring", "design pattern", "version control", "git",
+    "automata", "automaton", "dfa", "nfa", "regular expression", "grammar", "turing machine", "pumping lemma",
+    "decidability", "context free", "pipeline", "instruction set", "register", "alu", "microprocessor",
+    "assembly", "risc", "cisc", "python", "java", "c++", "object oriented", "inheritance", "polymorphism",
+    "encapsulation", "variable", "loop", "recursion", "graph search", "cloud", "distributed system",
+    "traveling salesman", "knapsack", "np complete", "np hard", "satisfiability", "cook levin", "library",
+    "framework", "package", "dependency", "histogram", "chart", "plot", "visualization", "actor model",
+    "game theory", "forecasting",
+    # Mathematics
+    "calculus", "algebra", "geometry", "statistics", "probability", "theorem", "equation", "function",
+    "matrix", "vector", "differential", "integral", "mathematics", "discrete mathematics", "logic",
+    "set theory", "combinatorics", "permutation", "number theory", "derivative", "trigonometry", "proof",
+    # Other academic subjects
+    "physics", "chemistry", "biology", "economics", "history", "geography", "electronics", "electrical",
+    "mechanical", "thermodynamics", "mechanics", "circuit", "signal", "accounting", "engineering",
+    "kinematics", "optics", "waves", "organic", "genetics",
+    # General academic
+    "theory", "concept", "principle", "law", "formula", "method", "analysis", "design", "evaluation",
+    "research", "study", "experiment", "model", "exam", "syllabus", "chapter", "lecture", "revision",
+    "homework", "assignment", "definition",
+)
+
+# Clearly off-topic requests that would otherwise reach the model. Words that also
+# name curriculum topics ("travel" in traveling salesman, "party" in third-party,
+# "pie" in pie charts) are left out; stemming makes "cooking" match "Cook" as well,
+# so Cook-Levin is listed as a study term to outweigh it.
+OFF_TOPIC_TERMS = (
+    "recipe", "cooking", "baking", "pizza", "pasta", "burger", "cake", "dessert",
+    "restaurant", "cuisine", "movie", "tv show", "netflix", "celebrity", "actress", "singer",
+    "song", "lyrics", "dating", "girlfriend", "boyfriend", "horoscope", "astrology", "zodiac", "fashion",
+    "outfit", "makeup", "shopping", "coupon", "vacation", "holiday", "hotel", "tourism", "flight",
+    "football", "soccer", "cricket", "basketball", "nba", "ipl", "fifa", "video game",
+    "fortnite", "minecraft", "pubg", "joke", "meme", "prank", "gossip", "lottery", "betting", "gambling",
+    "casino", "lawn", "gardening", "wedding", "birthday",
+)
+
+WORD = re.compile(r"[a-z0-9+#]+")
+# Short words are too easy to confuse with one edit ("law"/"lawn"), so only longer ones are fuzzy-matched
+FUZZY_MIN_LENGTH = 5
+
+
+def stem(word):
+    """Light suffix stripping (plurals, -ing/-ed, -ization) so inflected forms share a stem"""
+    if len(word) <= 3:
+        return word
+    if word.endswith("sses"):
+        word = word[:-2]
+    elif word.endswith("ies") and len(word) > 4:
+        word = word[:-3] + "y"
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix, replacement in (("ization", "ize"), ("ation", "ate"), ("ing", ""), ("ed", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement
+            # "programming" -> "programm" -> "program"
+            if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "lsz":
+                word = word[:-1]
+            break
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def normalize(text):
+    """Lowercase, expand synonyms and stem; returns the list of stemmed tokens"""
+    tokens = []
+    for token in WORD.findall(text.lower()):
+        tokens.extend(SYNONYMS.get(token, token).split())
+    return [stem(token) for token in tokens]
+
+
+def deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def compile_terms(terms):
+    """A word-boundary regex over stemmed text matching any of terms, and the set of single-word stems"""
+    phrases = sorted({" ".join(normalize(term)) for term in terms}, key=len, reverse=True)
+    pattern = re.compile(r"(?<![\w+#])(?:" + "|".join(re.escape(phrase) for phrase in phrases) + r")(?![\w+#])")
+    return pattern, {phrase for phrase in phrases if " " not in phrase}
+
+
+STUDY_PATTERN, STUDY_WORDS = compile_terms(STUDY_TERMS)
+OFF_TOPIC_PATTERN, OFF_TOPIC_WORDS = compile_terms(OFF_TOPIC_TERMS)
+
+# Deletion index of the study words (symmetric delete spelling correction): two words
+# within one edit of each other share a deletion variant
+FUZZY_INDEX = {}
+for _word in STUDY_WORDS:
+    if len(_word) >= FUZZY_MIN_LENGTH:
+        for _variant in deletions(_word) | {_word}:
+            FUZZY_INDEX.setdefault(_variant, _word)
+del _word, _variant
+
+
+def correct(token):
+    """The study word within one edit of token, or token itself"""
+    if len(token) < FUZZY_MIN_LENGTH or token in STUDY_WORDS or token in OFF_TOPIC_WORDS:
+        return token
+    if token in FUZZY_INDEX:
+        return FUZZY_INDEX[token]
+    for variant in deletions(token):
+        if variant in FUZZY_INDEX:
+            return FUZZY_INDEX[variant]
+    return token
+
+
+def count_terms(text):
+    """(study term matches, off-topic term matches) in text"""
+    if not text:
+        return 0, 0
+    tokens = normalize(text)
+    stemmed = " ".join(tokens)
+    off_topic = len(OFF_TOPIC_PATTERN.findall(stemmed))
+    study = len(STUDY_PATTERN.findall(stemmed))
+    if not study and not off_topic:
+        # Only misspelled text needs the slower fuzzy pass; it isn't allowed to
+        # outweigh an off-topic word ("snacks" is one edit from "stack")
+        study = len(STUDY_PATTERN.findall(" ".join(correct(token) for token in tokens)))
+    return study, off_topic
+
+
+@lru_cache(maxsize=4096)
+def classify(subject, topic=None):
+    """(allowed, reason) for a request about topic within subject; topic is None for subject-only requests
+
+    A study subject (the catalog subjects among them) admits any topic, as the
+    keyword check this replaced did: the off-topic list only ever rejects
+    topics under other subjects, and then only when they have more off-topic
+    than study terms. A subject on its own (study plans) is only rejected when
+    it is clearly off-topic, since students study many subjects the
+    vocabulary doesn't list.
+    """
+    subject_study, subject_off_topic = count_terms(subject or "")
+    if topic is None:
+        if subject_off_topic > subject_study:
+            return False, "off_topic_subject"
+        return True, "subject"
+
+    if subject_study > subject_off_topic:
+        return True, "subject"
+    topic_study, topic_off_topic = count_terms(topic)
+    if topic_off_topic > topic_study:
+        return False, "off_topic_terms"
+    if topic_study:
+        return True, "topic"
+    return False, "no_study_terms"
+
+
+def is_study_topic(subject, topic=None):
+    """Whether a request about topic (or just subject) is academic or study-related"""
+    return classify(subject or "", topic)[0]
@@ -0,0 +1,158 @@
+"""Run several CodeLala app workers on one host, sharing the caches and a single log writer.
+
+    python workers.py --workers 4                     # ports 7860-7863
+    python workers.py --workers 4 --host 0.0.0.0 --port 8000
+
+Each worker is a CodeLala.py process on its own port (port + i). They share
+the SQLite caches under cache/ (opened in WAL mode), and hold a lock file per
+cache key while calling the model (CODELALA_WORKER_LOCKS), so a prompt is
+answered once and the other workers read the answer from the cache. Their
+log rows go to a LogSink in this process, the only writer of the CSV logs.
+A worker that exits is restarted.
+
+Gradio keeps a session's queue in the worker that served its page, so the
+load balancer in front must be sticky, e.g. with nginx:
+
+    upstream codelala { ip_hash; server 127.0.0.1:7860; server 127.0.0.1:7861; }
+
+With ip_hash the per-IP rate limits hold as they are; admission control
+pools are per worker, so the host runs up to N times their limits. Metrics
+are served by each worker on CODELALA_METRICS_PORT + i.
+"""
+import argparse
+import os
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from log_writer import LogSink
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CodeLala.py")
+RESTART_DELAY = 1.0
+
+
+def sink_address(workdir):
+    """A Unix socket in workdir where there are Unix sockets, else a free localhost port"""
+    if hasattr(socket, "AF_UNIX"):
+        return os.path.join(workdir, "log-sink.sock")
+    return ("127.0.0.1", 0)
+
+
+def worker_env(index, host, port, sink, authkey, lock_dir):
+    env = dict(os.environ, GRADIO_SERVER_NAME=host, GRADIO_SERVER_PORT=str(port + index),
+               CODELALA_WORKER_ID=str(index), CODELALA_WORKER_LOCKS=lock_dir, CODELALA_LOG_SINK_KEY=authkey.hex(),
+               CODELALA_LOG_SINK=sink if isinstance(sink, str) else f"{sink[0]}:{sink[1]}")
+    metrics_port = os.environ.get("CODELALA_METRICS_PORT", "9108")
+    env["CODELALA_METRICS_PORT"] = str(int(metrics_port) + index) if metrics_port else ""
+    return env
+
+
+class Supervisor:
+    """The log sink and N worker processes, restarted when they exit, until stop()"""
+
+    def __init__(self, workers, host="127.0.0.1", port=7860, lock_dir=os.path.join("cache", "locks"), app=APP,
+                 quiet=False):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.lock_dir = os.path.abspath(lock_dir)
+        self.app = app
+        self.output = subprocess.DEVNULL if quiet else None
+        self.authkey = secrets.token_bytes(16)
+        self._workdir = tempfile.mkdtemp(prefix="codelala-workers-")
+        self.sink = LogSink(sink_address(self._workdir), self.authkey)
+        self.processes = [None] * workers
+        self.restarts = 0
+        self.stopping = threading.Event()
+
+    def urls(self):
+        return [f"http://{self.host}:{self.port + index}/" for index in range(self.workers)]
+
+    def _spawn(self, index):
+        env = worker_env(index, self.host, self.port, self.sink.address, self.authkey, self.lock_dir)
+        self.processes[index] = subprocess.Popen([sys.executable, self.app], env=env, stdout=self.output,
+                                                 stderr=self.output)
+
+    def start(self):
+        os.makedirs(self.lock_dir, exist_ok=True)
+        self.sink.start()
+        for index in range(self.workers):
+            self._spawn(index)
+        return self
+
+    def wait_ready(self, timeout=120):
+        """Block until every worker answers HTTP; returns False if one didn't in time"""
+        deadline = time.time() + timeout
+        for index in range(self.workers):
+            while True:
+                try:
+                    socket.create_connection((self.host, self.port + index), timeout=1).close()
+                    break
+                except OSError:
+                    if time.time() > deadline:
+                        return False
+                    time.sleep(0.5)
+        return True
+
+    def run(self):
+        """Restart workers that exit, until stop() is called"""
+        while not self.stopping.wait(0.5):
+            for index, process in enumerate(self.processes):
+                if process.poll() is not None:
+                    print(f"worker {index} exited with {process.returncode}, restarting", file=sys.stderr, flush=True)
+                    self.restarts += 1
+                    time.sleep(RESTART_DELAY)
+                    self._spawn(index)
+
+    def stop(self, timeout=15):
+        """Stop the workers, then drain their logs"""
+        self.stopping.set()
+        for process in self.processes:
+            if process is not None and process.poll() is None:
+                # SIGINT lets Gradio shut down and the worker's atexit hooks send its last log rows
+                if os.name == "posix":
+                    process.send_signal(signal.SIGINT)
+                else:
+                    process.terminate()
+        for process in self.processes:
+            if process is None:
+                continue
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.sink.close()
+        if isinstance(self.sink.address, str) and os.path.exists(self.sink.address):
+            os.remove(self.sink.address)
+        os.rmdir(self._workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default=os.environ.get("GRADIO_SERVER_NAME", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("GRADIO_SERVER_PORT", "7860")),
+                        help="port of the first worker; the others use the following ones")
+    parser.add_argument("--locks", default=os.path.join("cache", "locks"), help="directory of the cache key lock files")
+    args = parser.parse_args()
+
+    if not os.environ.get("CODELALA_CACHE_DB", "cache"):
+        print("CODELALA_CACHE_DB is empty: workers will not share answers", file=sys.stderr)
+    supervisor = Supervisor(args.workers, args.host, args.port, args.locks).start()
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.stopping.set())
+    print(f"{args.workers} workers: {' '.join(supervisor.urls())}", flush=True)
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()